@@ -39,7 +39,8 @@ setuptools.setup(
         "sqlalchemy",
         "pysocks",  # sock5 proxy support
     ],
-    tests_require=["pytest"],
+    extras_require={"async": ["aiohttp"]},  # xalpha.aio 异步接口
+    tests_require=["pytest", "hypothesis"],
     classifiers=(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
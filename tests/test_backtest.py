@@ -14,6 +14,58 @@ def test_ScheduledSellonXIRR():
     assert sys.totcftable.iloc[-1]["date"].strftime("%Y-%m-%d") == "2020-01-17"
 
 
+def test_sweep():
+    date_range = pd.date_range("2018-01-01", "2019-07-01", freq="W-FRI")
+    df = xa.backtest.sweep(
+        xa.backtest.ScheduledSellonXIRR,
+        {"threhold": [0.1, 0.2], "value": [500, 1000]},
+        start="2018-01-01",
+        end="2019-07-01",
+        workers=2,
+        code="F110026",
+        date_range=date_range,
+    )
+    assert list(df.columns) == ["threhold", "value", "asset", "xirr", "max_drawdown"]
+    bt = xa.backtest.ScheduledSellonXIRR(
+        start="2018-01-01",
+        end="2019-07-01",
+        threhold=0.2,
+        value=1000,
+        code="F110026",
+        date_range=date_range,
+    )
+    bt.backtest()
+    row = df[(df["threhold"] == 0.2) & (df["value"] == 1000)].iloc[0]
+    assert row["asset"] == bt.get_current_asset(pd.Timestamp("2019-07-01"))
+    # 回测区间只有一个交易日时，最大回撤无法计算，记为 NaN 而不报错
+    short = xa.backtest.sweep(
+        xa.backtest.ScheduledSellonXIRR,
+        {"threhold": [0.1], "value": [500]},
+        start="2019-06-27",
+        end="2019-06-28",
+        workers=1,
+        code="F110026",
+        date_range=pd.date_range("2019-06-28", "2019-06-28"),
+    )
+    assert len(short) == 1
+
+
+def test_set_trades():
+    bt = xa.backtest.BTE("2019-01-01", end="2019-06-01")
+    bt.buy("F110026", 1000, pd.Timestamp("2019-01-02"))
+    other = xa.backtest.BTE("2019-01-01", end="2019-06-01")
+    # 直接设定的 trade 对象作为增量状态的起点
+    other.trades = {"F110026": bt.trades["F110026"]}
+    for b in [bt, other]:
+        b.buy("F110026", 1000, pd.Timestamp("2019-03-01"))
+        b.buy("F110026", 100, pd.Timestamp("2019-04-01"), is_value=False)
+    pd.testing.assert_frame_equal(
+        other.trades["F110026"].cftable, bt.trades["F110026"].cftable
+    )
+    other.trades = {}
+    assert other.get_current_asset(pd.Timestamp("2019-06-01")) == 0
+
+
 def test_tendency():
     t28 = xa.backtest.Tendency28(start="2018-01-01", verbose=True, initial_money=600000)
     t28.backtest()
@@ -40,6 +92,9 @@ def test_balance():
     sys = bt.get_current_mul()
     sys.summary("2020-08-15")
     assert round(sys.xirrrate("2020-08-14"), 2) == 0.18
+    df = sys.summary("2020-08-14")
+    for code, (_, value) in bt.get_current_values(pd.Timestamp("2020-08-14")).items():
+        assert value == df[df["基金代码"] == code[1:]].iloc[0]["基金现值"]
 
 
 def test_grid():
@@ -1,6 +1,30 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import numpy as np
 import pandas as pd
 import pytest
-from xalpha.cons import pd_to_datetime
+import datetime as dt
+from hypothesis import given, strategies as st
+from xalpha.cons import (
+    myround,
+    myround_array,
+    pd_to_datetime,
+    opendate_cal,
+    next_onday,
+    last_onday,
+    xirr,
+    xirr_batch,
+    file_lock,
+    atomic_write,
+    drop_partial_line,
+    csv_append,
+    read_complete,
+    get_session,
+    set_session,
+)
 
 
 def test_pd_to_datetime_single_string():
@@ -51,3 +75,173 @@ def test_pd_to_datetime_errors_coerce():
     # Verify that errors='coerce' works as expected
     res = pd_to_datetime("not-a-date", errors="coerce")
     assert pd.isna(res)
+
+
+def test_calendar_single():
+    # 2020-01-01 元旦休市，2020-01-23 至 2020-02-02 春节休市
+    assert opendate_cal.is_open("2020-01-02")
+    assert not opendate_cal.is_open("2020/01/01")
+    assert opendate_cal.next_open("2020-01-23") == pd.Timestamp("2020-02-03")
+    assert opendate_cal.prev_open("2020-02-03") == pd.Timestamp("2020-01-23")
+    assert opendate_cal.shift("2020-01-22", 2) == pd.Timestamp("2020-02-03")
+    assert opendate_cal.shift("2020-02-01", -1) == pd.Timestamp("2020-01-23")
+    assert opendate_cal.shift("2020-02-01", 0) == pd.Timestamp("2020-02-03")
+    assert opendate_cal.open_days_between("2020-01-20", "2020-02-03") == 5
+    assert next_onday(dt.datetime(2020, 1, 23, 15)) == dt.datetime(2020, 2, 3, 15)
+    assert last_onday("20200203") == dt.datetime(2020, 1, 23)
+
+
+def test_calendar_vectorized():
+    dates = pd.date_range("2020-01-20", "2020-02-05")
+    assert opendate_cal.is_open(dates).sum() == opendate_cal.open_days_between(
+        dates[0], dates[-1]
+    )
+    assert list(opendate_cal.next_open(dates)) == [
+        opendate_cal.next_open(d) for d in dates
+    ]
+    assert list(opendate_cal.shift(dates, -3)) == [
+        opendate_cal.shift(d, -3) for d in dates
+    ]
+    with pytest.raises(ValueError):
+        opendate_cal.next_open("2099-01-01")
+
+
+def test_xirr_fallback():
+    cf = [(dt.datetime(2018, 1, 1), -1000), (dt.datetime(2019, 2, 5), 1100)]
+    exact = 1.1 ** (365 / 400) - 1
+    for guess in [0.1, -0.9, 5, 10]:  # 从 5 和 10 出发牛顿法发散，退回 Brent 法
+        assert xirr(cf, guess) == pytest.approx(exact, abs=1e-10)
+    with pytest.raises(RuntimeError):
+        xirr([(dt.datetime(2018, 1, 1), -1000), (dt.datetime(2019, 1, 1), -10)])
+
+
+def test_xirr_batch():
+    cf = [
+        (dt.datetime(2018, 1, 1), -1000),
+        (dt.datetime(2018, 3, 1), -500),
+        (dt.datetime(2018, 9, 1), 200),
+    ]
+    ends = [
+        (dt.datetime(2018, 1, 1), 5),
+        (dt.datetime(2018, 6, 1), 1600),
+        (dt.datetime(2019, 6, 1), 1200),
+    ]
+    res = xirr_batch(cf, ends, guess=0.1)
+    assert pd.isna(res[0])
+    for r, (date, value) in zip(res[1:], ends[1:]):
+        assert r == pytest.approx(
+            xirr([c for c in cf if c[0] <= date] + [(date, value)]), abs=1e-10
+        )
+
+
+def decimal_round(num, label):
+    rounding = "ROUND_HALF_UP" if label == 1 else "ROUND_DOWN"
+    return float(Decimal(str(num)).quantize(Decimal("0.01"), rounding=rounding))
+
+
+# 覆盖任意浮点数，以及恰好落在或紧邻舍入边界上的两三位小数
+floats = st.one_of(
+    st.floats(allow_nan=False, allow_infinity=False, min_value=-1e12, max_value=1e12),
+    st.integers(-(10**11), 10**11).map(lambda n: n / 1000),
+    st.integers(-(10**11), 10**11).map(lambda n: math.nextafter(n / 1000, math.inf)),
+    st.integers(-(10**11), 10**11).map(lambda n: math.nextafter(n / 100, -math.inf)),
+)
+
+
+@given(floats, st.sampled_from([1, 2]))
+def test_myround_decimal_equivalence(num, label):
+    res = myround(num, label)
+    expected = decimal_round(num, label)
+    assert res == expected
+    assert math.copysign(1, res) == math.copysign(1, expected)
+
+
+@given(st.lists(floats, max_size=20), st.sampled_from([1, 2]))
+def test_myround_array_equivalence(nums, label):
+    res = myround_array(nums, label)
+    assert list(res) == [decimal_round(num, label) for num in nums]
+
+
+def test_myround_examples():
+    assert myround(2.675) == 2.68
+    assert myround(-2.675) == -2.68
+    assert myround(1.005) == 1.01
+    assert myround(1.239, 2) == 1.23
+    assert myround(1.23, 2) == 1.23
+    assert myround(np.float64(0.125)) == 0.13
+    assert math.isnan(myround(float("nan")))
+
+
+def test_file_lock_atomic_write(tmp_path):
+    target = str(tmp_path / "a.csv")
+
+    def work(_):
+        for _ in range(20):
+            with file_lock(target), file_lock(target):  # 同一线程内可重入
+                n = len(pd.read_csv(target)) if os.path.exists(target) else 0
+                df = pd.DataFrame({"x": range(n + 1)})
+                atomic_write(target, lambda f: df.to_csv(f, index=False))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(work, range(4)))
+    assert len(pd.read_csv(target)) == 80
+    with pytest.raises(ZeroDivisionError):
+        atomic_write(target, lambda f: 1 / 0)
+    assert len(pd.read_csv(target)) == 80
+    assert sorted(os.listdir(tmp_path)) == ["a.csv"]
+
+
+def test_get_session_threads():
+    set_session()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        sessions = list(executor.map(lambda _: get_session(), range(32)))
+    assert all(s is sessions[0] for s in sessions)
+    set_session()
+    assert get_session() is not sessions[0]
+
+
+def test_set_session_keeps_old(monkeypatch):
+    old = get_session()
+    closed = []
+    monkeypatch.setattr(old, "close", lambda: closed.append(old))
+    set_session()
+    # 其他线程可能仍在使用旧 session，替换时不关闭
+    assert not closed
+    assert get_session() is not old
+
+
+def test_drop_partial_line(tmp_path):
+    target = str(tmp_path / "a.csv")
+    assert not drop_partial_line(target)
+    with open(target, "w") as f:
+        f.write("date,close\n2020-01-02,1.0\n")
+    assert not drop_partial_line(target)
+    with open(target, "a") as f:
+        f.write("2020-01-03,1.")
+    assert drop_partial_line(target)
+    assert len(pd.read_csv(target)) == 1
+
+
+def test_csv_append(tmp_path):
+    target = str(tmp_path / "a.csv")
+    with open(target, "w") as f:
+        f.write("date,close\n2020-01-02,1.0")
+    # 没有追加标记时，缺少换行符的最后一行是完整数据，读取和追加都不丢弃
+    assert read_complete(target) == b"date,close\n2020-01-02,1.0"
+    with csv_append(target):
+        with open(target, "a") as f:
+            f.write("2020-01-03,2.0\n2020-01-06,3.")
+    assert len(pd.read_csv(target)) == 3
+    with pytest.raises(RuntimeError):
+        with csv_append(target):
+            with open(target, "a") as f:
+                f.write("2020-01-07,4.")
+            raise RuntimeError("crash")
+    # 标记仍在，读取时在内存中略去残行，再次追加前截去
+    assert read_complete(target).endswith(b"2020-01-06,3.\n")
+    assert os.path.exists(target + ".append")
+    with csv_append(target):
+        with open(target, "a") as f:
+            f.write("2020-01-07,4.0\n")
+    assert list(pd.read_csv(target)["close"]) == [1.0, 2.0, 3.0, 4.0]
+    assert os.listdir(str(tmp_path)) == ["a.csv"]
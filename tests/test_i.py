@@ -42,6 +42,7 @@ def test_itrade():
     t = xa.itrade("SH512880", ir)
     assert round(t.xirrrate("20200313"), 2) == 12.49
     assert t.dailyreport().iloc[0]["基金名称"].startswith("证券ETF")
+    t.v_totvalue(end="20200313")
 
 
 def test_imul():
@@ -1,4 +1,5 @@
 import os
+import datetime as dt
 import xalpha as xa
 from xalpha.exceptions import FundTypeError
 import pandas as pd
@@ -27,6 +28,25 @@ def test_fundreport():
     assert r.get_report(id_="AN202003171376532533")[0][:2] == "广发"
 
 
+def test_js_vars():
+    text = (
+        '/*基金名称*/var fS_name = "华夏成长";var fund_Rate="0.15";'
+        "var Data_ACWorthTrend = [[1001001000000,1.0],[1001087400000,null]];"
+    )
+    jsvars = xa.info._js_vars(text)
+    assert xa.info._js_value(jsvars["fS_name"]) == "华夏成长"
+    assert float(xa.info._js_value(jsvars["fund_Rate"])) == 0.15
+    assert xa.info._js_value(jsvars["Data_ACWorthTrend"])[1][1] is None
+    assert xa.info._js_value("['a', true]") == ["a", True]
+    assert xa.info._js_value("['true null', \"it's false\", true, null]") == [
+        "true null",
+        "it's false",
+        True,
+        None,
+    ]
+    assert xa.info._ms_to_bj([1600012800000])[0] == pd.Timestamp("2020-09-14")
+
+
 def test_cash():
     assert (
         round(ca.price[ca.price["date"] == "2018-01-02"].iloc[0].netvalue, 4) == 1.2453
@@ -102,6 +122,8 @@ def test_fund():
         float(hs300.special[hs300.special["date"] == "2017-08-04"].iloc[0]["comment"])
         == 0.19
     )
+    assert hs300.price_on_or_before("2017-08-05")["date"] == pd.Timestamp("2017-08-04")
+    assert hs300.price_on_or_after("2017-08-05")["date"] == pd.Timestamp("2017-08-07")
     hs300.rate = 0.12
     hs300.segment = [[0, 7], [7, 365], [365, 730], [730]]
     with pytest.raises(Exception) as excinfo:
@@ -162,6 +184,7 @@ def delete_csvlines(path, lines=5):
     for _ in range(lines):  ## delete one weeks data
         df = df.drop(df.index[len(df) - 1])
     df.to_csv(path, index=False)
+    xa.info.reset_info_cache()  # 缓存文件被改动，内存中的结果不再有效
 
 
 @pytest.mark.local
@@ -189,6 +212,139 @@ def test_csvio():
     )
 
 
+def test_fund_lazy_fee():
+    hs300 = xa.fundinfo("000311")
+    assert hs300._feeinfo is None
+    assert len(hs300.feeinfo) == 2 * len(hs300.segment)
+    assert hs300.purchase_status != "未知"
+
+
+def test_fund_fee_saved_once():
+    xa.info.reset_info_cache()
+    csv = ioconf["path"] + "000311.csv"
+    hs300 = xa.fundinfo("000311", **ioconf)
+    mtime = os.path.getmtime(csv)
+    hs300.feeinfo
+    # 访问赎回费属性不读写本地缓存
+    assert os.path.getmtime(csv) == mtime
+    # 下次开启 save 的构建随写回一并存入缓存头部
+    xa.fundinfo("000311", **ioconf)
+    xa.info.reset_info_cache()
+    hs300 = xa.fundinfo("000311", **ioconf)
+    assert hs300._feeinfo is not None
+    mtime = os.path.getmtime(csv)
+    xa.fundinfo("000311", **ioconf)
+    assert os.path.getmtime(csv) == mtime
+
+
+def test_fund_fee_cache_expires(monkeypatch):
+    xa.info.reset_info_cache()
+    xa.fundinfo("000311").feeinfo
+    stamp = xa.info._feecache["000311"][0]
+    nextday = stamp + dt.timedelta(days=1)
+    monkeypatch.setattr(xa.info, "_fresh_stamp", lambda: nextday)
+    xa.fundinfo("000311").feeinfo
+    assert xa.info._feecache["000311"][0] == nextday
+
+
+def test_load_funds():
+    funds = xa.load_funds(["000311", "F001211", "000311"], property={"000311": 2})
+    assert list(funds) == ["000311", "F001211"]
+    assert isinstance(funds["F001211"], xa.mfundinfo)
+    assert funds["000311"].dividend_label == 1
+    again = xa.load_funds(["000311"])["000311"]
+    assert again.price is funds["000311"].price
+    assert again.dividend_label == 0
+    df = xa.info.price_store.table(codes=["000311", "001211"])
+    assert df.loc[funds["000311"].price.iloc[-1]["date"], "000311"] == (
+        funds["000311"].price.iloc[-1]["netvalue"]
+    )
+
+
+def test_price_store_discard():
+    store = xa.info.PriceStore()
+    fund = xa.load_funds(["000311"], store=store)["000311"]
+    store.discard("000311")
+    assert store.stale("000311")
+    again = xa.load_funds(["000311"], store=store)["000311"]
+    assert again.price is not fund.price
+    e = xa.evaluate("000311", "F001211")
+    assert list(e.totprice.columns) == ["date", "000311", "001211"]
+
+
+def test_price_store_stamp(monkeypatch):
+    store = xa.info.PriceStore()
+    # 净值表总是落后于这一标记，如同 QDII 基金，同一交易日内也不重复获取
+    stamp = pd.Timestamp("2100-01-04")
+    monkeypatch.setattr(xa.info, "_fresh_stamp", lambda: stamp)
+    fund = xa.load_funds(["000311"], store=store)["000311"]
+    assert not store.stale("000311")
+    assert xa.load_funds(["000311"], store=store)["000311"].price is fund.price
+    monkeypatch.setattr(xa.info, "_fresh_stamp", lambda: stamp + dt.timedelta(days=1))
+    assert store.stale("000311")
+
+
+def test_price_store_copy_on_write():
+    store = xa.info.PriceStore()
+    fund = xa.load_funds(["000311"], store=store)["000311"]
+    other = xa.load_funds(["000311"], store=store)["000311"]
+    assert other.price is fund.price
+    date = fund.price.iloc[-2]["date"]
+    netvalue = fund.price.iloc[-2]["netvalue"]
+    fund.set_price("netvalue", date.strftime("%Y%m%d"), 9.99)
+    fund.ma()
+    assert fund.price.iloc[-2]["netvalue"] == 9.99
+    for f in [other, store.get("000311")]:
+        assert f.price.iloc[-2]["netvalue"] == netvalue
+        assert "MA5" not in f.price.columns
+    # 已构建的 trade 从 aim 读取 price 表，写时复制之后读到的是 other 的新表
+    st = pd.DataFrame({"date": [pd.Timestamp("2020-01-02")], "000311": [100]})
+    t = xa.trade(other, st)
+    other.set_price("netvalue", date.strftime("%Y%m%d"), 8.88)
+    assert t.price is other.price
+    assert t.price.iloc[-2]["netvalue"] == 8.88
+
+
+def test_set_price_duplicated_date():
+    fund = xa.fundinfo("000311")
+    fund.price = (
+        pd.concat([fund.price, fund.price.iloc[[-2]]])
+        .sort_values("date", kind="mergesort")
+        .reset_index(drop=True)
+    )
+    date = fund.price.iloc[-2]["date"]
+    fund.set_price("comment", date.strftime("%Y%m%d"), 0.5)
+    assert list(fund.price[fund.price["date"] == date]["comment"]) == [0.5, 0.5]
+    assert date in fund.specialdate
+
+
+def test_price_store_io():
+    store = xa.info.PriceStore()
+    fund = xa.load_funds(["000311"], store=store)["000311"]
+    cached = xa.load_funds(["000311"], store=store, **ioconf)["000311"]
+    # IO 选项不同的载入绕过存储，不替换已有的对象
+    assert cached.price is not fund.price
+    assert store.io("000311") == xa.info._io_key(False, False, "", "csv")
+    assert xa.load_funds(["000311"], store=store)["000311"].price is fund.price
+
+
+def test_fund_memo(monkeypatch):
+    xa.info.reset_info_cache()
+    hs300 = xa.fundinfo("000311", **ioconf)
+    hs300_2 = xa.fundinfo("000311", **ioconf)
+    assert hs300_2.price is hs300.price
+    hs300_2.ma()
+    assert "MA5" not in hs300.price.columns
+    hs300_2.feeinfo
+    hs300_3 = xa.fundinfo("000311", **ioconf)
+    assert hs300_3._feeinfo == hs300_2.feeinfo
+    memo = next(iter(xa.info._info_memo.values()))
+    nextday = memo["stamp"] + dt.timedelta(days=1)
+    monkeypatch.setattr(xa.info, "_fresh_stamp", lambda: nextday)
+    xa.fundinfo("000311", **ioconf)
+    assert memo["stamp"] == nextday
+
+
 @pytest.mark.local
 def test_fund_update():
     zghl = xa.fundinfo(
@@ -32,3 +32,18 @@ def test_trans():
     assert remain.trans(rem, 1.2, "2020-01-01")[2][1] == 12.72
     assert rem[1][1] == 30
     assert len(remain.trans([], 0, "2018-01-01")) == 0
+
+
+def test_lotbook():
+    book = remain.LotBook.from_rem(rem)
+    assert book == rem
+    assert remain.buy(book, 2.5, pd.Timestamp("2017-02-21"))[2][1] == 13.1
+    assert book[2][1] == 10.6
+    sold, new = remain.sell(book, 25, pd.Timestamp("2017-02-21"))
+    assert sold == [[pd.Timestamp("2017-02-09"), 20], [pd.Timestamp("2017-02-19"), 5]]
+    assert new == remain.sell(rem, 25, pd.Timestamp("2017-02-21"))[1]
+    assert len(remain.sell(book, 60.596, pd.Timestamp("2017-02-21"))[1]) == 0
+    assert remain.trans(book, 1.2, "2020-01-01") == remain.trans(rem, 1.2, "2020-01-01")
+    with pytest.raises(Exception) as excinfo:
+        remain.buy(book, 2.5, pd.Timestamp("2017-02-20"))
+    assert str(excinfo.value) == _errmsg
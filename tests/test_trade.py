@@ -1,4 +1,6 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 import xalpha as xa
 import pytest
 import pandas as pd
@@ -38,12 +40,40 @@ ioconf = {
 def test_trade():
     assert cm_t.cftable.loc[2, "share"] == -129.14
     assert round(cm_t.xirrrate("2018-03-03"), 3) == -0.24
+    dates = pd.DatetimeIndex(["2017-12-01", "2018-03-03", "2018-07-29"])
+    rates = cm_t.xirrrates(dates)["xirr"]
+    assert list(rates.round(8)) == [round(cm_t.xirrrate(d), 8) for d in dates]
     assert cm_t.dailyreport("2018-07-29").iloc[0]["单位成本"] == 1.346
+    df = cm_t.dailyreport_range(pd.DatetimeIndex(["2017-12-01", "2018-07-29"]))
+    for i, d in enumerate(["2017-12-01", "2018-07-29"]):
+        r = cm_t.dailyreport(d).iloc[0]
+        assert df.iloc[i]["基金收益总额"] == r["基金收益总额"]
+        assert df.iloc[i]["换手率"] == r["换手率"]
     cm_t.v_tradecost("2018-08-01")
     cm_t.v_totvalue("2018-07-31")
     cm_t.v_tradevolume(freq="M")
 
 
+def test_trade_incremental():
+    n = len(cm_t.cftable) // 2
+    cm_t2 = xa.trade(
+        cm, statb, cftable=cm_t.cftable.iloc[:n], remtable=cm_t.remtable.iloc[:n]
+    )
+    pd.testing.assert_frame_equal(cm_t.cftable, cm_t2.cftable)
+    assert list(cm_t.remtable["rem"]) == list(cm_t2.remtable["rem"])
+
+
+def test_trade_daily_positions():
+    df = cm_t.daily_positions(end="2018-08-01")
+    assert df.iloc[0]["date"] == cm_t.cftable.iloc[0]["date"]
+    for d in ["2017-12-31", "2018-03-03", "2018-07-29"]:
+        row = df[df["date"] == d].iloc[0]
+        r = cm_t.briefdailyreport(d)
+        assert row["share"] == r["currentshare"]
+        assert row["value"] == r["currentvalue"]
+    assert df.iloc[-1]["cashin"] == cm_t.dailyreport("2018-08-01").iloc[0]["基金总申购"]
+
+
 def test_customize_fee():
     df = pd.DataFrame(
         {"date": ["2020-05-28", "2020-06-01"], "519732": [500.005, -0.505]}
@@ -108,6 +138,49 @@ def test_mul_properties():
     )
 
 
+def test_mul_workers():
+    hl_m = xa.mul(status=statnb)
+    for executor in ["thread", "process"]:
+        hl_m2 = xa.mul(status=statnb, workers=4, executor=executor)
+        assert [f.code for f in hl_m2.fundtradeobj] == [
+            f.code for f in hl_m.fundtradeobj
+        ]
+        pd.testing.assert_frame_equal(hl_m.totcftable, hl_m2.totcftable)
+        pd.testing.assert_frame_equal(
+            hl_m.summary("2020-03-10"), hl_m2.summary("2020-03-10")
+        )
+
+
+def test_mul_process_init(tmp_path):
+    engine = "sqlite:///" + os.path.join(str(tmp_path), "xa.db")
+    xa.set_backend(backend="sql", path=xa.multiple.create_engine(engine))
+    xa.cons.set_session(pool_maxsize=4)
+    try:
+        state = xa.multiple._pool_state()
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=xa.multiple._pool_init,
+            initargs=state,
+        ) as pool:
+            # 子进程中的设定与主进程一致
+            assert pool.submit(xa.multiple._pool_state).result() == state
+    finally:
+        xa.set_backend()
+        xa.cons.set_session()
+
+
+def test_mul_process_sql(tmp_path):
+    engine = xa.multiple.create_engine(
+        "sqlite:///" + os.path.join(str(tmp_path), "xa.db")
+    )
+    sqlconf = {"fetch": True, "save": True, "path": engine, "form": "sql"}
+    hl_m = xa.mul(status=statnb, **sqlconf)
+    # engine 以 url 传入子进程，返回的对象不携带 engine
+    hl_m2 = xa.mul(status=statnb, workers=2, executor="process", **sqlconf)
+    pd.testing.assert_frame_equal(hl_m.totcftable, hl_m2.totcftable)
+
+
 def test_mulfix():
     tot = xa.mulfix(cm_t, status=statb, totmoney=5000)
     tot.v_positions()
@@ -116,6 +189,8 @@ def test_mulfix():
     assert round(tot.xirrrate(date="2020-01-01", startdate="2018-05-01"), 2) == 0.04
     eva = tot.evaluation()
     assert round(eva.correlation_table(end="2018-07-30").iloc[0, 3], 3) == 0.095
+    dates = pd.DatetimeIndex(["2017-03-01", "2018-03-05", "2018-07-30"])
+    assert list(tot.unitvalues(dates)) == [tot.unitvalue(d) for d in dates]
 
 
 def test_policy_buyandhold():
@@ -130,6 +205,12 @@ def test_policy_buyandhold():
     assert round(cm_t2.xirrrate("2019-08-12", guess=-0.9), 2) == -0.33
 
 
+def test_policy_buyandhold_vinfo():
+    hs300 = xa.vinfo("SH000300", start="20190901", end="20191231")
+    bah = xa.policy.buyandhold(hs300, start="2019-09-02", totmoney=10000)
+    assert list(bah.status["SH000300"]) == [10000]
+
+
 def test_weekly_price():
     # see https://github.com/refraction-ray/xalpha/issues/27
     ryjh = xa.fundinfo("008969")
@@ -167,6 +248,16 @@ def test_policy_grid():
     assert round(tr.xirrrate("2018-07-13"), 2) == 11.78
 
 
+def test_policy_status_gen_fallback():
+    class pergrid(xa.policy.grid):
+        # 只重载 status_gen 的子类退回逐日调用
+        def status_gen(self, date):
+            return super().status_gen(date)
+
+    args = (cm, [0, 2, 2], [3, 3, 3], "2018-06-23", "2018-08-03")
+    pd.testing.assert_frame_equal(xa.policy.grid(*args).status, pergrid(*args).status)
+
+
 def test_policy_indicator_cross():
     cm.bbi()
     techst = xa.policy.indicator_cross(
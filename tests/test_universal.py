@@ -1,6 +1,9 @@
+import asyncio
+import multiprocessing
 import os
 import time
 import pytest
+import pandas as pd
 import xalpha as xa
 
 HERE = os.path.dirname(os.path.abspath(__file__))
@@ -88,6 +91,39 @@ def test_get_sina_rt():
     xa.get_rt("sina-fx_susdcny")
 
 
+def test_get_rt_batch():
+    codes = ["PDD", "SH501018", "HK00700", "sn-PDD", "sn-SH600000"]
+    rts = xa.universal.get_rt_batch(codes)
+    assert list(rts.keys()) == codes
+    assert rts["PDD"]["currency"] == "USD"
+    assert rts["sn-PDD"]["currency"] == "USD"
+    assert isinstance(rts["SH501018"]["percent"], float)
+    assert xa.get_rt(["PDD", "SH501018"])["PDD"]["name"] == rts["PDD"]["name"]
+
+
+def test_rt_route_alias():
+    assert xa.universal._rt_route("sn-PDD") == ("sina", "PDD")
+    assert xa.universal._rt_route("SH600000", "xq") == ("xueqiu", "SH600000")
+    rts = xa.universal.get_rt_batch(["SH600000"], _from="snowball", double_check=True)
+    assert rts["SH600000"]["name"] == xa.get_rt("SH600000", _from="sina")["name"]
+
+
+def test_get_rt_list_handler():
+    seen = []
+
+    def alt_get_rt(code, **kws):
+        seen.append(code)
+        return {"name": code, "current": 1.0, "percent": 0.0}
+
+    xa.set_handler(method="rt", f=alt_get_rt)
+    try:
+        rts = xa.get_rt(["SH600000", "SZ000001"], double_check=True)
+    finally:
+        xa.set_handler(method="rt")
+    assert seen == ["SH600000", "SZ000001"]
+    assert rts["SZ000001"]["name"] == "SZ000001"
+
+
 @pytest.mark.skip(reason="cninvesting explorer check")
 def test_get_investing_rt():
     assert xa.get_rt("currencies/usd-cny")["currency"] == None
@@ -158,6 +194,101 @@ def test_cache_io():
     xa.universal.check_cache("SH501018", prev=32, omit_lines=1)
 
 
+def test_cache_io_parquet():
+    pytest.importorskip("pyarrow")
+    get_daily_pq = xa.universal.cachedio(
+        path=HERE, prefix="pytestp-", backend="parquet"
+    )(xa.universal._get_daily)
+    df = get_daily_pq("SH501018", start="2020-01-23", end="20200203")
+    assert len(df) == 2
+    xa.universal.reset_cache()
+    df = get_daily_pq("SH501018", start="2020-01-20", end="20200205", fetchonly=True)
+    assert len(df) == 2
+    assert str(df["date"].dtype).startswith("datetime64")
+
+
+def _fake_daily(code, start=None, end=None, **kws):
+    dates = pd.bdate_range(start, end)
+    return pd.DataFrame({"date": dates, "close": [d.day for d in dates]})
+
+
+def _cache_io_child(path, end):
+    get_daily = xa.universal.cachedio(path=path, backend="csv")(_fake_daily)
+    get_daily("fake", start="20200601", end=end)
+
+
+def test_cache_io_two_process(tmp_path):
+    get_daily = xa.universal.cachedio(path=str(tmp_path), backend="csv")(_fake_daily)
+    get_daily("fake", start="20200601", end="20200605")
+    # 另一进程在本进程内存层之后更新了同一 csv
+    p = multiprocessing.Process(
+        target=_cache_io_child, args=(str(tmp_path), "20200612")
+    )
+    p.start()
+    p.join()
+    assert p.exitcode == 0
+    df = get_daily("fake", start="20200601", end="20200619")
+    assert len(df) == 15
+    saved = pd.read_csv(os.path.join(str(tmp_path), "fake.csv"))
+    assert saved["date"].is_unique and len(saved) == 15
+    # 读写之后缓存目录中只有数据文件，不残留锁文件和临时文件
+    assert os.listdir(str(tmp_path)) == ["fake.csv"]
+
+
+def test_cache_io_memory_hit(tmp_path, monkeypatch):
+    get_daily = xa.universal.cachedio(path=str(tmp_path), backend="csv", prefix="hit-")(
+        _fake_daily
+    )
+    get_daily("fake", start="20200601", end="20200605")
+
+    def no_io(*args, **kws):
+        raise AssertionError("disk access on a memory hit")
+
+    for name in ["_read_backend", "_backend_lastdate", "file_lock"]:
+        monkeypatch.setattr(xa.universal, name, no_io)
+    assert len(get_daily("fake", start="20200601", end="20200605")) == 5
+
+
+def test_cache_io_torn_append(tmp_path):
+    get_daily = xa.universal.cachedio(
+        path=str(tmp_path), backend="csv", prefix="torn-"
+    )(_fake_daily)
+    get_daily("fake", start="20200601", end="20200605")
+    target = os.path.join(str(tmp_path), "torn-fake.csv")
+    # 模拟追加写入中途崩溃：残行和追加标记都留在硬盘上
+    with open(target, "a") as f:
+        f.write("2020-06-08,")
+    open(target + ".append", "w").close()
+    xa.universal.reset_cache()
+    df = get_daily("fake", start="20200601", end="20200612", fetchonly=True)
+    assert len(df) == 5 and df["close"].notna().all()
+    df = get_daily("fake", start="20200601", end="20200612")
+    assert len(df) == 10
+    saved = pd.read_csv(target)
+    assert saved["date"].is_unique and len(saved) == 10
+
+
+def test_cache_io_no_trailing_newline(tmp_path):
+    get_daily = xa.universal.cachedio(
+        path=str(tmp_path), backend="csv", prefix="nonl-"
+    )(_fake_daily)
+    get_daily("fake", start="20200601", end="20200605")
+    target = os.path.join(str(tmp_path), "nonl-fake.csv")
+    # 其他工具写出的文件末尾可能没有换行符，最后一行仍是完整的数据
+    with open(target, "rb") as f:
+        content = f.read().rstrip(b"\n")
+    with open(target, "wb") as f:
+        f.write(content)
+    xa.universal.reset_cache()
+    df = get_daily("fake", start="20200601", end="20200605", fetchonly=True)
+    assert len(df) == 5
+    with open(target, "rb") as f:
+        assert f.read() == content
+    df = get_daily("fake", start="20200601", end="20200612")
+    assert len(df) == 10
+    assert len(pd.read_csv(target)) == 10
+
+
 def test_ioconf_keyfunc():
     get_daily_key = xa.universal.cachedio(
         path=HERE, backend="csv", key_func=lambda s: s[::-1]
@@ -181,6 +312,54 @@ def test_cache_mm():
     xa.universal.check_cache("SH501018", start="2018/09/01", omit_lines=1)
 
 
+def test_memory_cache_limit():
+    c = xa.universal.MemoryCache(maxsize=2)
+    c["a"] = pd.DataFrame({"date": [1], "close": [1.0]})
+    c["b"] = pd.DataFrame({"date": [2], "close": [2.0]})
+    c["a"]  # a is now the most recently used
+    c["c"] = pd.DataFrame({"date": [3], "close": [3.0]})
+    assert "b" not in c and "a" in c and "c" in c
+    c.configure(maxbytes=1)
+    assert c.keys() == ["c"]
+    c.set("d", pd.DataFrame(), ttl=-1)
+    assert "d" not in c
+    with pytest.raises(KeyError):
+        c["d"]
+
+
+def test_get_daily_many():
+    codes = ["SH501018", "SZ159941", "SH501018"]
+    dfs = xa.universal.get_daily_many(codes, start="20200301", end="20200401")
+    assert list(dfs.keys()) == ["SH501018", "SZ159941"]
+    assert (
+        dfs["SH501018"].iloc[-1]["close"]
+        == xa.get_daily("SH501018", start="20200301", end="20200401").iloc[-1]["close"]
+    )
+    ldf = xa.universal.get_daily_many(
+        codes, start="20200301", end="20200401", form="long"
+    )
+    assert set(ldf["code"]) == {"SH501018", "SZ159941"}
+
+
+def test_aget():
+    pytest.importorskip("aiohttp")
+
+    async def main():
+        rts = await xa.aio.aget_rt(["PDD", "sn-SH600000"])
+        df = await xa.aio.aget_daily("SH501018", start="20200301", end="20200401")
+        bar = await xa.aio.aget_bar("HK00700", interval=60)
+        await xa.aio.aclose()
+        return rts, df, bar
+
+    rts, df, bar = asyncio.run(main())
+    assert rts["PDD"]["currency"] == "USD"
+    assert (
+        df.iloc[-1]["close"]
+        == xa.get_daily("SH501018", start="20200301", end="20200401").iloc[-1]["close"]
+    )
+    assert len(bar) > 0
+
+
 def test_get_bar_xq():
     xa.get_bar("HK00700", interval=60)
     xa.get_bar("SH600000", interval=3600)
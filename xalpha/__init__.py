@@ -18,6 +18,7 @@ from xalpha.info import (
     IndexInfo,
     FundReport,
     get_fund_holdings,
+    load_funds,
 )
 from xalpha.multiple import mul, mulfix, imul, Mul, MulFix, IMul
 from xalpha.realtime import rfundinfo, review  # deprecated
@@ -33,6 +34,7 @@ from xalpha.universal import (
     VInfo,
 )
 from xalpha.provider import show_providers, set_proxy
+from xalpha.cons import set_session
 from xalpha.toolbox import (
     PEBHistory,
     IndexPEBHistory,
@@ -49,3 +51,4 @@ from xalpha.toolbox import (
     set_display,
 )
 import xalpha.backtest
+import xalpha.aio
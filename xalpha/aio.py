@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio 版本的数据抓取接口，需要额外安装 aiohttp。
+
+雪球和新浪数据源直接在事件循环中通过 aiohttp 抓取，解析复用 :mod:`xalpha.universal` 中的同一套代码，
+其他数据源则将同步函数放入线程池执行，保证所有代码都可以使用。
+"""
+
+import asyncio
+import datetime as dt
+import json
+import logging
+import time
+import weakref
+from functools import partial
+
+import xalpha.universal as xu
+import xalpha.provider as xp
+from xalpha.cons import today_obj
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+_asessions = weakref.WeakKeyDictionary()  # event loop: aiohttp.ClientSession
+_atokens = {}  # source: (token, expire_ts)
+_token_ttl = 300
+
+
+def get_asession():
+    """
+    获取当前事件循环对应的 aiohttp.ClientSession，不存在时自动创建。
+    和同步接口一样不在请求间保留 cookie。
+
+    :return: aiohttp.ClientSession
+    """
+    if aiohttp is None:
+        raise ImportError(
+            "aiohttp is required for async fetching, try pip install xalpha[async]"
+        )
+    loop = asyncio.get_running_loop()
+    session = _asessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar())
+        _asessions[loop] = session
+    return session
+
+
+async def aclose():
+    """
+    关闭当前事件循环对应的 aiohttp.ClientSession，一般在事件循环结束前调用。
+
+    :return: None.
+    """
+    session = _asessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+async def _arequest(url, method="GET", return_json=False, tries=5, timeout=12, **kws):
+    """
+    异步版本的 :func:`xalpha.cons.reconnect`，失败后重试
+
+    :param url: str.
+    :param method: str. GET or POST
+    :param return_json: bool. True 时返回解析后的 json，否则返回文本
+    :param tries: int. 最多尝试的次数
+    :param timeout: float. 单次请求的超时秒数
+    :param kws: 传给 aiohttp 请求的其他参数，如 headers，cookies，params
+    :return: Union[str, Dict]
+    """
+    headers = kws.pop("headers", {})
+    if (not headers.get("user-agent", None)) and (not headers.get("User-Agent", None)):
+        headers["user-agent"] = "Mozilla/5.0"
+    if getattr(xp, "proxy", None):
+        kws["proxy"] = xp.proxy
+    session = get_asession()
+    for count in range(tries):
+        try:
+            logger.debug("Fetching url: %s asynchronously" % url)
+            async with session.request(
+                method,
+                url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                **kws
+            ) as r:
+                r.raise_for_status()
+                if return_json:
+                    return await r.json(content_type=None)
+                return await r.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning("Fails at fetching url: %s. Try again." % url)
+            if count == tries - 1:
+                logger.error(
+                    "Still wrong at fetching url: %s. after %s tries." % (url, tries)
+                )
+                raise e
+            await asyncio.sleep(0.5 * count)
+
+
+async def aget_token(source="xq"):
+    """
+    异步版本的 :func:`xalpha.universal.get_token`
+
+    :return: Dict[str, str].
+    """
+    if source in xu.tokens:
+        return xu.tokens[source]
+    if source not in ["xq", "xueqiu"]:
+        raise ValueError("`aget_token` doesn't support %s source" % source)
+    token, expire = _atokens.get(source, (None, 0))
+    if token is None or time.time() > expire:
+        session = get_asession()
+        async with session.get(
+            "https://xueqiu.com/hq", headers={"user-agent": "Mozilla"}
+        ) as r:
+            token = {
+                "xq_a_token": r.cookies["xq_a_token"].value,
+                "u": r.cookies["u"].value,
+            }
+        _atokens[source] = (token, time.time() + _token_ttl)
+    return token
+
+
+async def _run_sync(f, *args, **kws):
+    """
+    将同步的抓取函数放入默认线程池执行
+
+    :return: the return of f
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(f, *args, **kws))
+
+
+async def aget_daily(code, start=None, end=None, prev=365, _from=None, **kws):
+    """
+    :func:`xalpha.universal.get_daily` 的异步版本。雪球数据源直接异步抓取且不经过缓存层，
+    其他数据源以及设定了 get_daily 钩子的情形在线程池中调用 ``xu.get_daily``。
+
+    :param code: str. 规则同 :func:`xalpha.universal.get_daily`
+    :param start: Optional[str].
+    :param end: Optional[str].
+    :param prev: int. Default 365.
+    :param _from: Optional[str].
+    :return: pd.DataFrame
+    """
+    if _from is None:
+        source, c = xu._daily_route(code)
+    else:
+        source, c = _from, code
+    if source not in ["xueqiu", "xq", "snowball", "XQ"] or getattr(
+        xu, "get_daily_handler", None
+    ):
+        return await _run_sync(
+            xu.get_daily, code, start=start, end=end, prev=prev, _from=_from, **kws
+        )
+    if not end:
+        end_obj = today_obj()
+    else:
+        end_obj = xu.dstr2dobj(end)
+    if not start:
+        start_obj = end_obj - dt.timedelta(days=prev)
+    else:
+        start_obj = xu.dstr2dobj(start)
+    c, type_ = xu.decouple_code(c)
+    count = (today_obj() - start_obj).days + 1
+    r = await _arequest(
+        xu._xq_kline_url(c, count, type_=type_),
+        return_json=True,
+        cookies=await aget_token(),
+        headers={"user-agent": "Mozilla/5.0"},
+    )
+    df = xu.prettify(xu._parse_xq_kline(c, r))
+    df = df[df["date"] <= end_obj.strftime("%Y%m%d")]
+    df = df[df["date"] >= start_obj.strftime("%Y%m%d")]
+    return df
+
+
+async def _aget_xueqiu_rt(code):
+    r = await _arequest(
+        "https://stock.xueqiu.com/v5/stock/quote.json?symbol={code}&extend=detail".format(
+            code=xu._xueqiu_symbol(code)
+        ),
+        return_json=True,
+        cookies=await aget_token(),
+        headers={"user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_4)"},
+    )
+    return xu._parse_xueqiu_rt(r["data"])
+
+
+async def _aget_sina_rt(code):
+    code, tinycode = xu._sina_code(code)
+    text = await _arequest(
+        "https://hq.sinajs.cn/list={tinycode}".format(tinycode=tinycode),
+        headers={"Referer": "https://finance.sina.com.cn"},
+    )
+    return xu._parse_sina_rt(code, text)
+
+
+async def aget_rt(code, _from=None, **kws):
+    """
+    :func:`xalpha.universal.get_rt` 的异步版本，雪球和新浪数据源直接异步抓取并互为备份，
+    其他数据源以及设定了 get_rt 钩子的情形在线程池中调用 ``xu.get_rt``。
+
+    :param code: Union[str, List[str]]. 规则同 :func:`xalpha.universal.get_rt`，
+        若为代码列表则并发抓取，返回以代码为键的字典
+    :param _from: Optional[str].
+    :return: Dict[str, Any].
+    """
+    if not isinstance(code, str):
+        rs = await asyncio.gather(*[aget_rt(c, _from=_from, **kws) for c in code])
+        return dict(zip(code, rs))
+    source, c = xu._rt_route(code, _from)
+    if getattr(xu, "get_rt_handler", None) or kws.get("double_check", False):
+        return await _run_sync(xu.get_rt, code, _from=_from, **kws)
+    if source in ["xueqiu", "xq", "snowball"]:
+        fs = [_aget_xueqiu_rt, _aget_sina_rt]
+    elif source in ["sina", "sn", "xinlang"]:
+        fs = [_aget_sina_rt, _aget_xueqiu_rt]
+    else:
+        return await _run_sync(xu.get_rt, code, _from=_from, **kws)
+    try:
+        return await fs[0](c)
+    except (IndexError, ValueError, AttributeError, TypeError) as e:
+        logger.warning("Fails due to %s, now trying backup data source" % e)
+        return await fs[1](c)
+
+
+async def aget_bar(code, prev=24, interval=3600, _from=None, **kws):
+    """
+    :func:`xalpha.universal.get_bar` 的异步版本，雪球数据源直接异步抓取，
+    其他数据源以及设定了 get_bar 钩子的情形在线程池中调用 ``xu.get_bar``。
+
+    :param code: str. 规则同 :func:`xalpha.universal.get_bar`
+    :param prev: int.
+    :param interval: float, seconds.
+    :param _from: Optional[str].
+    :return: pd.DataFrame
+    """
+    if _from is None:
+        source, c = xu._bar_route(code, start=kws.get("start"), end=kws.get("end"))
+    else:
+        source, c = _from, code
+    if source not in ["xueqiu", "xq", "XQ"] or getattr(xu, "get_bar_handler", None):
+        return await _run_sync(
+            xu.get_bar, code, prev=prev, interval=interval, _from=_from, **kws
+        )
+    text = await _arequest(
+        xu._xq_bar_url(c, prev, interval),
+        headers={"user-agent": "Mozilla/5.0"},
+        cookies=await aget_token(),
+    )
+    if not text:
+        return  # None
+    return xu._parse_xq_bar(json.loads(text))
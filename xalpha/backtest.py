@@ -3,14 +3,20 @@
 modules for dynamical backtesting framework
 """
 
+import copy
+import itertools
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
-from xalpha.info import fundinfo, mfundinfo, cashinfo
-from xalpha.trade import trade, itrade
+from xalpha.info import cashinfo, load_funds
+from xalpha.trade import trade, itrade, TradeLedger
 from xalpha.multiple import mul, mulfix
-from xalpha.cons import yesterdayobj, avail_dates
-from xalpha.exceptions import TradeBehaviorError, FundTypeError
-from xalpha.cons import opendate_set, convert_date
+from xalpha.cons import yesterdayobj, avail_dates, myround
+from xalpha.exceptions import TradeBehaviorError
+from xalpha.cons import opendate_cal, convert_date
 from xalpha.universal import vinfo, get_daily
 
 
@@ -25,6 +31,8 @@ class BTE:
     vinfo is partially supported, however stock refactor is not carefully considered
     To use such powerful dynamical backtesting, one need to subclass ``BTE``
 
+    每个标的的持仓以 :class:`xalpha.trade.TradeLedger` 增量维护，买卖只处理新增的记录日和特殊日，
+    ``self.trades`` 中的 trade 对象在访问时才按需生成。
     """
 
     def __init__(self, start, end=None, totmoney=1000000, verbose=False, **kws):
@@ -33,8 +41,13 @@ class BTE:
         self.kws = kws
         self.totmoney = totmoney
         self.g = GlobalRegister()
-        self.trades = {}  # codes: infoobj
+        self._trades = {}  # codes: trade obj, see ``self.trades``
+        self.ledgers = {}  # codes: TradeLedger
+        self.records = {}  # codes: list of [date, value] rows of status table
+        self._dirty = set()  # codes whose trade obj is outdated
+        self._pinned = set()  # codes whose trade obj is the only source of truth
         self.infos = {}  # codes: infoobj
+        self.shared_infos = {}  # codes: infoobj, get_info 返回其浅拷贝
         self.lastdates = {}  # codes: date
         if end is None:
             end = yesterdayobj()
@@ -69,9 +82,88 @@ class BTE:
         self.prepare()
         dates = pd.bdate_range(self.start, self.end)
         for d in dates:  # 考虑到暂时只支持基金，只在国内交易日运行
-            if d.strftime("%Y-%m-%d") in opendate_set:
+            if opendate_cal.is_open(d):
                 self.run(d)
 
+    @property
+    def trades(self):
+        """
+        Dict[code, trade]. 交易后的 trade 对象在访问时才由增量状态生成
+        """
+        for code in self._dirty:
+            self._trades[code] = self._get_trade(code)
+        self._dirty.clear()
+        return self._trades
+
+    @trades.setter
+    def trades(self, value):
+        """
+        直接设定各标的的 trade 对象，增量状态由其现金流量表和持仓表重建，之后的交易在其基础上继续
+        """
+        self._trades = {}
+        self.ledgers = {}
+        self.records = {}
+        self._dirty = set()
+        self._pinned = set()
+        for code, t in value.items():
+            self._trades[code] = t
+            if isinstance(t, itrade):
+                continue
+            self.infos.setdefault(code, t.aim)
+            self.ledgers[code] = TradeLedger(
+                self.infos[code], cftable=t.cftable, remtable=t.remtable
+            )
+            if t.status is None:
+                self.records[code] = []
+            else:
+                self.records[code] = t.status.loc[:, ["date", t.code]].values.tolist()
+            # 直到下次交易前都以设定的 trade 对象为准
+            self._pinned.add(code)
+
+    def _get_trade(self, code):
+        ledger = self.ledgers[code]
+        status = pd.DataFrame(self.records[code], columns=["date", self.get_code(code)])
+        if not ledger.dates:
+            return trade(self.infos[code], status)
+        return trade(
+            self.infos[code],
+            status,
+            cftable=ledger.cftable(),
+            remtable=ledger.remtable(),
+        )
+
+    def _order(self, code, value, date):
+        """
+        在增量状态上添加一条交易记录并推进到 date，与用截至 date 的现金流量表和持仓表新建 trade 相同
+
+        :param code: Fcode
+        :param value: float, 含义同 status 表
+        :param date: datetime obj
+        """
+        if code not in self.ledgers:
+            self.ledgers[code] = TradeLedger(self.infos[code])
+            self.records[code] = []
+            self._trades.setdefault(code, None)  # 保持标的的先后顺序
+        ledger = self.ledgers[code]
+        self.lastdates[code] = date
+        checkpoint = ledger.checkpoint(date)
+        try:
+            if value != 0:
+                ledger.record(date, value)
+            ledger.advance(date)
+        except Exception:
+            # 与新建 trade 失败时相同，这条记录不计入状态
+            ledger.rollback(checkpoint)
+            if not self.records[code]:
+                del self.ledgers[code], self.records[code]
+                if self._trades[code] is None:
+                    del self._trades[code]
+            raise
+        ledger.truncate(date)
+        self.records[code].append([date, value])
+        self._pinned.discard(code)
+        self._dirty.add(code)
+
     def get_current_mul(self):
         """
         get ``xa.mul`` of the whole setup
@@ -129,13 +221,15 @@ class BTE:
         """
         if code in self.infos:
             return self.infos[code]
-        if code.startswith("F"):
-            try:
-                return fundinfo(code[1:])
-            except FundTypeError:
-                return mfundinfo(code[1:])
-        elif code.startswith("M"):
-            return mfundinfo(code[1:])
+        if code not in self.shared_infos:
+            self.shared_infos[code] = self._fetch_info(code)
+        # 价格数据只读共享，标签等属性的修改只作用于本次回测
+        return copy.copy(self.shared_infos[code])
+
+    def _fetch_info(self, code):
+        if code.startswith("F") or code.startswith("M"):
+            # 基金信息经由共享的 price_store 载入，多个回测之间不重复获取
+            return load_funds([code], max_workers=1)[code]
         else:
             return vinfo(
                 code, start=(self.start - pd.Timedelta(days=180)).strftime("%Y-%m-%d")
@@ -160,14 +254,40 @@ class BTE:
         :param date:
         :return:
         """
-        sys = self.get_current_mul()
-        if sys is not None:
-            sys = sys.summary(date.strftime("%Y-%m-%d"))
-            row = sys[sys["基金名称"] == "总计"].iloc[0]
-            current = row["基金现值"]
-        else:
-            current = 0
-        return current
+        if not self._trades:
+            return 0
+        if any(code not in self.ledgers for code in self._trades):
+            # self.trades 中有直接设定的 trade 对象
+            sys = self.get_current_mul().summary(date.strftime("%Y-%m-%d"))
+            return sys[sys["基金名称"] == "总计"].iloc[0]["基金现值"]
+        return pd.Series([v for _, v in self.get_current_values(date).values()]).sum()
+
+    def get_current_values(self, date):
+        """
+        获取各标的在 date 日的净值和持仓现值，与 ``self.get_current_mul().summary(date)`` 中对应的当日净值和基金现值相同，
+        但直接由增量状态计算，不生成 trade 和 mul 对象
+
+        :param date:
+        :return: Dict[code, Tuple[float, float]]
+        """
+        date = pd.Timestamp(date.strftime("%Y-%m-%d"))
+        values = {}
+        for code, ledger in self.ledgers.items():
+            if code in self._pinned:
+                t = self._trades[code]
+                values[code] = (
+                    t.get_netvalue(date),
+                    t.briefdailyreport(date).get("currentvalue", 0),
+                )
+                continue
+            share = ledger.share(date)
+            row = ledger.aim.price_on_or_before(date)
+            netvalue = 0 if row is None else row.netvalue
+            values[code] = (
+                netvalue,
+                0 if share is None else myround(share * netvalue),
+            )
+        return values
 
     def buy(self, code, value, date, is_value=True):
         """
@@ -181,30 +301,16 @@ class BTE:
         """
         if self.verbose:
             print(f"buy {value} of {code} on {date.strftime('%Y-%m-%d')}")
-        if code in self.trades:
-            df = self.trades[code].status
-            cftable = self.trades[code].cftable
-            cftable = cftable[cftable["date"] <= self.lastdates[code]]
-            remtable = self.trades[code].remtable
-            remtable = remtable[remtable["date"] <= self.lastdates[code]]
-            self.lastdates[code] = date
+        if code in self.ledgers:
             if is_value is False:
-                tdf = self.infos[code].price
-                value = value * tdf[tdf["date"] == date].iloc[0].netvalue
-            df2 = pd.DataFrame([[date, value]], columns=["date", self.get_code(code)])
-            df = pd.concat([df, df2])
-            self.trades[code] = trade(
-                self.infos[code],
-                df,
-                cftable=cftable,
-                remtable=remtable,
-            )
-        else:
-            self.lastdates[code] = date
-            if code not in self.infos:
-                self.infos[code] = self.get_info(code)
-            df = pd.DataFrame({"date": [date], self.get_code(code): [value]})
-            self.trades[code] = trade(self.infos[code], df)
+                aim = self.infos[code]
+                i = aim.price_pos(date)
+                if aim.price_pos(date, side="right") == i:
+                    raise IndexError("no price of %s on %s" % (code, date))
+                value = value * aim.price.iloc[i].netvalue
+        elif code not in self.infos:
+            self.infos[code] = self.get_info(code)
+        self._order(code, value, date)
 
     def sell(self, code, share, date, is_value=False):
         """
@@ -219,29 +325,111 @@ class BTE:
         share = abs(share)
         if self.verbose:
             print(f"sell {share} of {code} on {date.strftime('%Y-%m-%d')}")
-        if code not in self.trades:
+        if code not in self.ledgers:
             raise TradeBehaviorError("You are selling something that you don't have")
-        df = self.trades[code].status
-        cftable = self.trades[code].cftable
-        cftable = cftable[cftable["date"] <= self.lastdates[code]]
-        remtable = self.trades[code].remtable
-        remtable = remtable[remtable["date"] <= self.lastdates[code]]
-        self.lastdates[code] = date
-        self.lastdates[code] = date
-        df2 = pd.DataFrame([[date, -share]], columns=["date", self.get_code(code)])
-        df = pd.concat([df, df2])
         if is_value:
             self.set_fund(code, value_label=1)
-        self.trades[code] = trade(
-            self.infos[code],
-            df,
-            cftable=cftable,
-            remtable=remtable,
-        )
+        self._order(code, -share, date)
         if is_value:
+            # 按金额赎回只在此时生效，因此立即生成 trade 对象，直到下次交易前都以其为准
+            self._trades[code] = self._get_trade(code)
+            self._dirty.discard(code)
+            self._pinned.add(code)
             self.set_fund(code, value_label=0)
 
 
+_sweep_shared = {}  # 进程内共享的 codes: infoobj
+
+
+def _sweep_init(snapshot):
+    _sweep_shared.update(pickle.loads(snapshot))
+
+
+def _sweep_run(args, shared=None):
+    if shared is None:
+        shared = _sweep_shared
+    cls, start, end, totmoney, kws = args
+    bt = cls(start, end=end, totmoney=totmoney, **kws)
+    bt.shared_infos = shared
+    bt.backtest()
+    return _sweep_result(bt, end)
+
+
+def _sweep_result(bt, end):
+    date = end.strftime("%Y-%m-%d")
+    asset, xirr, drawdown = 0, np.nan, np.nan
+    if bt.trades:
+        asset = bt.get_current_asset(end)
+        try:
+            xirr = bt.get_current_mul().xirrrate(date=date)
+        except RuntimeError:
+            pass
+        try:
+            sysfix = bt.get_current_mulfix()
+            sysfix._pricegenerate("回测组合")
+            r = sysfix.max_drawdown(date)
+        except TradeBehaviorError:  # totmoney 不足以覆盖策略的资金占用
+            pass
+        except ValueError:  # 组合净值不足两日，无法计算回撤
+            pass
+        else:
+            if r is not None:
+                drawdown = r[2]
+    return {"asset": asset, "xirr": xirr, "max_drawdown": drawdown}
+
+
+def sweep(cls, param_grid, start, end=None, workers=None, totmoney=1000000, **kws):
+    """
+    对 BTE 子类的参数网格批量回测。第一组参数在当前进程中运行并获取所需的标的数据，
+    之后这些数据序列化一次传给进程池中的各进程只读共享，其余参数组在进程池中运行，不再重复获取数据。
+
+    .. code-block:: python
+
+        df = xa.backtest.sweep(
+            xa.backtest.Tendency28,
+            {"prev": [5, 10, 20], "upthrehold": [0.5, 1.0, 2.0]},
+            start="2018-01-01",
+            end="2020-01-01",
+            workers=4,
+        )
+
+    :param cls: BTE 的子类，需要定义在可导入的模块中，以便传给其他进程
+    :param param_grid: Union[Dict[str, list], List[dict]]. 字典时取各参数取值的全部组合，列表时逐个作为参数组
+    :param start: str or datetime obj
+    :param end: Optional[str or datetime obj]. 默认为昨天
+    :param workers: Optional[int]. 进程池的进程数，默认为 cpu 核数，1 则全部在当前进程中依次运行
+    :param totmoney: float. 每次回测的总资金，用于计算最大回撤
+    :param kws: 所有参数组共同的其他参数
+    :return: pd.DataFrame. 每行一组参数，除参数列外包括 asset（结束日持仓现值），xirr 和 max_drawdown
+    """
+    if isinstance(param_grid, dict):
+        names = list(param_grid)
+        params = [
+            dict(zip(names, values))
+            for values in itertools.product(*[param_grid[n] for n in names])
+        ]
+    else:
+        params = [dict(p) for p in param_grid]
+    start = convert_date(start)
+    end = yesterdayobj() if end is None else convert_date(end)
+    if not params:
+        return pd.DataFrame()
+    tasks = [(cls, start, end, totmoney, {**kws, **p}) for p in params]
+
+    bt = cls(start, end=end, totmoney=totmoney, **tasks[0][-1])
+    bt.backtest()
+    results = [_sweep_result(bt, end)]
+    if workers == 1 or len(tasks) == 1:
+        results.extend(_sweep_run(task, bt.shared_infos) for task in tasks[1:])
+    else:
+        snapshot = pickle.dumps(bt.shared_infos)
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_sweep_init, initargs=(snapshot,)
+        ) as executor:
+            results.extend(executor.map(_sweep_run, tasks[1:]))
+    return pd.DataFrame([{**p, **r} for p, r in zip(params, results)])
+
+
 ## the following are some example backtest policy classes for testing and educational purpose
 ## they are not stable in terms of API, and don't rely on them in production environment
 
@@ -274,13 +462,7 @@ class AverageScheduled(Scheduled):
     def run(self, date):
         if date in self.date_range:
             self.aim += self.value
-            sys = self.get_current_mul()
-            if sys is not None:
-                sys = sys.summary(date.strftime("%Y-%m-%d"))
-                row = sys[sys["基金名称"] == "总计"].iloc[0]
-                current = row["基金现值"]
-            else:
-                current = 0
+            current = self.get_current_asset(date)
 
             if self.aim > current:
                 self.buy(self.code, self.aim - current, date)
@@ -421,21 +603,13 @@ class Balance(BTE):
             self.nill = False
         if date in self.check_dates:
             # 动态平衡
-            sys = self.get_current_mul()
-            df = sys.summary(date.strftime("%Y-%m-%d"))
-            total_value = df[df["基金名称"] == "总计"]["基金现值"].iloc[0]
+            values = self.get_current_values(date)
+            total_value = self.get_current_asset(date)
             for fund, ratio in self.portfolio_dict.items():
-                delta = (
-                    df[df["基金代码"] == fund[1:]]["基金现值"].iloc[0]
-                    - total_value * ratio
-                )
+                netvalue, value = values[fund]
+                delta = value - total_value * ratio
                 if delta > 0:
-                    share = round(
-                        delta
-                        / (1 - 0.005)
-                        / df[df["基金代码"] == fund[1:]]["当日净值"].iloc[0],
-                        2,
-                    )
+                    share = round(delta / (1 - 0.005) / netvalue, 2)
                     self.sell(
                         fund, share, date
                     )  # 赎回份额考虑赎回费估算为千五，会导致末态并非完全平衡
@@ -7,13 +7,22 @@ import datetime as dt
 import inspect
 import json
 import logging
+import math
 import os
+import shutil
+import tempfile
+import threading
 import time
+from contextlib import contextmanager
 from decimal import Decimal
 from functools import wraps
+from http.cookiejar import DefaultCookiePolicy
 
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from simplejson.errors import JSONDecodeError
 from pyecharts.options import (
     AxisOpts,
@@ -28,6 +37,12 @@ from scipy import optimize
 from xalpha import __path__
 from .exceptions import HttpStatusError
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 logger = logging.getLogger(__name__)
 
 # date obj of today
@@ -67,6 +82,133 @@ opendate = list(caldate[caldate["is_open"] == 1]["cal_date"])
 opendate_set = set(opendate)  # for speed checking?
 opendate_dt = pd.to_datetime(opendate)
 
+
+class TradeCalendar:
+    """
+    交易日历，开市日以排序的 datetime64[D] 数组保存，同时预先生成日历范围内逐日的序号表，
+    即每个自然日之前的开市日个数，因此各种查询都是 O(1) 的数组索引，且均支持传入日期数组批量计算。
+
+    日期参数可以是 str，datetime，pd.Timestamp，np.datetime64 或者它们的列表和数组，
+    单个日期返回单个结果（日期为 pd.Timestamp），日期数组返回 np.array 或 pd.DatetimeIndex。
+
+    :param dates: 全部开市日
+    """
+
+    def __init__(self, dates):
+        self.dates = np.unique(pd.to_datetime(dates).values.astype("datetime64[D]"))
+        self.first = self.dates[0]
+        self.last = self.dates[-1]
+        self._base = pd.Timestamp(self.first).toordinal()
+        # _ordinal[i] 为第 i 个自然日之前的开市日个数，多出一位便于查询 last 之后的一天
+        days = np.arange(self.first, self.last + np.timedelta64(2, "D"))
+        self._ordinal = np.searchsorted(self.dates, days, side="left")
+        self._open = np.zeros(len(days), dtype=bool)
+        self._open[(self.dates - self.first).astype(int)] = True
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _offsets(self, d):
+        """
+        :returns: Tuple[Union[int, np.array of int], bool], 相对日历首日的天数，以及输入是否为单个日期
+        """
+        if isinstance(d, (dt.datetime, dt.date)):
+            return d.toordinal() - self._base, True
+        if isinstance(d, (str, np.datetime64)):
+            if isinstance(d, str):
+                d = d.replace("/", "-")
+            return pd.Timestamp(d).toordinal() - self._base, True
+        days = pd.to_datetime(d).values.astype("datetime64[D]")
+        return (days - self.first).astype(int), False
+
+    def _count_before(self, off):
+        """
+        :returns: int or np.array of int, 各日期之前（不含当日）的开市日个数
+        """
+        n = len(self._ordinal)
+        if isinstance(off, int):
+            if off < 0:
+                return 0
+            if off >= n:
+                return len(self.dates)
+            return int(self._ordinal[off])
+        res = np.where(off < 0, 0, len(self.dates))
+        inside = (off >= 0) & (off < n)
+        res[inside] = self._ordinal[off[inside]]
+        return res
+
+    def _pick(self, idx):
+        if isinstance(idx, int):
+            if 0 <= idx < len(self.dates):
+                return pd.Timestamp(self.dates[idx])
+        elif np.all((idx >= 0) & (idx < len(self.dates))):
+            return pd.DatetimeIndex(self.dates[idx].astype("datetime64[ns]"))
+        raise ValueError(
+            "date goes beyond the trade calendar range: %s to %s"
+            % (self.first, self.last)
+        )
+
+    def is_open(self, d):
+        """
+        :returns: bool or np.array of bool, 是否为开市日，日历范围外均为 False
+        """
+        off, single = self._offsets(d)
+        if single:
+            return 0 <= off < len(self._open) and bool(self._open[off])
+        res = np.zeros(len(off), dtype=bool)
+        inside = (off >= 0) & (off < len(self._open))
+        res[inside] = self._open[off[inside]]
+        return res
+
+    def next_open(self, d):
+        """
+        :returns: 严格晚于 d 的下一个开市日
+        """
+        off, _ = self._offsets(d)
+        return self._pick(self._count_before(off + 1))
+
+    def prev_open(self, d):
+        """
+        :returns: 严格早于 d 的上一个开市日
+        """
+        off, _ = self._offsets(d)
+        return self._pick(self._count_before(off) - 1)
+
+    def shift(self, d, n):
+        """
+        将日期移动 n 个开市日，n 为正向后，为负向前。d 为非开市日时，n=1 为其后第一个开市日，n=-1 为其前第一个开市日，
+        n=0 则返回不早于 d 的第一个开市日。
+
+        :param n: int or array of int
+        :returns: 移动后的开市日
+        """
+        off, single = self._offsets(d)
+        if single and isinstance(n, int):
+            if n > 0:
+                return self._pick(self._count_before(off + 1) + n - 1)
+            return self._pick(self._count_before(off) + n)
+        off = np.asarray(off)
+        n = np.asarray(n)
+        idx = np.where(
+            n > 0, self._count_before(off + 1) + n - 1, self._count_before(off) + n
+        )
+        return self._pick(np.atleast_1d(idx))
+
+    def open_days_between(self, start, end):
+        """
+        :returns: int or np.array of int, [start, end] 闭区间内的开市日个数，start 晚于 end 时为 0
+        """
+        s, _ = self._offsets(start)
+        e, _ = self._offsets(end)
+        if isinstance(s, int) and isinstance(e, int):
+            return max(self._count_before(e + 1) - self._count_before(s), 0)
+        s = np.atleast_1d(s)
+        e = np.atleast_1d(e)
+        return np.maximum(self._count_before(e + 1) - self._count_before(s), 0)
+
+
+opendate_cal = TradeCalendar(opendate)
+
 # fund code list which always round down for the purchase share approximation
 droplist = ["003318", "000311", "000601", "009989"]
 
@@ -153,6 +295,55 @@ themeriver_opts = {
 }
 
 
+def _xirr_arrays(cashflows):
+    # 年化时间只计算一次，以最早的现金流为起点
+    dates = pd.DatetimeIndex([d for d, _ in cashflows])
+    amounts = np.array([cf for _, cf in cashflows], dtype=float)
+    t = (dates - dates.min()).days.to_numpy() / 365.0
+    return t, amounts
+
+
+def _xnpv(rate, t, amounts):
+    with np.errstate(all="ignore"):
+        return np.sum(amounts * (1 + rate) ** -t)
+
+
+def _xnpv_prime(rate, t, amounts):
+    with np.errstate(all="ignore"):
+        return np.sum(-t * amounts * (1 + rate) ** (-t - 1))
+
+
+def _xirr_brent(t, amounts, guess):
+    # 在 (-1, +inf) 上寻找 npv 变号的区间，取离 guess 最近的一个
+    rates = np.concatenate(
+        [-1 + np.logspace(-6, 0, 25)[:-1], [0.0], np.logspace(-3, 6, 28)]
+    )
+    npvs = np.array([_xnpv(r, t, amounts) for r in rates])
+    change = np.nonzero(
+        np.isfinite(npvs[:-1])
+        & np.isfinite(npvs[1:])
+        & (np.sign(npvs[:-1]) * np.sign(npvs[1:]) <= 0)
+    )[0]
+    if len(change) == 0:
+        raise RuntimeError("no root of xirr is found for the given cashflows")
+    k = change[np.argmin(np.abs(rates[change] - guess))]
+    return optimize.brentq(
+        _xnpv, rates[k], rates[k + 1], args=(t, amounts), xtol=1e-12, maxiter=200
+    )
+
+
+def _xirr_solve(t, amounts, guess):
+    try:
+        rate = optimize.newton(
+            _xnpv, guess, fprime=_xnpv_prime, args=(t, amounts), maxiter=50
+        )
+    except (RuntimeError, OverflowError, ZeroDivisionError):
+        rate = np.nan
+    if np.isfinite(rate) and rate > -1 and np.isfinite(_xnpv(rate, t, amounts)):
+        return float(rate)
+    return float(_xirr_brent(t, amounts, guess))
+
+
 def xnpv(rate, cashflows):
     """
     give the current cash value based on future cashflows
@@ -164,14 +355,15 @@ def xnpv(rate, cashflows):
         and cash inflows (returns) are positive amounts.
     :returns: a single float value which is the NPV of the given cash flows
     """
-    chron_order = sorted(cashflows, key=lambda x: x[0])
-    t0 = chron_order[0][0]
-    return sum([cf / (1 + rate) ** ((t - t0).days / 365.0) for (t, cf) in chron_order])
+    t, amounts = _xirr_arrays(cashflows)
+    return _xnpv(rate, t, amounts)
 
 
 def xirr(cashflows, guess=0.1):
     """
     calculate the Internal Rate of Return of a series of cashflows at irregular intervals.
+    Newton iterations use the analytic derivative of xnpv, and fall back to Brent's method on a bracketing
+    interval if Newton diverges.
 
     :param cashflows: a list, in which each element is a tuple of the form (date, amount),
         where date is a datetime object and amount is an integer or floating number.
@@ -180,18 +372,70 @@ def xirr(cashflows, guess=0.1):
     :param guess: floating number, a guess at the xirr rate solution to be used
         as a starting point for the numerical solution
     :returns: the IRR as a single floating number
+    :raises RuntimeError: when no rate in (-1, inf) makes the npv vanish
     """
-    return optimize.newton(lambda r: xnpv(r, cashflows), guess)
+    t, amounts = _xirr_arrays(cashflows)
+    return _xirr_solve(t, amounts, guess)
 
 
-def myround(num, label=1):
+def xirr_batch(cashflows, ends, guess=0.1, maxiter=50, tol=1.48e-8):
     """
-    correct implementation of round with round half up, round to 2 decimals
-
-    :param num: the floating number, to be rounded
-    :param label: integer 1 or 2, 1 for round half up while 2 for always round down
-    :returns: the float number after rounding, with two decimals
+    calculate xirr for many end dates in one call, the k-th result is the same as
+    ``xirr([(d, cf) for d, cf in cashflows if d <= ends[k][0]] + [ends[k]])``.
+    All end dates are solved simultaneously by vectorized Newton iterations,
+    and those that do not converge are solved one by one with :func:`xirr`.
+
+    :param cashflows: a list of (date, amount) tuples, shared by all end dates
+    :param ends: a list of (date, amount) tuples, the final cashflow for each end date,
+        typically the value of virtually selling all holdings on that date
+    :param guess: floating number, the starting point for all end dates
+    :param maxiter: int, the max number of vectorized Newton iterations
+    :param tol: float, the tolerance of the rate
+    :returns: np.array of xirr for each end date, nan if no root is found
     """
+    if len(ends) == 0:
+        return np.array([])
+    dates = pd.DatetimeIndex([d for d, _ in cashflows] + [d for d, _ in ends])
+    t0 = dates.min()
+    n = len(cashflows)
+    t = (dates[:n] - t0).days.to_numpy() / 365.0
+    amounts = np.array([cf for _, cf in cashflows], dtype=float)
+    te = (dates[n:] - t0).days.to_numpy() / 365.0
+    ae = np.array([cf for _, cf in ends], dtype=float)
+    mask = dates[:n].to_numpy()[None, :] <= dates[n:].to_numpy()[:, None]
+    weights = np.where(mask, amounts[None, :], 0.0)
+
+    rate = np.full(len(ends), float(guess))
+    active = np.ones(len(ends), dtype=bool)
+    with np.errstate(all="ignore"):
+        for _ in range(maxiter):
+            if not active.any():
+                break
+            b = 1 + rate[active]
+            disc = b[:, None] ** -t[None, :]
+            disce = b ** -te[active]
+            w = weights[active]
+            f = (w * disc).sum(axis=1) + ae[active] * disce
+            fp = (
+                -(w * t[None, :] * disc).sum(axis=1) / b
+                - ae[active] * te[active] * disce / b
+            )
+            step = f / fp
+            rate[active] = rate[active] - step
+            done = np.abs(step) < tol
+            idx = np.nonzero(active)[0]
+            active[idx[done | ~np.isfinite(step)]] = False
+        converged = np.isfinite(rate) & (rate > -1) & ~active
+        for k in np.nonzero(~converged)[0]:
+            try:
+                tk = np.append(t[mask[k]], te[k])
+                rate[k] = _xirr_solve(tk, np.append(amounts[mask[k]], ae[k]), guess)
+            except RuntimeError:
+                rate[k] = np.nan
+    return rate
+
+
+def _myround_decimal(num, label=1):
     if label == 1:
         res = float(
             Decimal(str(num)).quantize(Decimal("0.01"), rounding="ROUND_HALF_UP")
@@ -203,6 +447,60 @@ def myround(num, label=1):
     return res
 
 
+# 绝对值小于该值时走整数分的快速路径，舍入边界的十进制表示不超过 15 位有效数字
+_myround_fast_limit = 1e9
+
+
+def myround(num, label=1):
+    """
+    correct implementation of round with round half up, round to 2 decimals.
+    The result is the same as rounding the decimal string ``str(num)``, but computed with integer cents:
+    the rounding boundary, e.g. x.xx5 for round half up, has no more than 15 significant digits, so
+    comparing ``num`` with the float nearest to the boundary tells on which side ``str(num)`` lies.
+
+    :param num: the floating number, to be rounded
+    :param label: integer 1 or 2, 1 for round half up while 2 for always round down
+    :returns: the float number after rounding, with two decimals
+    """
+    if isinstance(num, (float, int, np.integer)) and label in (1, 2):
+        absnum = abs(num)
+        if absnum < _myround_fast_limit:  # nan 和 inf 不走快速路径
+            if label == 1:
+                cents = math.floor(absnum * 100)
+                if absnum >= (2 * cents + 1) / 200:
+                    cents += 1
+            else:
+                cents = math.floor(absnum * 100 + 0.5)
+                if absnum < cents / 100:
+                    cents -= 1
+            return math.copysign(cents / 100, num)
+    return _myround_decimal(num, label)
+
+
+def myround_array(nums, label=1):
+    """
+    vectorized :func:`myround` on arrays, each element is the same as calling myround on it
+
+    :param nums: array-like of floats
+    :param label: integer 1 or 2, 1 for round half up while 2 for always round down
+    :returns: np.array of floats after rounding, with two decimals
+    """
+    nums = np.asarray(nums, dtype=float)
+    absnums = np.abs(nums)
+    with np.errstate(invalid="ignore"):
+        if label == 1:
+            cents = np.floor(absnums * 100)
+            cents = cents + (absnums >= (2 * cents + 1) / 200)
+        else:
+            cents = np.floor(absnums * 100 + 0.5)
+            cents = cents - (absnums < cents / 100)
+        res = np.copysign(cents / 100, nums)
+        slow = ~(absnums < _myround_fast_limit)
+    for k in np.flatnonzero(slow):
+        res.flat[k] = _myround_decimal(float(nums.flat[k]), label)
+    return res
+
+
 def pd_to_datetime(target, **kwargs):
     """
     version aware pd.to_datetime, use format="mixed" for pandas >= 2.0
@@ -266,6 +564,186 @@ def pd_valid_freq(freq):
     return freq
 
 
+_held_file_locks = threading.local()
+
+
+def _lock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(0.05)
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(target):
+    """
+    以 ``target + ".lock"`` 文件实现的跨进程建议锁，只有同样使用该锁的读写方之间互斥。
+    同一线程内可重入，不同线程和进程之间互斥。POSIX 系统上锁文件在释放时删除，不会残留在缓存目录中。
+
+    :param target: str. 需要保护的文件路径
+    """
+    lockpath = os.path.abspath(target) + ".lock"
+    held = getattr(_held_file_locks, "paths", None)
+    if held is None:
+        held = _held_file_locks.paths = set()
+    if lockpath in held:
+        yield
+        return
+    while True:
+        fd = os.open(lockpath, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            _lock_fd(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+        if fcntl is None:
+            break
+        # 等待期间上一持有者可能已经删除了锁文件，此时锁住的是失效的文件，需在新的锁文件上重试
+        try:
+            if os.path.samestat(os.stat(lockpath), os.fstat(fd)):
+                break
+        except FileNotFoundError:
+            pass
+        _unlock_fd(fd)
+        os.close(fd)
+    try:
+        held.add(lockpath)
+        try:
+            yield
+        finally:
+            held.discard(lockpath)
+            if fcntl is not None:
+                # 持锁时删除，之后的等待者会发现文件失效并重新创建；Windows 上无法删除打开的文件
+                try:
+                    os.remove(lockpath)
+                except FileNotFoundError:
+                    pass
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(target, writer):
+    """
+    先写入同一目录下的临时文件，再通过 ``os.replace`` 替换 target，其他进程不会读到写了一半的文件
+
+    :param target: str. 目标文件路径
+    :param writer: Callable[[str], None]. 接受临时文件路径并完成写入的函数
+    """
+    folder, name = os.path.split(os.path.abspath(target))
+    fd, tmp = tempfile.mkstemp(prefix="." + name + ".", suffix=".tmp", dir=folder)
+    os.close(fd)
+    try:
+        writer(tmp)
+        if os.path.exists(target):
+            shutil.copymode(target, tmp)
+        else:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def drop_partial_line(target):
+    """
+    截去文件末尾没有换行符的不完整行。只应在 :func:`csv_append` 的标记表明上次追加中途崩溃时调用，
+    末尾缺少换行符的也可能是完整的数据行，调用方需持有该文件的锁
+
+    :param target: str. 文件路径
+    :return: bool, 是否截去了不完整的行
+    """
+    try:
+        f = open(target, "rb+")
+    except FileNotFoundError:
+        return False
+    with f:
+        pos = f.seek(0, os.SEEK_END)
+        if pos == 0:
+            return False
+        f.seek(pos - 1)
+        if f.read(1) == b"\n":
+            return False
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            i = f.read(step).rfind(b"\n")
+            if i >= 0:
+                f.truncate(pos + i + 1)
+                logger.warning("truncated a partially written line in %s" % target)
+                return True
+    # 整个文件都没有换行符时无法判断，保持原样
+    return False
+
+
+def _append_marker(target):
+    return os.path.abspath(target) + ".append"
+
+
+@contextmanager
+def csv_append(target):
+    """
+    原地追加写入文件的上下文，调用方需持有该文件的锁。追加期间存在标记文件 target.append，正常结束后删除。
+    开始追加时标记仍在，说明上次追加中途崩溃，先截去末尾的残行；否则末尾缺少换行符的完整行只补上换行符，不丢弃数据
+
+    :param target: str. 文件路径
+    """
+    marker = _append_marker(target)
+    if os.path.exists(marker):
+        drop_partial_line(target)
+    elif os.path.exists(target):
+        with open(target, "rb+") as f:
+            pos = f.seek(0, os.SEEK_END)
+            if pos > 0:
+                f.seek(pos - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+    with open(marker, "w"):
+        pass
+    yield
+    # 追加出错时保留标记，下次追加前据此修复
+    os.remove(marker)
+
+
+def append_interrupted(target):
+    """
+    上次原地追加是否中途崩溃，见 :func:`csv_append`
+
+    :param target: str. 文件路径
+    :return: bool
+    """
+    return os.path.exists(_append_marker(target))
+
+
+def read_complete(target):
+    """
+    读取文件内容，不修改文件。上次追加中途崩溃（:func:`csv_append` 的标记仍在）时，在内存中略去末尾没有换行符的残行
+
+    :param target: str. 文件路径
+    :return: bytes
+    """
+    with open(target, "rb") as f:
+        data = f.read()
+    if data and not data.endswith(b"\n") and append_interrupted(target):
+        data = data[: data.rfind(b"\n") + 1]
+    return data
+
+
 def _date_check(dtobj, check=False):
     if not isinstance(dtobj, dt.datetime):
         dtobj = dt.datetime.strptime(dtobj.replace("/", "").replace("-", ""), "%Y%m%d")
@@ -276,20 +754,19 @@ def _date_check(dtobj, check=False):
     return dtobj
 
 
+def _move_to(dtobj, day):
+    # 保留 dtobj 的时分秒部分
+    return dtobj + dt.timedelta(days=(day.date() - dtobj.date()).days)
+
+
 def next_onday(dtobj):
     dtobj = _date_check(dtobj, check=True)
-    dtobj += dt.timedelta(1)
-    while dtobj.strftime("%Y-%m-%d") not in opendate_set:
-        dtobj += dt.timedelta(1)
-    return dtobj
+    return _move_to(dtobj, opendate_cal.next_open(dtobj))
 
 
 def last_onday(dtobj):
     dtobj = _date_check(dtobj, check=True)
-    dtobj -= dt.timedelta(1)
-    while dtobj.strftime("%Y-%m-%d") not in opendate_set:
-        dtobj -= dt.timedelta(1)
-    return dtobj
+    return _move_to(dtobj, opendate_cal.prev_open(dtobj))
 
 
 def avail_dates(dtlist, future=False):
@@ -302,7 +779,7 @@ def avail_dates(dtlist, future=False):
     """
     ndtlist = []
     for d in dtlist:
-        if d.strftime("%Y-%m-%d") not in opendate_set:
+        if not opendate_cal.is_open(d):
             nd = next_onday(d)
         else:
             nd = d
@@ -400,19 +877,86 @@ def reconnect(tries=5, timeout=12):
     return robustify
 
 
-rget = reconnect()(requests.get)
-rpost = reconnect()(requests.post)
+_session = None
+_session_conf = {"pool_connections": 10, "pool_maxsize": 10, "max_retries": 0}
+_session_lock = threading.Lock()
+
+
+def set_session(pool_connections=10, pool_maxsize=10, max_retries=0, session=None):
+    """
+    设定 rget, rpost 等网络请求共享的 requests.Session 连接池，保持长连接，避免每次请求重新建立 TCP 和 TLS 连接。
+
+    :param pool_connections: int. 连接池缓存的不同 host 的数目
+    :param pool_maxsize: int. 每个 host 连接池保持的最大连接数，多线程并发抓取时应不小于线程数
+    :param max_retries: int. 连接层的自动重试次数，默认 0，外层 :func:`reconnect` 已经负责重试
+    :param session: Optional[requests.Session]. 直接提供自定义的 session，此时忽略以上参数
+    :return: None.
+    """
+    global _session
+    with _session_lock:
+        _session_conf["pool_connections"] = pool_connections
+        _session_conf["pool_maxsize"] = pool_maxsize
+        _session_conf["max_retries"] = max_retries
+        # 只替换引用而不关闭旧 session，其他线程可能仍在用它发送请求，由垃圾回收释放连接
+        _session = session
+
+
+def get_session():
+    """
+    获取共享的 requests.Session，首次调用时按 :func:`set_session` 的设定创建
+
+    :return: requests.Session
+    """
+    global _session
+    session = _session
+    if session is None:
+        # 多线程首次请求时只创建一个 session，双重检查避免之后的每次调用都加锁
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                # 与直接调用 requests.get 保持一致，不在请求间保留服务器设置的 cookie
+                s.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                max_retries = _session_conf["max_retries"]
+                if max_retries:
+                    max_retries = Retry(
+                        total=max_retries,
+                        backoff_factor=0.5,
+                        status_forcelist=[500, 502, 503, 504],
+                        allowed_methods=None,
+                    )
+                adapter = HTTPAdapter(
+                    pool_connections=_session_conf["pool_connections"],
+                    pool_maxsize=_session_conf["pool_maxsize"],
+                    max_retries=max_retries,
+                )
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+            session = _session
+    return session
+
+
+def _get(*args, **kws):
+    return get_session().get(*args, **kws)
+
+
+def _post(*args, **kws):
+    return get_session().post(*args, **kws)
+
+
+rget = reconnect()(_get)
+rpost = reconnect()(_post)
 
 
 @reconnect()
 def rget_json(*args, **kws):
-    r = requests.get(*args, **kws)
+    r = _get(*args, **kws)
     return r.json()
 
 
 @reconnect()
 def rpost_json(*args, **kws):
-    r = requests.post(*args, **kws)
+    r = _post(*args, **kws)
     return r.json()
 
 
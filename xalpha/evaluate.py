@@ -6,6 +6,7 @@ modules for evaluation and comparison on multiple object with price dataframe
 from pyecharts.charts import HeatMap, Line
 
 from xalpha.cons import convert_date, heatmap_opts, line_opts, yesterdayobj
+from xalpha.info import load_funds
 
 
 class evaluate:
@@ -14,13 +15,18 @@ class evaluate:
     更进一步，也可讲做过 bcmkset 的 :class:`xalpha.multiple.mulfix` 类作为输入，只不过此时需要提前额外指定以下该对象的 name 和 code 两个属性。
     由于该类需要各基金净值表可以严格对齐，因此需要对节假日和国内不同的 QDII 基金进行补齐，由于第一个基金为基准，因此第一个输入不建议是 QDII 基金
 
-    :param fundobjs: info object，或者如前所述一切具有 price 表的对象
+    :param fundobjs: info object，或者如前所述一切具有 price 表的对象。也可以直接给出基金代码字符串，
+        这些基金由 :func:`xalpha.info.load_funds` 批量载入，与其他组合共享净值表
     :param start: date string or object, 比较的起始时间，默认使用所有 price 表中最近的起始时间。
         但需要注意，由于拉取的基金净值表，往往在开始几天缺失净值数据，即使使用默认时间也可能无法对齐所有净值数据。
         因此建议手动设置起始时间到最近的起始时间一周后左右。
     """
 
     def __init__(self, *fundobjs, start=None):
+        codes = [f for f in fundobjs if isinstance(f, str)]
+        if codes:
+            infos = load_funds(codes)
+            fundobjs = tuple(infos[f] if isinstance(f, str) else f for f in fundobjs)
         self.fundobjs = fundobjs
         self.totprice = (
             self.fundobjs[0]
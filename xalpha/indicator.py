@@ -73,12 +73,13 @@ class indicator:
         generate price table for mulfix class, the cinfo class has this attr by default
         """
         if getattr(self, "price", None) is None:  # 基金组合类，而非基金信息类
-            times = pd.date_range(self.totcftable.iloc[0].date, yesterdayobj())
-            netvalue = []
-            for date in times:
-                netvalue.append(self.unitvalue(date))  # may take a long time
-            self.price = pd.DataFrame(data={"date": times, "netvalue": netvalue})
-            self.price = self.price[self.price["date"].isin(opendate_dt)]
+            start = self.totcftable.iloc[0].date
+            times = opendate_dt[
+                (opendate_dt >= start) & (opendate_dt <= yesterdayobj())
+            ]
+            self.price = pd.DataFrame(
+                data={"date": times, "netvalue": self.unitvalues(times)}
+            )
             self.name = name
 
     def comparison(self, date=yesterdayobj()):
@@ -255,6 +256,14 @@ class indicator:
 
     ## 以上基本为聚宽提供的整体量化指标，以下是其他短线技术面指标
 
+    def _own_price(self):
+        """
+        price 表与其他对象共享时（如 :func:`xalpha.info.load_funds` 返回的对象），原地写入前先复制一份，
+        以免修改影响到共享同一净值表的其他对象
+        """
+        if self.price is getattr(self, "_shared_price", None):
+            self.price = self.price.copy()
+
     def ma(self, window=5, col="netvalue"):
         """
         移动平均线指标
@@ -263,6 +272,7 @@ class indicator:
         :param window: the date window of the MA calculation
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         self.price["MA" + str(window)] = self.price[col].rolling(window=window).mean()
 
     def md(self, window=5, col="netvalue"):
@@ -273,6 +283,7 @@ class indicator:
         :param window: the date window of the MD calculation
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         self.price["MD" + str(window)] = self.price[col].rolling(window=window).std()
 
     def ema(self, window=5, col="netvalue"):
@@ -283,6 +294,7 @@ class indicator:
         :param window: the span of date, where the decay factor alpha=2/(1+window)
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         self.price["EMA" + str(window)] = self.price[col].ewm(span=window).mean()
 
     def macd(self, fast_window=12, slow_window=26, signal_window=9, col="netvalue"):
@@ -295,6 +307,7 @@ class indicator:
         :param signal_window: int, the ema window of the signal line
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         EMAfast = pd.Series(self.price[col].ewm(span=fast_window).mean())
         EMAslow = pd.Series(self.price[col].ewm(span=slow_window).mean())
         # 短期ema和长期ema的差
@@ -315,6 +328,7 @@ class indicator:
         :param window: int, the difference between price now and window days ago
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         self.price["MTM" + str(window)] = self.price[col].diff(window)
 
     def roc(self, window=10, col="netvalue"):
@@ -325,6 +339,7 @@ class indicator:
         :param window: int, the change rate between price now and window days ago
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         abdiff = self.price[col].diff(window)
         deno = self.price[col].shift(window)
         reladiff = pd.Series(abdiff / deno)
@@ -339,6 +354,7 @@ class indicator:
         :param deviation: int or float, how many times deviation of sigma
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         self.ma(window=window, col=col)
         self.md(window=window, col=col)
         self.price["BOLL_UPPER"] = (
@@ -356,6 +372,7 @@ class indicator:
         :param window: int, MA_window
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         self.ma(window=window, col=col)
         self.price["BIAS" + str(window)] = (
             self.price[col] - self.price["MA" + str(window)]
@@ -369,6 +386,7 @@ class indicator:
         :param window: int, MA_window
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         i = 0
         UpI = [0]
         DoI = [0]
@@ -401,6 +419,7 @@ class indicator:
         :param d_window: int
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         roll = self.price[col].rolling(window=rsv_window)
         rsv = (self.price[col] - roll.min()) / (roll.max() - roll.min())
         k = rsv.rolling(window=k_window).mean()
@@ -418,6 +437,7 @@ class indicator:
         :param window: int
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         roll = self.price[col].rolling(window=window)
         wnr = (self.price[col] - roll.min()) / (roll.max() - roll.min())
         self.price["WNR" + str(window)] = wnr
@@ -432,6 +452,7 @@ class indicator:
         :param ama_window:  int
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         dma = (
             self.price[col].rolling(window=fast_window).mean()
             - self.price[col].rolling(window=slow_window).mean()
@@ -447,6 +468,7 @@ class indicator:
 
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         bbi = self.price[col].rolling(3).mean()
         bbi = bbi + self.price[col].rolling(6).mean()
         bbi = bbi + self.price[col].rolling(12).mean()
@@ -462,6 +484,7 @@ class indicator:
         :param window: int
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         tr = self.price[col].ewm(span=window).mean()
         tr = tr.ewm(span=window).mean()
         tr = tr.ewm(span=window).mean()
@@ -479,6 +502,7 @@ class indicator:
         :param ma_window: int
         :param col: string, column name in dataframe you want to calculate
         """
+        self._own_price()
         psy = self.price[col].rolling(count_window + 1).aggregate(_upcount)
         psyma = psy.rolling(ma_window).mean()
         self.price["PSY" + str(count_window)] = psy
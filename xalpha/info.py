@@ -3,24 +3,37 @@
 modules of info class, including cashinfo, indexinfo and fundinfo class
 """
 
+import io
 import os
+import copy
 import datetime as dt
+import ast
 import json
 import re
 import logging
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 from sqlalchemy import exc
 
 import xalpha.remain as rm
 from xalpha.cons import (
+    atomic_write,
     convert_date,
+    csv_append,
     droplist,
+    file_lock,
+    last_onday,
     myround,
     opendate_dt,
     pd_to_datetime,
+    read_complete,
     yesterdaydash,
     yesterdayobj,
     today_obj,
@@ -32,6 +45,9 @@ from xalpha.exceptions import FundTypeError, TradeBehaviorError, ParserFailure
 from xalpha.indicator import indicator
 
 _warnmess = "Something weird on redem fee, please adjust self.segment by hand"
+_feecache = {}  # code -> (抓取时的最近交易日, 解析后的赎回费信息)
+# (class, code, IO 选项) -> {"stamp": 最近交易日, "state": 读取缓存并增量更新后的属性}
+_info_memo = {}
 logger = logging.getLogger(__name__)
 
 
@@ -85,6 +101,103 @@ def _nfloat(string):
     return result
 
 
+_lsjz_maxper = 20  # 天天基金 lsjz 历史净值接口单页最多返回的条数
+
+
+def _lsjz_rows(code, lastdate, ncols, nrows):
+    """
+    从天天基金 lsjz 历史净值接口按日期倒序抓取晚于 lastdate 的各行。
+    每页按 min(nrows + 1, 单页上限) 条请求，多出的一条留给可能已经公布的今日净值，
+    预计行数不超过单页上限时只需一次请求。首页首行为今天时所需行数加一，
+    遇到不晚于 lastdate 的行或已取满所需行数即停止翻页。
+
+    :param code: str. 六位基金代码
+    :param lastdate: pd.Timestamp. 已有数据的最后一天
+    :param ncols: int. 每行的单元格数，净值型基金为 7，货币基金为 6
+    :param nrows: int. 截至昨天最多可能需要的行数，一般为距 lastdate 的自然日数
+    :returns: List[List[bs4.element.Tag]], 每行的单元格，按日期倒序
+    """
+    per = max(1, min(nrows + 1, _lsjz_maxper))
+    rows = []
+    pg = 1
+    while True:
+        con = rget(
+            "http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code=%s&page=%s&per=%s"
+            % (code, pg, per)
+        )
+        items = BeautifulSoup(con.text, "lxml").findAll("td")
+        page = [items[ncols * i : ncols * (i + 1)] for i in range(len(items) // ncols)]
+        if (
+            pg == 1
+            and page
+            and dt.datetime.strptime(str(page[0][0].string), "%Y-%m-%d") == today_obj()
+        ):
+            nrows += 1  # 今日净值已经公布
+        for row in page:
+            if pd.Timestamp(str(row[0].string)) <= lastdate:
+                return rows
+            rows.append(row)
+            if len(rows) >= nrows:
+                return rows
+        if len(page) < per:
+            return rows
+        pg += 1
+
+
+_js_var_pattern = re.compile(r"var\s+(\w+)\s*=\s*([^;]*);")
+_js_token_pattern = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|\b(true|false|null)\b"""
+)
+_js_keywords = {"true": "True", "false": "False", "null": "None"}
+
+
+def _js_token(m):
+    """
+    字符串字面量原样保留，true, false 和 null 换为 python 字面量
+    """
+    return m.group(1) or _js_keywords[m.group(2)]
+
+
+def _js_vars(text):
+    """
+    extract all ``var X = ...;`` assignments in a js page in a single pass
+
+    :param text: str, js page such as pingzhongdata of tiantianjijin
+    :returns: Dict[str, str], variable name to the raw js expression
+    """
+    return {m.group(1): m.group(2) for m in _js_var_pattern.finditer(text)}
+
+
+def _js_value(raw):
+    """
+    decode js literals (arrays, objects, strings and numbers) with json, instead of eval
+
+    :param raw: str, the raw js expression
+    :returns: the decoded python object
+    """
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        # 单引号字符串等非 json 字面量，只替换字符串字面量之外的 true, false 和 null
+        return ast.literal_eval(_js_token_pattern.sub(_js_token, raw))
+
+
+def _js_var(jsvars, name, code):
+    try:
+        return _js_value(jsvars[name])
+    except KeyError:
+        raise ParserFailure("no %s found in the page of %s" % (name, code))
+
+
+def _ms_to_bj(timestamps):
+    """
+    js 毫秒时间戳转为北京时间的 datetime64 数组
+    """
+    return pd.to_datetime(
+        np.asarray(timestamps, dtype="int64"), unit="ms"
+    ) + pd.Timedelta(hours=8)
+
+
 class FundReport:
     """
     提供查看各种基金报告的接口
@@ -293,6 +406,31 @@ year={year}&month={month}".format(
     return pd.DataFrame(result)
 
 
+def _fresh_stamp():
+    """
+    内存中基金信息的新鲜度标记，为今天之前的最近交易日，即净值表应当更新到的日期。
+    今天超出交易日历范围时退回今天之前的最近工作日
+    """
+    today = today_obj()
+    stamp = last_onday(today)
+    if (today - stamp).days > 15:  # 最长的节假日休市也不超过两周
+        stamp = today - dt.timedelta(days=1)
+        while stamp.weekday() >= 5:
+            stamp -= dt.timedelta(days=1)
+    return stamp
+
+
+def reset_info_cache():
+    """
+    清空内存中的基金信息缓存，包括已经读取的净值表和赎回费信息，之后构建的 info 对象会重新读取本地缓存并增量更新
+
+    :return: None.
+    """
+    _info_memo.clear()
+    _feecache.clear()
+    price_store.clear()
+
+
 class basicinfo(indicator):
     """
     Base class for info of fund, index or even cash,
@@ -341,22 +479,77 @@ class basicinfo(indicator):
             if xu.ioconf["backend"] == "csv":
                 path = os.path.join(path, xu.ioconf["prefix"] + "INFO-")
         self.format = form
-        if fetch is False:
-            self._basic_init()  # update self. name rate and price table
-        else:
-            try:
-                self.fetch(path, self.format)
-                df = self.update()  # update the price table as well as the file
+        memokey = None
+        if fetch:
+            # 同一会话内重复构建时，直接使用内存中的结果，无需重新读取本地缓存
+            memokey = (type(self), self.code, _io_key(fetch, save, path, form))
+            self._memokey = memokey
+            if self._memo_restore(memokey, path, save):
+                return
+        before = dict(self.__dict__)
+        # 读取，增量更新和写回的整个过程持有该基金缓存文件的锁，避免多个进程交错写入
+        lock = self._io_lock(path) if (fetch or save) else nullcontext()
+        with lock:
+            if fetch is False:
+                self._basic_init()  # update self. name rate and price table
+            else:
+                try:
+                    self.fetch(path, self.format)
+                    df = self.update()  # update the price table as well as the file
+                    if (df is not None) and save is True:
+                        self.save(path, self.format, option="a", delta=df)
+
+                except (FileNotFoundError, exc.ProgrammingError, exc.OperationalError):
+                    logger.info("no saved copy of %s" % self.code)
+                    fetch = False
+                    self._basic_init()
+
+            if (save is True) and (fetch is False or self._header_stale()):
+                self.save(path, self.format)
+        if memokey is not None:
+            state = {
+                k: v
+                for k, v in self.__dict__.items()
+                if k not in before or before[k] is not v
+            }
+            _info_memo[memokey] = {"stamp": _fresh_stamp(), "state": state}
+            # 与内存中的结果共享 price 表，原地修改前由 _own_price 复制一份
+            self._shared_price = self.price
+
+    def _memo_restore(self, memokey, path, save):
+        """
+        从内存中恢复同一基金此前构建的结果。上次检查之后又过了交易日时（如 QDII 基金或净值尚未公布），
+        在内存中的净值表上增量更新，每个交易日至多请求一次
+
+        :return: bool, 内存中是否有该基金
+        """
+        memo = _info_memo.get(memokey)
+        if memo is None:
+            return False
+        self.__dict__.update(memo["state"])
+        stamp = _fresh_stamp()
+        if memo["stamp"] != stamp:
+            with self._io_lock(path):
+                df = self.update()
                 if (df is not None) and save is True:
                     self.save(path, self.format, option="a", delta=df)
+            if df is not None:
+                memo["state"]["price"] = self.price
+            memo["stamp"] = stamp
+        if save is True and self._header_stale():
+            with self._io_lock(path):
+                self.save(path, self.format)
+            memo["state"]["_saved_fee"] = self._saved_fee
+        self._shared_price = self.price
+        return True
+
+    def _header_stale(self):
+        """
+        开启 save 时，本地缓存的头部信息是否需要随写回一并更新，子类可在此补全需要写入头部的信息
 
-            except (FileNotFoundError, exc.ProgrammingError, exc.OperationalError):
-                logger.info("no saved copy of %s" % self.code)
-                fetch = False
-                self._basic_init()
-
-        if (save is True) and (fetch is False):
-            self.save(path, self.format)
+        :return: bool
+        """
+        return False
 
     def _basic_init(self):
         """
@@ -368,6 +561,64 @@ class basicinfo(indicator):
         # self.price = pd.DataFrame(data={'date':[],'netvalue':[],'comment':[]})
         raise NotImplementedError
 
+    def _price_dates(self):
+        """
+        price 表日期列的有序数组，price 表被替换或行数变化时重建
+        """
+        price = self.price
+        if getattr(self, "_price_index_src", None) is not price or len(
+            self._price_index
+        ) != len(price):
+            self._price_index = price["date"].to_numpy()
+            self._price_index_src = price
+        return self._price_index
+
+    def price_pos(self, date, side="left"):
+        """
+        在 price 表中二分定位日期
+
+        :param date: string or object of date
+        :param side: str. "left" 返回首个日期不早于 date 的行号，"right" 返回首个日期晚于 date 的行号，
+            此时减一即为日期不晚于 date 的最后一行
+        :return: int, 可能等于 price 表的行数
+        """
+        return int(
+            self._price_dates().searchsorted(
+                np.datetime64(convert_date(date), "ns"), side=side
+            )
+        )
+
+    def price_on_or_after(self, date):
+        """
+        price 表中日期不早于 date 的第一行，没有时返回 None
+
+        :param date: string or object of date
+        :return: Optional[pd.Series]
+        """
+        i = self.price_pos(date)
+        if i == len(self.price):
+            return None
+        return self.price.iloc[i]
+
+    def price_on_or_before(self, date):
+        """
+        price 表中日期不晚于 date 的最后一行，没有时返回 None
+
+        :param date: string or object of date
+        :return: Optional[pd.Series]
+        """
+        i = self.price_pos(date, side="right")
+        if i == 0:
+            return None
+        return self.price.iloc[i - 1]
+
+    def _trade_row(self, date):
+        # 交易日为不早于 date 的第一个净值日，date 晚于全部净值日时取最后一行
+        row = self.price_on_or_after(date)
+        if row is None:
+            return self.price.iloc[-1]
+        return row
+
     def shengou(self, value, date, fee=None):
         """
         give the realdate deltacash deltashare tuple based on purchase date and purchase amount
@@ -383,7 +634,7 @@ class basicinfo(indicator):
         """
         if fee is None:
             fee = self.rate
-        row = self.price[self.price["date"] >= date].iloc[0]
+        row = self.price.iloc[self.price_pos(date)]
         share = _shengoucal(value, fee, row.netvalue, label=self.round_label + 1)[1]
         return (row.date, -myround(value), share)
 
@@ -407,11 +658,7 @@ class basicinfo(indicator):
         if self.value_label == 0 or value_label == 0:
             return self._shuhui_by_share(share, date, rem)
         elif self.value_label == 1:  # 按金额赎回，仅支持无赎回费的货币基金
-            partprice = self.price[self.price["date"] >= date]
-            if len(partprice) == 0:
-                row = self.price[self.price["date"] < date].iloc[-1]
-            else:
-                row = partprice.iloc[0]
+            row = self._trade_row(date)
             share = share / row.netvalue
             return self._shuhui_by_share(share, date, rem, fee=fee)
 
@@ -422,11 +669,7 @@ class basicinfo(indicator):
             sh = tots
         else:
             sh = share
-        partprice = self.price[self.price["date"] >= date]
-        if len(partprice) == 0:
-            row = self.price[self.price["date"] < date].iloc[-1]
-        else:
-            row = partprice.iloc[0]
+        row = self._trade_row(date)
         value = myround(sh * row.netvalue)
         if fee is not None:
             value = (1 - fee) * value
@@ -459,22 +702,26 @@ class basicinfo(indicator):
         if form is None:
             form = self.format
         if form == "csv" and option == "r":
-            self._save_csv(path)
+            with self._io_lock(path, form):
+                self._save_csv(path)
         elif form == "csv" and option == "a":
-            self._save_csv_a(path, delta)
+            with self._io_lock(path, form):
+                self._save_csv_a(path, delta)
         elif form == "sql" and option == "r":
             self._save_sql(path)
         elif form == "sql" and option == "a":
             self._save_sql_a(path, delta)
 
     def _save_csv_a(self, path, df):
-        df.sort_index(axis=1).to_csv(
-            path + self.code + ".csv",
-            mode="a",
-            header=None,
-            index=False,
-            date_format="%Y-%m-%d",
-        )
+        # 追加前截去上次中途崩溃留下的残行
+        with csv_append(path + self.code + ".csv"):
+            df.sort_index(axis=1).to_csv(
+                path + self.code + ".csv",
+                mode="a",
+                header=None,
+                index=False,
+                date_format="%Y-%m-%d",
+            )
 
     def _save_sql_a(self, path, df):
         df.sort_index(axis=1).to_sql(
@@ -492,10 +739,25 @@ class basicinfo(indicator):
         if form is None:
             form = self.format
         if form == "csv":
-            self._fetch_csv(path)
+            with self._io_lock(path, form):
+                self._fetch_csv(path)
         elif form == "sql":
             self._fetch_sql(path)
 
+    def _io_lock(self, path, form=None):
+        """
+        csv 缓存文件的跨进程锁，同一线程内可重入，sql 的并发由数据库处理
+
+        :param path: string of the folder path prefix or engine
+        :param form: string, option:'csv' or 'sql'
+        :return: context manager
+        """
+        if form is None:
+            form = self.format
+        if form == "csv":
+            return file_lock(path + self.code + ".csv")
+        return nullcontext()
+
     def update(self):
         """
         对类的价格表进行增量更新，并进行增量存储，适合 fetch 打开的情形
@@ -519,6 +781,7 @@ class fundinfo(basicinfo):
     :param save: boolean, when open the save option, automatically save the class to files
     :param path: string, the file path prefix of IO
     :param form: string, the format of IO, options including: 'csv'
+    :param priceonly: **Deprecated**, 赎回费信息已改为首次访问时才抓取，该参数不再起作用
     """
 
     def __init__(
@@ -530,7 +793,7 @@ class fundinfo(basicinfo):
         save=False,
         path="",
         form="csv",
-        priceonly=False,
+        priceonly=None,
     ):
         if round_label == 1 or (code in droplist):
             label = 1  # the scheme of round down on share purchase
@@ -551,8 +814,12 @@ class fundinfo(basicinfo):
         self._feeurl = (
             "http://fund.eastmoney.com/f10/jjfl_" + code + ".html"
         )  # html url for trade fees info of certain fund
-        self.priceonly = priceonly
-        self.purchase_status = "未知"
+        if priceonly is not None:
+            warnings.warn(
+                "priceonly is deprecated and has no effect, fee info is fetched lazily",
+                DeprecationWarning,
+                stacklevel=2,
+            )
 
         super().__init__(
             code,
@@ -564,17 +831,6 @@ class fundinfo(basicinfo):
             dividend_label=dividend_label,
         )
 
-        # Proactively refresh status if caching an old or incomplete status
-        if not self.priceonly:
-            if (
-                self.purchase_status == "未知"
-                or (
-                    "限大额" in self.purchase_status and "(" not in self.purchase_status
-                )
-                or ("暂停申购" in self.purchase_status and "(" in self.purchase_status)
-            ):
-                self._feepreprocess()
-
         self.special = self.price[self.price["comment"] != 0]
         self.specialdate = list(self.special["date"])
         # date with nonvanishing comment, usually fenhong or zhesuan
@@ -594,53 +850,36 @@ class fundinfo(basicinfo):
         if self._page.text[:800].find("Data_millionCopiesIncome") >= 0:
             raise FundTypeError("This code seems to be a mfund, use mfundinfo instead")
 
-        l = re.match(
-            r"[\s\S]*Data_netWorthTrend = ([^;]*);[\s\S]*", self._page.text
-        ).groups()[0]
-        l = l.replace(
-            "null", "None"
-        )  # 暂未发现基金净值有 null 的基金，若有，其他地方也很可能出问题！
-        l = eval(l)
-        ltot = re.match(
-            r"[\s\S]*Data_ACWorthTrend = ([^;]*);[\s\S]*", self._page.text
-        ).groups()[
-            0
-        ]  # .* doesn't match \n
-        ltot = ltot.replace("null", "None")  ## 096001 总值数据中有 null！
-        ltot = eval(ltot)
+        jsvars = _js_vars(self._page.text)
+        l = pd.DataFrame(_js_var(jsvars, "Data_netWorthTrend", self.code))
+        if len(l) == 0:
+            raise ParserFailure("no price table found for this fund %s" % self.code)
+        # 096001 总值数据中有 null！
+        ltot = _js_var(jsvars, "Data_ACWorthTrend", self.code)
         ## timestamp transform tzinfo must be taken into consideration
-        tz_bj = dt.timezone(dt.timedelta(hours=8))
         infodict = {
-            "date": [
-                dt.datetime.fromtimestamp(int(d["x"]) / 1e3, tz=tz_bj).replace(
-                    tzinfo=None
-                )
-                for d in l
-            ],
-            "netvalue": [float(d["y"]) for d in l],
-            "comment": [_nfloat(d["unitMoney"]) for d in l],
+            "date": _ms_to_bj(l["x"]),
+            "netvalue": l["y"].to_numpy(dtype=float),
         }
+        # 只有分红，折算等特殊日需要解析 comment
+        unitmoney = l["unitMoney"].fillna("")
+        comment = [0] * len(l)
+        for i in np.flatnonzero((unitmoney != "").to_numpy()):
+            comment[i] = _nfloat(unitmoney.iloc[i])
+        infodict["comment"] = comment
 
         if len(l) == len(
             ltot
         ):  # 防止总值和净值数据量不匹配，已知有该问题的基金：502010
-            infodict["totvalue"] = [d[1] for d in ltot]
+            infodict["totvalue"] = pd.DataFrame(ltot)[1].to_numpy()
 
         try:
-            rate = float(
-                eval(
-                    re.match(
-                        r"[\s\S]*fund_Rate=([^;]*);[\s\S]*", self._page.text
-                    ).groups()[0]
-                )
-            )
+            rate = float(_js_var(jsvars, "fund_Rate", self.code))
         except ValueError:
             rate = 0
             logger.info("warning: this fund has no data for rate")  # know cases: ETF
 
-        name = eval(
-            re.match(r"[\s\S]*fS_name = ([^;]*);[\s\S]*", self._page.text).groups()[0]
-        )
+        name = _js_var(jsvars, "fS_name", self.code)
 
         self.rate = rate
         # shengou rate in tiantianjijin, daeshengou rate discount is not considered
@@ -651,14 +890,133 @@ class fundinfo(basicinfo):
         if len(df) == 0:
             raise ParserFailure("no price table found for this fund %s" % self.code)
         self.price = df[df["date"] <= yesterdaydash()]
-        # deal with the redemption fee attrs finally
-        if not self.priceonly:
-            self._feepreprocess()
+        # 赎回费信息在首次访问 feeinfo, segment 或 purchase_status 时才抓取
+
+    # 赎回费相关属性，None 代表尚未加载
+    _feeinfo = None
+    _segment = None
+    _purchase_status = None
+    _fee_date = None  # 赎回费页面的抓取日期
+    _saved_fee = None  # 本地缓存头部已有的赎回费信息
+
+    @property
+    def feeinfo(self):
+        if self._feeinfo is None:
+            self._load_fee()
+        return self._feeinfo
+
+    @feeinfo.setter
+    def feeinfo(self, value):
+        self._feeinfo = value
+
+    @property
+    def segment(self):
+        if self._segment is None:
+            self._load_fee()
+        return self._segment
+
+    @segment.setter
+    def segment(self, value):
+        self._segment = value
+
+    @property
+    def purchase_status(self):
+        if self._purchase_status is None:
+            self._load_fee()
+        return self._purchase_status
+
+    @purchase_status.setter
+    def purchase_status(self, value):
+        self._purchase_status = value
+
+    @staticmethod
+    def _fee_stale(saveinfo):
+        """
+        判断缓存的赎回费信息是否缺失或申购状态格式过旧，需要重新抓取。
+        申购状态未知的基金当天已经抓取过时不再重复抓取
+        """
+        status = saveinfo.get("purchase_status") or "未知"
+        fetched_today = saveinfo.get("fee_date") == today_obj().strftime("%Y%m%d")
+        return (
+            saveinfo.get("feeinfo") is None
+            or saveinfo.get("segment") is None
+            or (status == "未知" and not fetched_today)
+            or ("限大额" in status and "(" not in status)
+            or ("暂停申购" in status and "(" in status)
+        )
+
+    def _fee_header(self):
+        """
+        写入本地缓存头部的赎回费信息
+        """
+        return {
+            "feeinfo": self._feeinfo,
+            "segment": self._segment,
+            "purchase_status": self._purchase_status,
+            "fee_date": self._fee_date,
+        }
+
+    def _restore_fee(self, saveinfo):
+        """
+        从本地缓存的头部信息恢复赎回费属性，缓存过旧时留待下次访问重新抓取
+        """
+        self._saved_fee = {k: saveinfo.get(k) for k in self._fee_header()}
+        if self._fee_stale(saveinfo):
+            return
+        self._segment = saveinfo["segment"]
+        self._feeinfo = saveinfo["feeinfo"]
+        self._purchase_status = saveinfo["purchase_status"]
+        self._fee_date = saveinfo.get("fee_date")
+
+    def _load_fee(self):
+        """
+        抓取并解析赎回费页面，只填充内存中尚未设定的属性，手动 set_feeinfo 的结果不会被覆盖。
+        解析结果按最近交易日缓存在内存中。这里不读写本地缓存，开启 save 时由之后的写回一并存入缓存头部，
+        见 :meth:`_header_stale`
+        """
+        stamp = _fresh_stamp()
+        cached = _feecache.get(self.code)
+        if cached is not None and cached[0] == stamp:
+            fee = cached[1]
+        else:
+            fee = self._feepreprocess()
+            _feecache[self.code] = (stamp, fee)
+        self._fill_fee(fee)
+        memo = _info_memo.get(getattr(self, "_memokey", None))
+        if memo is not None:
+            # 之后从内存恢复的对象直接带有赎回费信息，无需再次加载
+            state = memo["state"]
+            for k, v in self._fee_header().items():
+                if state.get("_" + k) is None:
+                    state["_" + k] = copy.deepcopy(v)
+
+    def _fill_fee(self, fee):
+        if self._feeinfo is None:
+            self._feeinfo = list(fee["feeinfo"])
+        if self._segment is None:
+            self._segment = fundinfo._piecewise(self._feeinfo)
+        if self._purchase_status is None:
+            self._purchase_status = fee["purchase_status"]
+        if self._fee_date is None:
+            self._fee_date = fee["fee_date"]
+
+    def _header_stale(self):
+        """
+        缓存头部缺少赎回费信息时，用内存中当日已经抓取的结果补全，不发起请求
+
+        :return: bool, 内存中的赎回费信息与缓存头部不同，需要随写回一并更新
+        """
+        if self._feeinfo is None:
+            cached = _feecache.get(self.code)
+            if cached is not None and cached[0] == _fresh_stamp():
+                self._fill_fee(cached[1])
+        return self._feeinfo is not None and self._fee_header() != self._saved_fee
 
     def _feepreprocess(self):
         """
-        Preprocess to add self.feeinfo and self.segment attr according to redemption fee info
+        Preprocess the redemption fee page into a dict of feeinfo, segment and purchase_status
         """
+        purchase_status = "未知"
         feepage = rget(self._feeurl)
         soup = BeautifulSoup(
             feepage.text, "lxml"
@@ -674,11 +1032,11 @@ class fundinfo(basicinfo):
                 elif "日累计申购限额" in text:
                     limit_td = item
             if td:
-                self.purchase_status = td.find_next_sibling("td").get_text(strip=True)
-            if limit_td and "暂停申购" not in self.purchase_status:
+                purchase_status = td.find_next_sibling("td").get_text(strip=True)
+            if limit_td and "暂停申购" not in purchase_status:
                 limit = limit_td.find_next_sibling("td").get_text(strip=True)
                 if limit and limit not in ["无限额", "---"]:
-                    self.purchase_status += f" ({limit})"
+                    purchase_status += f" ({limit})"
         except Exception:
             logger.info("warning: purchase status extraction failed for %s" % self.code)
 
@@ -686,9 +1044,9 @@ class fundinfo(basicinfo):
         if not soup.findAll("a", {"name": "shfl"}):
             somethingwrong = True
             logger.warning("%s 基金赎回信息为空，可能由于该基金已终止运作" % self.code)
-            self.feeinfo = []
+            feeinfo = []
         else:
-            self.feeinfo = [
+            feeinfo = [
                 item.string
                 for item in soup.findAll("a", {"name": "shfl"})[
                     0
@@ -697,10 +1055,10 @@ class fundinfo(basicinfo):
             ]
         # this could be [], known case 510030
 
-        if not self.feeinfo or len(self.feeinfo) % 2 != 0:
+        if not feeinfo or len(feeinfo) % 2 != 0:
             somethingwrong = True
         else:
-            for item in self.feeinfo:
+            for item in feeinfo:
                 if (
                     "开放期" in item
                     or "封闭" in item
@@ -712,20 +1070,26 @@ class fundinfo(basicinfo):
         if somethingwrong:
             logger.warning(
                 "%s 赎回费信息异常，多是因为定开基金，封闭基金或场内 ETF: %s"
-                % (self.code, self.feeinfo)
+                % (self.code, feeinfo)
             )
-            self.feeinfo = ["小于7天", "1.50%", "大于等于7天", "0.00%"]
-        # print(self.feeinfo)
+            feeinfo = ["小于7天", "1.50%", "大于等于7天", "0.00%"]
+        # print(feeinfo)
         try:
-            self.segment = fundinfo._piecewise(self.feeinfo)
+            segment = fundinfo._piecewise(feeinfo)
         except (ValueError, IndexError):
             logger.warning(
                 "%s 赎回费信息抓取异常，请手动设定 ``self.segment`` 和 ``self.feeinfo``: %s"
-                % (self.code, self.feeinfo)
+                % (self.code, feeinfo)
             )
             # below is default one
-            self.feeinfo = ["小于7天", "1.50%", "大于等于7天", "0.00%"]
-            self.segment = fundinfo._piecewise(self.feeinfo)
+            feeinfo = ["小于7天", "1.50%", "大于等于7天", "0.00%"]
+            segment = fundinfo._piecewise(feeinfo)
+        return {
+            "feeinfo": feeinfo,
+            "segment": segment,
+            "purchase_status": purchase_status,
+            "fee_date": today_obj().strftime("%Y%m%d"),
+        }
 
     @staticmethod
     def _piecewise(a):
@@ -814,7 +1178,11 @@ class fundinfo(basicinfo):
         :param date: “%Y%m%d”
         :param value:
         """
-        self.price.loc[self.price["date"] == date, col] = value
+        i = self.price_pos(date)
+        j = self.price_pos(date, side="right")
+        if j > i:
+            self._own_price()
+            self.price.iloc[i:j, self.price.columns.get_loc(col)] = value
         ## update special in case new comment is added
         self.special = self.price[self.price["comment"] != 0]
         self.specialdate = list(self.special["date"])
@@ -829,12 +1197,8 @@ class fundinfo(basicinfo):
         """
         # 		 value = myround(share*self.price[self.price['date']==date].iloc[0].netvalue)
         date = convert_date(date)
-        partprice = self.price[self.price["date"] >= date]
-        if len(partprice) == 0:
-            row = self.price[self.price["date"] < date].iloc[-1]
-        else:
-            row = partprice.iloc[0]
-        soldrem, _ = rm.sell(rem, share, row.date)
+        row = self._trade_row(date)
+        soldrem, _ = rm.sell(rm.LotBook.from_rem(rem), share, row.date)
         value = 0
         sh = myround(sum([item[1] for item in soldrem]))
         for d, s in soldrem:
@@ -859,22 +1223,18 @@ class fundinfo(basicinfo):
 
         :param path:  string of folder path
         """
-        s = json.dumps(
-            {
-                "feeinfo": self.feeinfo,
-                "name": self.name,
-                "rate": self.rate,
-                "segment": self.segment,
-                "purchase_status": self.purchase_status,
-            }
-        )
+        s = json.dumps({"name": self.name, "rate": self.rate, **self._fee_header()})
         df = pd.DataFrame(
             [[s, 0, 0, 0]], columns=["date", "netvalue", "comment", "totvalue"]
         )
         df = pd.concat([df, self.price], ignore_index=True, sort=True)
-        df.sort_index(axis=1).to_csv(
-            path + self.code + ".csv", index=False, date_format="%Y-%m-%d"
+        atomic_write(
+            path + self.code + ".csv",
+            lambda f: df.sort_index(axis=1).to_csv(
+                f, index=False, date_format="%Y-%m-%d"
+            ),
         )
+        self._saved_fee = self._fee_header()
 
     def _fetch_csv(self, path):
         """
@@ -884,7 +1244,7 @@ class fundinfo(basicinfo):
         :param path:  string of folder path
         """
         try:
-            content = pd.read_csv(path + self.code + ".csv")
+            content = pd.read_csv(io.BytesIO(read_complete(path + self.code + ".csv")))
             pricetable = content.iloc[1:]
             datel = list(pd_to_datetime(pricetable.date))
             self.price = pricetable[["netvalue", "totvalue", "comment"]]
@@ -892,11 +1252,9 @@ class fundinfo(basicinfo):
             saveinfo = json.loads(content.iloc[0].date)
             if not isinstance(saveinfo, dict):
                 raise FundTypeError("This csv doesn't looks like from fundinfo")
-            self.segment = saveinfo["segment"]
-            self.feeinfo = saveinfo["feeinfo"]
+            self._restore_fee(saveinfo)
             self.name = saveinfo["name"]
             self.rate = saveinfo["rate"]
-            self.purchase_status = saveinfo.get("purchase_status", "未知")
         except FileNotFoundError as e:
             # print('no saved copy of fund %s' % self.code)
             raise e
@@ -908,15 +1266,7 @@ class fundinfo(basicinfo):
 
         :param path:  engine object from sqlalchemy
         """
-        s = json.dumps(
-            {
-                "feeinfo": self.feeinfo,
-                "name": self.name,
-                "rate": self.rate,
-                "segment": self.segment,
-                "purchase_status": self.purchase_status,
-            }
-        )
+        s = json.dumps({"name": self.name, "rate": self.rate, **self._fee_header()})
         df = pd.DataFrame(
             [[pd.Timestamp("1990-01-01"), 0, s, 0]],
             columns=["date", "netvalue", "comment", "totvalue"],
@@ -925,6 +1275,7 @@ class fundinfo(basicinfo):
         df.sort_index(axis=1).to_sql(
             "xa" + self.code, con=path, if_exists="replace", index=False
         )
+        self._saved_fee = self._fee_header()
 
     def _fetch_sql(self, path):
         """
@@ -942,11 +1293,9 @@ class fundinfo(basicinfo):
             saveinfo = json.loads(content.iloc[0].comment)
             if not isinstance(saveinfo, dict):
                 raise FundTypeError("This csv doesn't looks like from fundinfo")
-            self.segment = saveinfo["segment"]
-            self.feeinfo = saveinfo["feeinfo"]
+            self._restore_fee(saveinfo)
             self.name = saveinfo["name"]
             self.rate = saveinfo["rate"]
-            self.purchase_status = saveinfo.get("purchase_status", "未知")
         except exc.ProgrammingError as e:
             # print('no saved copy of %s' % self.code)
             raise e
@@ -989,59 +1338,15 @@ class fundinfo(basicinfo):
             diffdays == 0
         ):  ## for some QDII, this value is 1, anyways, trying update is compatible (d+2 update)
             return None
-        self._updateurl = (
-            "http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code="
-            + self.code
-            + "&page=1&per=1"
-        )
-        con = rget(self._updateurl)
-        soup = BeautifulSoup(con.text, "lxml")
-        items = soup.findAll("td")
-        if dt.datetime.strptime(str(items[0].string), "%Y-%m-%d") == today_obj():
-            diffdays += 1
-        if diffdays <= 10:
-            self._updateurl = (
-                "http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code="
-                + self.code
-                + "&page=1&per="
-                + str(diffdays)
-            )
-            con = rget(self._updateurl)
-            soup = BeautifulSoup(con.text, "lxml")
-            items = soup.findAll("td")
-        elif (
-            diffdays > 10
-        ):  ## there is a 20 item per page limit in the API, so to be safe, we query each page by 10 items only
-            items = []
-            for pg in range(1, int(diffdays / 10) + 2):
-                self._updateurl = (
-                    "http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code="
-                    + self.code
-                    + "&page="
-                    + str(pg)
-                    + "&per=10"
-                )
-                con = rget(self._updateurl)
-                soup = BeautifulSoup(con.text, "lxml")
-                items.extend(soup.findAll("td"))
-        else:
+        if diffdays < 0:
             raise TradeBehaviorError(
                 "Weird incremental update: the saved copy has future records"
             )
-
-        date = []
-        netvalue = []
-        totvalue = []
-        comment = []
-        for i in range(int(len(items) / 7)):
-            ts = pd.Timestamp(str(items[7 * i].string))
-            if (ts - lastdate).days > 0:
-                date.append(ts)
-                netvalue.append(_float(items[7 * i + 1].string))
-                totvalue.append(_float(items[7 * i + 2].string))
-                comment.append(_nfloat(items[7 * i + 6].string))
-            else:
-                break
+        rows = _lsjz_rows(self.code, lastdate, 7, diffdays)
+        date = [pd.Timestamp(str(row[0].string)) for row in rows]
+        netvalue = [_float(row[1].string) for row in rows]
+        totvalue = [_float(row[2].string) for row in rows]
+        comment = [_nfloat(row[6].string) for row in rows]
         df = pd.DataFrame(
             {
                 "date": date,
@@ -1475,24 +1780,14 @@ class mfundinfo(basicinfo):
         self._page = rget(self._url)
         if self._page.text[:800].find("Data_fundSharesPositions") >= 0:
             raise FundTypeError("This code seems to be a fund, use fundinfo instead")
-        l = eval(
-            re.match(
-                r"[\s\S]*Data_millionCopiesIncome = ([^;]*);[\s\S]*", self._page.text
-            ).groups()[0]
-        )
-        self.name = re.match(
-            r"[\s\S]*fS_name = \"([^;]*)\";[\s\S]*", self._page.text
-        ).groups()[0]
-        tz_bj = dt.timezone(dt.timedelta(hours=8))
-        datel = [
-            dt.datetime.fromtimestamp(int(d[0]) / 1e3, tz=tz_bj).replace(tzinfo=None)
-            for d in l
-        ]
-        ratel = [float(d[1]) for d in l]
-        netvalue = [1]
-        for dailyrate in ratel:
-            netvalue.append(netvalue[-1] * (1 + dailyrate * 1e-4))
-        netvalue.remove(1)
+        jsvars = _js_vars(self._page.text)
+        l = pd.DataFrame(_js_var(jsvars, "Data_millionCopiesIncome", self.code))
+        self.name = _js_var(jsvars, "fS_name", self.code)
+        if len(l) == 0:
+            raise ParserFailure("no price table for %s" % self.code)
+        datel = _ms_to_bj(l[0])
+        # 与逐日连乘相同
+        netvalue = np.cumprod(1 + l[1].to_numpy(dtype=float) * 1e-4)
 
         df = pd.DataFrame(
             data={
@@ -1519,8 +1814,11 @@ class mfundinfo(basicinfo):
             [[0, 0, self.name, 0]], columns=["date", "netvalue", "comment", "totvalue"]
         )
         df = pd.concat([df, self.price], ignore_index=True, sort=True)
-        df.sort_index(axis=1).to_csv(
-            path + self.code + ".csv", index=False, date_format="%Y-%m-%d"
+        atomic_write(
+            path + self.code + ".csv",
+            lambda f: df.sort_index(axis=1).to_csv(
+                f, index=False, date_format="%Y-%m-%d"
+            ),
         )
 
     def _fetch_csv(self, path):
@@ -1531,7 +1829,7 @@ class mfundinfo(basicinfo):
         :param path:  string of folder path
         """
         try:
-            content = pd.read_csv(path + self.code + ".csv")
+            content = pd.read_csv(io.BytesIO(read_complete(path + self.code + ".csv")))
             pricetable = content.iloc[1:]
             datel = list(pd_to_datetime(pricetable.date))
             self.price = pricetable[["netvalue", "totvalue", "comment"]]
@@ -1585,56 +1883,15 @@ class mfundinfo(basicinfo):
         diffdays = (yesterdayobj() - lastdate).days
         if diffdays == 0:
             return None
-        self._updateurl = (
-            "http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code="
-            + self.code
-            + "&page=1&per=1"
-        )
-        con = rget(self._updateurl)
-        soup = BeautifulSoup(con.text, "lxml")
-        items = soup.findAll("td")
-        if dt.datetime.strptime(str(items[0].string), "%Y-%m-%d") == today_obj():
-            diffdays += 1
-        if diffdays <= 10:
-            # caution: there may be today data!! then a day gap will be in table
-            self._updateurl = (
-                "http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code="
-                + self.code
-                + "&page=1&per="
-                + str(diffdays)
-            )
-            con = rget(self._updateurl)
-            soup = BeautifulSoup(con.text, "lxml")
-            items = soup.findAll("td")
-        elif (
-            diffdays > 10
-        ):  ## there is a 20 item per page limit in the API, so to be safe, we query each page by 10 items only
-            items = []
-            for pg in range(1, int(diffdays / 10) + 2):
-                self._updateurl = (
-                    "http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code="
-                    + self.code
-                    + "&page="
-                    + str(pg)
-                    + "&per=10"
-                )
-                con = rget(self._updateurl)
-                soup = BeautifulSoup(con.text, "lxml")
-                items.extend(soup.findAll("td"))
-        else:
+        if diffdays < 0:
             raise TradeBehaviorError(
                 "Weird incremental update: the saved copy has future records"
             )
-
-        date = []
-        earnrate = []
-        comment = []
-        for i in range(int(len(items) / 6)):
-            ts = pd.Timestamp(str(items[6 * i].string))
-            if (ts - lastdate).days > 0:
-                date.append(ts)
-                earnrate.append(float(items[6 * i + 1].string) * 1e-4)
-                comment.append(_nfloat(items[6 * i + 5].string))
+        # caution: there may be today data!! then a day gap will be in table
+        rows = _lsjz_rows(self.code, lastdate, 6, diffdays)
+        date = [pd.Timestamp(str(row[0].string)) for row in rows]
+        earnrate = [float(row[1].string) * 1e-4 for row in rows]
+        comment = [_nfloat(row[5].string) for row in rows]
         date = date[::-1]
         earnrate = earnrate[::-1]
         comment = comment[::-1]
@@ -1659,6 +1916,216 @@ class mfundinfo(basicinfo):
             return df
 
 
+class PriceStore:
+    """
+    多个组合共享的基金信息存储，每个基金代码只保存一个 info 对象及其净值表，并记录载入时的 IO 选项。
+    :func:`load_funds` 返回的对象均为其中对象的浅拷贝，``price`` 表在各拷贝间共享，
+    ``set_price`` 和技术指标等原地修改 price 表的方法会先复制一份，不影响其他对象。
+    复制后只有该对象的 ``price`` 属性指向新表：:class:`xalpha.trade.trade` 总是经由 aim 读取 price 表，
+    能读到新表，但在复制之前取出的 ``obj.price`` 引用（如 ``df = obj.price``）仍指向原表，看不到此后的修改。
+    基金按载入时的最近交易日标记，进入新的交易日后视为过期，再次载入时会重新获取并替换。
+    QDII 等净值滞后的基金在同一交易日内不会因净值表未更新到最近交易日而被反复获取。
+    """
+
+    def __init__(self):
+        self._infos = {}
+        self._ios = {}
+        self._stamps = {}
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, code):
+        return code in self._infos
+
+    def __len__(self):
+        return len(self._infos)
+
+    def get(self, code):
+        return self._infos.get(code)
+
+    def io(self, code):
+        """
+        该基金载入时的 IO 选项，见 :func:`_io_key`
+
+        :param code: str.
+        :return: Optional[tuple]
+        """
+        return self._ios.get(code)
+
+    def stale(self, code):
+        """
+        该基金是否不在存储中，或载入之后又过了交易日
+
+        :param code: str.
+        :return: bool
+        """
+        return code not in self._infos or self._stamps.get(code) != _fresh_stamp()
+
+    def add(self, code, obj, io=None):
+        """
+        存入 info 对象，若该代码已被其他线程存入且未过期，则返回已有的对象
+
+        :param code: str.
+        :param obj: fundinfo or mfundinfo object.
+        :param io: Optional[tuple]. 载入时的 IO 选项，见 :func:`_io_key`
+        :return: 存储中该代码对应的对象
+        """
+        with self._lock:
+            if self.stale(code) and self._infos.get(code) is not obj:
+                self._infos[code] = obj
+                self._ios[code] = io
+                self._stamps[code] = _fresh_stamp()
+                self._tables = {}
+            return self._infos[code]
+
+    def discard(self, code):
+        """
+        移除某基金，下次载入时重新获取
+
+        :param code: str.
+        """
+        with self._lock:
+            self._ios.pop(code, None)
+            self._stamps.pop(code, None)
+            if self._infos.pop(code, None) is not None:
+                self._tables = {}
+
+    def clear(self):
+        with self._lock:
+            self._infos = {}
+            self._ios = {}
+            self._stamps = {}
+            self._tables = {}
+
+    def table(self, col="netvalue", codes=None):
+        """
+        按日期对齐的宽表，行为各基金净值日期的并集，缺失处为 NaN
+
+        :param col: str. Default "netvalue". price 表中的列名
+        :param codes: Optional[List[str]]. 默认为存储中的全部基金
+        :return: pd.DataFrame, index 为日期，列为基金代码
+        """
+        if codes is None:
+            codes = list(self._infos)
+        key = (col, tuple(codes))
+        if key not in self._tables:
+            df = pd.concat(
+                [
+                    self._infos[code].price.set_index("date")[col].rename(code)
+                    for code in codes
+                ],
+                axis=1,
+                sort=True,
+            )
+            self._tables[key] = df
+        return self._tables[key]
+
+
+price_store = PriceStore()
+
+
+def _io_key(fetch, save, path, form):
+    """
+    info 对象载入时的 IO 选项，不读写本地缓存时路径和格式无关紧要。
+    sqlalchemy engine 以其 url 标识
+
+    :return: tuple
+    """
+    if not (fetch or save):
+        return (False, False, None, None)
+    if not isinstance(path, str):
+        path = path.url.render_as_string(hide_password=False)
+    return (bool(fetch), bool(save), path, form)
+
+
+def _load_fund(code, **kws):
+    if code.startswith("M") and code[1:].isdigit():
+        return mfundinfo(code, **kws)
+    if code.startswith("F") and code[1:].isdigit():
+        code = code[1:]
+    try:
+        return fundinfo(code, **kws)
+    except FundTypeError:
+        return mfundinfo(code, **kws)
+
+
+def load_funds(
+    codes,
+    property=None,
+    fetch=False,
+    save=False,
+    path="",
+    form="csv",
+    max_workers=8,
+    store=None,
+):
+    """
+    批量获取基金信息对象。未在存储中的基金通过线程池并发抓取（或按 :func:`xalpha.universal.set_backend`
+    的设定从本地缓存读取），已经载入且净值表更新到最近交易日的基金不会重复获取，
+    同一基金在多个组合中只在内存中保存一份净值表。存储中的基金以其他的 IO 选项载入时，
+    本次按给定的选项单独获取，不放入存储。
+
+    :param codes: List[str]. 六位基金代码，可带 F 或 M 前缀，M 前缀代表货币基金
+    :param property: Dict[fundcode, property_number]. 含义同 :class:`xalpha.multiple.mul`，只作用于本次返回的对象
+    :param fetch: boolean, when open the fetch option, info class will try fetching from local files first in the init
+    :param save: boolean, when open the save option, info classes automatically save the class to files
+    :param path: string, the file path prefix of IO, or object or engine from sqlalchemy to connect sql database
+    :param form: string, the format of IO, options including: 'csv','sql'
+    :param max_workers: int. Default 8. 线程池的最大线程数，取 1 时顺序获取
+    :param store: Optional[PriceStore]. 默认使用模块级的 ``price_store``
+    :return: Dict[str, Union[fundinfo, mfundinfo]]，键为输入的代码，顺序与输入一致
+    """
+    if store is None:
+        store = price_store
+    if property is None:
+        property = {}
+    codes = list(dict.fromkeys(codes))
+    keys = {}
+    for code in codes:
+        if code[0] in "FM" and code[1:].isdigit():
+            keys[code] = code[1:].zfill(6)
+        else:
+            keys[code] = code.zfill(6)
+    io = _io_key(fetch, save, path, form)
+    missing = [code for code in codes if store.stale(keys[code])]
+    missing = list({keys[code]: code for code in missing}.values())
+    # 以不同的 fetch, save, path 或 form 载入的基金绕过存储
+    bypass = [code for code in codes if store.io(keys[code]) != io]
+    bypass = [c for c in {keys[c]: c for c in bypass}.values() if c not in missing]
+
+    def _fetch(code):
+        return _load_fund(code, fetch=fetch, save=save, path=path, form=form)
+
+    if max_workers is None or max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            objs = list(executor.map(_fetch, missing + bypass))
+    else:
+        objs = [_fetch(code) for code in missing + bypass]
+    bases = {}
+    for code, obj in zip(missing, objs):
+        bases[keys[code]] = store.add(keys[code], obj, io)
+    for code, obj in zip(bypass, objs[len(missing) :]):
+        bases[keys[code]] = obj
+
+    infos = {}
+    for code in codes:
+        base = bases.get(keys[code], store.get(keys[code]))
+        # 各拷贝共享 price 表，原地修改前由 _own_price 复制一份
+        base._shared_price = base.price
+        obj = copy.copy(base)
+        p = property.get(code, property.get(keys[code], 0))
+        round_label = p % 2
+        if isinstance(obj, fundinfo):
+            if round_label == 1 or keys[code] in droplist:
+                round_label = 1
+            obj.dividend_label = (p // 2) % 2
+        else:
+            obj.value_label = (p // 4) % 2
+        obj.round_label = round_label
+        infos[code] = obj
+    return infos
+
+
 FundInfo = fundinfo
 MFundInfo = mfundinfo
 CashInfo = cashinfo
@@ -4,22 +4,35 @@ module for mul and mulfix class: fund combination management
 """
 
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 from pyecharts import options as opts
 from pyecharts.charts import Pie, ThemeRiver
 
-from xalpha.cons import convert_date, myround, yesterdaydash, yesterdayobj
+from sqlalchemy import create_engine
+
+from xalpha.cons import (
+    _session_conf,
+    convert_date,
+    myround,
+    set_session,
+    yesterdaydash,
+    yesterdayobj,
+)
 from xalpha.evaluate import evaluate
 from xalpha.exceptions import FundTypeError, TradeBehaviorError
 from xalpha.record import record, irecord
 from xalpha.indicator import indicator
-from xalpha.info import cashinfo, fundinfo, mfundinfo, get_fund_holdings
+from xalpha.info import cashinfo, fundinfo, mfundinfo, get_fund_holdings, load_funds
 from xalpha.trade import (
     bottleneck,
     trade,
     turnoverrate,
     vtradevolume,
     xirrcal,
+    xirrcal_batch,
     itrade,
     vtradecost,
 )
@@ -29,6 +42,86 @@ import xalpha.universal as xu
 logger = logging.getLogger(__name__)
 
 
+_engines = {}  # url -> sqlalchemy engine, 进程池中每个进程只为同一数据库创建一个 engine
+
+
+def _engine_url(engine):
+    """
+    sqlalchemy engine 无法序列化，跨进程时以包含密码的 url 传递
+    """
+    return engine.url.render_as_string(hide_password=False)
+
+
+def _url_engine(url):
+    if url not in _engines:
+        _engines[url] = create_engine(url)
+    return _engines[url]
+
+
+def _status_trade(code, status, property, fetch, save, path, form):
+    """
+    根据记账单的单列生成 trade 对象，mul 并发构建时的单位任务，需为模块级函数以便进程池调用。
+    sql 形式下 path 可以是 engine 的 url，在本进程中重建 engine
+    """
+    if form == "sql" and isinstance(path, str) and path:
+        path = _url_engine(path)
+    # r1, d2, v4 p = r+d+v
+    p = property.get(code, 0)
+    round_label = p % 2
+    dividend_label = ((p - round_label) / 2) % 2
+    value_label = ((p - round_label - dividend_label) / 4) % 2
+    try:
+        return trade(
+            fundinfo(
+                code,
+                round_label=round_label,
+                dividend_label=dividend_label,
+                fetch=fetch,
+                save=save,
+                path=path,
+                form=form,
+            ),
+            status,
+        )
+    except FundTypeError:
+        return trade(
+            mfundinfo(
+                code,
+                round_label=round_label,
+                value_label=value_label,
+                fetch=fetch,
+                save=save,
+                path=path,
+                form=form,
+            ),
+            status,
+        )
+
+
+def _pool_state():
+    """
+    主进程的缓存后端和连接池设定，sqlalchemy engine 无法序列化，以 url 传递
+    """
+    ioconf = dict(xu.ioconf)
+    url = None
+    path = ioconf.get("path")
+    if path is not None and not isinstance(path, str):
+        url = _engine_url(path)
+        ioconf["path"] = None
+    return ioconf, url, dict(_session_conf)
+
+
+def _pool_init(ioconf, url, session_conf):
+    """
+    进程池 worker 的初始化，spawn 或 forkserver 启动的子进程不继承主进程的 :func:`xalpha.universal.set_backend`
+    和 :func:`xalpha.cons.set_session` 设定，在此重新设定
+    """
+    if url is not None:
+        ioconf["path"] = _url_engine(url)
+    xu.set_backend(**ioconf)
+    set_session(**session_conf)
+
+
 class mul:
     """
     multiple fund positions manage class
@@ -46,6 +139,12 @@ class mul:
     :param save: boolean, when open the save option, info classes automatically save the class to files
     :param path: string, the file path prefix of IO, or object or engine from sqlalchemy to connect sql database
     :param form: string, the format of IO, options including: 'csv','sql'
+    :param workers: int or None. Default 1. 由 status 生成各基金 trade 对象时的并发数，1 为顺序执行，None 由执行器自行决定
+    :param executor: str. Default "thread". "thread" 使用线程池，适合以网络获取为主的情形；
+            "process" 使用进程池，适合本地缓存已就绪而交易处理计算量大的情形，各进程沿用主进程的缓存后端和连接池设定。
+            结果总是按 status 的列顺序排列。
+    :param shared: bool. Default False. 为 True 时，由 status 生成的基金信息经由 :func:`xalpha.info.load_funds` 从共享的
+            ``price_store`` 载入，与其他组合共享净值表（进程池模式除外）；默认各组合构建自己的基金信息对象
     """
 
     def __init__(
@@ -57,7 +156,10 @@ class mul:
         fetch=False,
         save=False,
         path="",
-        form="csv"
+        form="csv",
+        workers=1,
+        executor="thread",
+        shared=False
     ):
         if isinstance(status, record):
             if not property:
@@ -79,46 +181,27 @@ class mul:
             # unless you are sure corresponding funds are added to the droplist
         fundcodelist = [f.code for f in fundtradeobj]
         if status is not None:
-            for code in status.columns:
-                if code == "date" or code.startswith("#"):
-                    continue
-                # r1, d2, v4 p = r+d+v
-                if code in fundcodelist:
-                    continue
-                p = property.get(code, 0)
-                round_label = p % 2
-                dividend_label = ((p - round_label) / 2) % 2
-                value_label = ((p - round_label - dividend_label) / 4) % 2
-                try:
-                    fundtradeobj.append(
-                        trade(
-                            fundinfo(
-                                code,
-                                round_label=round_label,
-                                dividend_label=dividend_label,
-                                fetch=fetch,
-                                save=save,
-                                path=path,
-                                form=form,
-                            ),
-                            status,
-                        )
-                    )
-                except FundTypeError:
-                    fundtradeobj.append(
-                        trade(
-                            mfundinfo(
-                                code,
-                                round_label=round_label,
-                                value_label=value_label,
-                                fetch=fetch,
-                                save=save,
-                                path=path,
-                                form=form,
-                            ),
-                            status,
-                        )
-                    )
+            codes = [
+                code
+                for code in status.columns
+                if code != "date"
+                and not code.startswith("#")
+                and code not in fundcodelist
+            ]
+            fundtradeobj.extend(
+                self._status_trades(
+                    codes,
+                    status,
+                    property,
+                    fetch,
+                    save,
+                    path,
+                    form,
+                    workers,
+                    executor,
+                    shared,
+                )
+            )
         if istatus is not None:
             self.is_in = True
             if isinstance(istatus, irecord):
@@ -129,6 +212,70 @@ class mul:
         self.fundtradeobj = tuple(fundtradeobj)
         self.totcftable = self._mergecftb()
 
+    @staticmethod
+    def _status_trades(
+        codes,
+        status,
+        property,
+        fetch,
+        save,
+        path,
+        form,
+        workers=1,
+        executor="thread",
+        shared=False,
+    ):
+        """
+        为记账单中的各基金生成 trade 对象，结果顺序与 codes 一致。
+        shared 时，顺序和线程池执行的基金信息由 :func:`xalpha.info.load_funds` 批量载入，与其他组合共享净值表；
+        进程池无法共享内存中的存储，由各进程分别获取。
+
+        :param workers: int or None. 1 为顺序执行，None 或大于 1 时并发执行
+        :param executor: str. "thread" 或 "process"
+        :param shared: bool. 是否经由共享的 ``price_store`` 载入基金信息
+        """
+        if executor not in ["thread", "process"]:
+            raise ValueError("Unrecognized executor %s" % executor)
+        sequential = workers == 1 or len(codes) <= 1
+        if not shared and (executor == "thread" or sequential):
+            args = (property, fetch, save, path, form)
+            if sequential:
+                return [_status_trade(code, status, *args) for code in codes]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_status_trade, code, status, *args) for code in codes
+                ]
+                return [f.result() for f in futures]
+        if executor == "process" and not sequential:
+            if path is not None and not isinstance(path, str):
+                path = _engine_url(path)
+            args = (property, fetch, save, path, form)
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_pool_init, initargs=_pool_state()
+            ) as pool:
+                # 只向各任务传递对应的单列，减少进程池的序列化开销
+                futures = [
+                    pool.submit(
+                        _status_trade, code, status.loc[:, ["date", code]], *args
+                    )
+                    for code in codes
+                ]
+                return [f.result() for f in futures]
+        infos = load_funds(
+            codes,
+            property=property,
+            fetch=fetch,
+            save=save,
+            path=path,
+            form=form,
+            max_workers=1 if sequential else workers,
+        )
+        if sequential:
+            return [trade(infos[code], status) for code in codes]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(trade, infos[code], status) for code in codes]
+            return [f.result() for f in futures]
+
     def tot(self, prop="基金现值", date=yesterdayobj()):
         """
         sum of all the values from one prop of fund daily report,
@@ -234,6 +381,21 @@ class mul:
         """
         return xirrcal(self.totcftable, self.fundtradeobj, date, startdate, guess)
 
+    def xirrrates(self, dates, guess=0.01):
+        """
+        一次计算多个日期整个投资组合的 xirr，每个日期的结果与 :meth:`xirrrate` 相同
+
+        :param dates: sorted pd.DatetimeIndex, the virtually sell-all dates
+        :returns: pd.DataFrame with columns date and xirr
+        """
+        dates = pd.DatetimeIndex(dates)
+        return pd.DataFrame(
+            {
+                "date": dates,
+                "xirr": xirrcal_batch(self.totcftable, self.fundtradeobj, dates, guess),
+            }
+        )
+
     def evaluation(self, start=None):
         """
         give the evaluation object to analysis funds properties themselves instead of trades
@@ -502,16 +664,16 @@ class mul:
         """
         start = self.totcftable.iloc[0].date
         times = pd.date_range(start, end)
+        values = [
+            list(fob.daily_positions(start=start, end=end)["value"])
+            for fob in self.fundtradeobj
+        ]
         tdata = []
-        for date in times:
+        for i, date in enumerate(times):
             sdata = sorted(
                 [
-                    (
-                        date,
-                        fob.briefdailyreport(date).get("currentvalue", 0),
-                        fob.name,
-                    )
-                    for fob in self.fundtradeobj
+                    (date, values[j][i], fob.name)
+                    for j, fob in enumerate(self.fundtradeobj)
                 ],
                 key=lambda x: x[1],
                 reverse=True,
@@ -557,6 +719,9 @@ class mulfix(mul, indicator):
     :param form: string, the format of IO, options including: 'csv','sql'
     :param totmoney: positive float, the total money as the input at the beginning
     :param cashobj: cashinfo object, which is designed to balance the cash in and out
+    :param workers: int or None. Default 1. 同 :class:`mul`
+    :param executor: str. Default "thread". 同 :class:`mul`
+    :param shared: bool. Default False. 同 :class:`mul`
     """
 
     def __init__(
@@ -570,7 +735,10 @@ class mulfix(mul, indicator):
         path="",
         form="csv",
         totmoney=100000,
-        cashobj=None
+        cashobj=None,
+        workers=1,
+        executor="thread",
+        shared=False
     ):
         super().__init__(
             *fundtradeobj,
@@ -580,7 +748,10 @@ class mulfix(mul, indicator):
             fetch=fetch,
             save=save,
             path=path,
-            form=form
+            form=form,
+            workers=workers,
+            executor=executor,
+            shared=shared
         )
         if cashobj is None:
             cashobj = cashinfo()
@@ -610,12 +781,7 @@ class mulfix(mul, indicator):
             date = totcftable.iloc[i + 1].date
             delta = totcftable.iloc[i + 1].cash
             if delta < 0:
-                cashl.append(
-                    myround(
-                        delta
-                        / cashobj.price[cashobj.price["date"] <= date].iloc[-1].netvalue
-                    )
-                )
+                cashl.append(myround(delta / cashobj.price_on_or_before(date).netvalue))
             else:
                 cashl.append(delta)
         datadict = {"date": totcftable.loc[:, "date"], "mf": cashl}
@@ -631,6 +797,18 @@ class mulfix(mul, indicator):
             res += fund.briefdailyreport(date).get("currentvalue", 0)
         return res / self.totmoney
 
+    def unitvalues(self, dates):
+        """
+        批量计算组合单位净值，各基金的逐日现值按日期对齐后整体求和，结果与逐日调用 :meth:`unitvalue` 相同
+
+        :param dates: sorted pd.DatetimeIndex
+        :returns: np.array of unitvalues of the whole investment combination on the given dates
+        """
+        res = np.zeros(len(dates))
+        for fund in self.fundtradeobj:
+            res = res + fund._positions(dates)["value"].to_numpy(dtype=float)
+        return res / self.totmoney
+
     def v_tradecost(self, threhold=0, date=yesterdayobj(), rendered=True):
         if getattr(self, "price", None) is None:
             raise ValueError("Please generate price table by ``bcmkset()`` first")
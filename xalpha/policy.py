@@ -3,9 +3,10 @@
 modules for policy making: generate status table for simple backtesting
 """
 
+import numpy as np
 import pandas as pd
 
-from xalpha.cons import myround, opendate, yesterdaydash, convert_date
+from xalpha.cons import myround, opendate_cal, yesterdaydash, convert_date
 from xalpha.record import record
 
 
@@ -36,8 +37,12 @@ class policy(record):
             datel = []
             actionl = []
             times = pd.date_range(self.start, self.end)
-            for date in times:
-                action = self.status_gen(date)
+            vec = _owner(type(self), "status_vec")
+            if vec is not policy and issubclass(vec, _owner(type(self), "status_gen")):
+                actions = self.status_vec(self._aligned_price(times))
+            else:
+                actions = [self.status_gen(date) for date in times]
+            for date, action in zip(times, actions):
                 if action > 0:
                     datel.append(date)
                     actionl.append(action)
@@ -56,6 +61,62 @@ class policy(record):
         """
         raise NotImplementedError
 
+    def status_vec(self, frame):
+        """
+        向量化的策略接口，一次给出全部日期的决策，结果需与逐日调用 :meth:`status_gen` 相同。
+        子类只实现 status_gen 时，自动退回逐日调用。
+
+        :param frame: pd.DataFrame, 由 :meth:`_aligned_price` 生成的逐日对齐价格表
+        :returns: list of float with the same length as frame, 含义同 status_gen
+        """
+        raise NotImplementedError
+
+    def _aligned_price(self, times):
+        """
+        :param times: pd.DatetimeIndex of every day from start to end
+        :returns: pd.DataFrame, 每一自然日对齐到不晚于该日的最后一条价格记录，包含 self.price 的各列，
+            此外 date 为自然日，pdate 为对齐的价格日期，row 为该记录在 self.price 中的位置，
+            is_open 为该日是否开市
+        """
+        rows = (
+            np.searchsorted(self.price["date"].values, times.values, side="right") - 1
+        )
+        frame = self.price.iloc[rows].reset_index(drop=True)
+        frame["pdate"] = frame["date"]
+        frame["date"] = times
+        frame["row"] = rows
+        frame["is_open"] = opendate_cal.is_open(times)
+        return frame
+
+    def _forward(self, dates, col="netvalue"):
+        """
+        :returns: np.array, 各日期不早于该日的第一条价格记录的 col 列
+        """
+        pos = np.searchsorted(self.price["date"].values, pd.DatetimeIndex(dates).values)
+        return self.price[col].values[pos]
+
+
+def _owner(cls, name):
+    for c in cls.__mro__:
+        if name in c.__dict__:
+            return c
+
+
+def _with_previous(price, frame, col):
+    """
+    :returns: Tuple[np.array, np.array, np.array], 各日对齐的 col 值，前一条价格记录的 col 值，
+        以及前一条记录是否存在
+    """
+    values = price[col].values
+    rows = frame["row"].values
+    return values[rows], values[np.maximum(rows - 1, 0)], rows >= 1
+
+
+def _in_times(dates, times):
+    # 与 ``date in times`` 逐一判断相同
+    times = set(times)
+    return np.array([d in times for d in dates], dtype=bool)
+
 
 class buyandhold(policy):
     """
@@ -74,6 +135,19 @@ class buyandhold(policy):
         else:
             return 0
 
+    def status_vec(self, frame):
+        actions = [0] * len(frame)
+        special = _in_times(frame["date"], self.aim.specialdate)
+        # vinfo 等类 info 对象的价格表可能没有 comment 列，此时也没有特殊日
+        if "comment" in frame:
+            comment = frame["comment"].values
+        else:
+            comment = np.zeros(len(frame))
+        for i in np.nonzero(special & (comment > 0))[0]:
+            actions[i] = 0.05
+        actions[0] = self.totmoney
+        return actions
+
 
 class scheduled(policy):
     """
@@ -97,6 +171,9 @@ class scheduled(policy):
         else:
             return 0
 
+    def status_vec(self, frame):
+        return [self.totmoney if t else 0 for t in _in_times(frame["date"], self.times)]
+
 
 class scheduled_tune(scheduled):
     """
@@ -115,13 +192,23 @@ class scheduled_tune(scheduled):
     def status_gen(self, date):
         if date in self.times:
             value = self.price[self.price["date"] >= date].iloc[0].netvalue
-            for term in self.piece:
-                if value <= term[0]:
-                    return term[1] * self.totmoney
-            return 0
+            return self._act(value)
         else:
             return 0
 
+    def _act(self, value):
+        for term in self.piece:
+            if value <= term[0]:
+                return term[1] * self.totmoney
+        return 0
+
+    def status_vec(self, frame):
+        actions = [0] * len(frame)
+        idx = np.nonzero(_in_times(frame["date"], self.times))[0]
+        for i, value in zip(idx, self._forward(frame["date"].values[idx])):
+            actions[i] = self._act(value)
+        return actions
+
 
 class scheduled_window(scheduled):
     """
@@ -169,18 +256,42 @@ class scheduled_window(scheduled):
                 price_range.iloc[-1 * i].netvalue
                 for i in range(self.window_dist, self.window + self.window_dist)
             ]
-            if self.method == "MAX":
-                base_value = max(window_values)
-            elif self.method == "MIN":
-                base_value = min(window_values)
-            else:
-                base_value = sum(window_values) / len(window_values)
-            for term in self.piece:
-                if (value - base_value) / base_value * 100 <= term[0]:
-                    return term[1] * self.totmoney
-            return 0
+            return self._act(value, window_values)
+        return 0
+
+    def _act(self, value, window_values):
+        if self.method == "MAX":
+            base_value = max(window_values)
+        elif self.method == "MIN":
+            base_value = min(window_values)
+        else:
+            base_value = sum(window_values) / len(window_values)
+        for term in self.piece:
+            if (value - base_value) / base_value * 100 <= term[0]:
+                return term[1] * self.totmoney
         return 0
 
+    def status_vec(self, frame):
+        actions = [0] * len(frame)
+        dates = frame["date"]
+        mask = _in_times(dates, self.times) & ~_in_times(
+            dates, self.times[0 : self.window + self.window_dist - 1]
+        )
+        idx = np.nonzero(mask)[0]
+        netvalue = self.price["netvalue"].values
+        # 早于当日的价格记录条数
+        before = np.searchsorted(self.price["date"].values, dates.values[idx])
+        values = self._forward(dates.values[idx])
+        for i, k, value in zip(idx, before, values):
+            if k < self.window + self.window_dist - 1:
+                continue
+            window_values = [
+                netvalue[k - j]
+                for j in range(self.window_dist, self.window + self.window_dist)
+            ]
+            actions[i] = self._act(value, window_values)
+        return actions
+
 
 class grid(policy):
     """
@@ -227,7 +338,7 @@ class grid(policy):
     def status_gen(self, date):
         # 过滤交易日这一需求，交给各个类自由裁量，这里网格类就需要过掉非交易日干扰，
         # 而定投类中则不过掉，遇到非交易日顺延定投更合理些
-        if date.strftime("%Y-%m-%d") not in opendate:
+        if not opendate_cal.is_open(date):
             return 0
 
         if date == self.start:
@@ -238,6 +349,9 @@ class grid(policy):
                 return 0
         value = self.price[self.price["date"] <= date].iloc[-1].loc["netvalue"]
         valueb = self.price[self.price["date"] <= date].iloc[-2].loc["netvalue"]
+        return self._act(value, valueb)
+
+    def _act(self, value, valueb):
         action = 0
         for i, buypt in enumerate(self.buypts):
             if (value - buypt) <= 0 and (valueb - buypt) > 0 and self.pos <= i:
@@ -249,6 +363,29 @@ class grid(policy):
                 self.pos += -1
         return action
 
+    def status_vec(self, frame):
+        actions = [0] * len(frame)
+        is_open = frame["is_open"].values
+        if is_open[0]:  # 首日即 self.start
+            if self.buypercent[0] == 0:
+                self.pos += 1
+                actions[0] = myround(self.totmoney / self.division)
+        value, valueb, prev = _with_previous(self.price, frame, "netvalue")
+        buypts = np.array(self.buypts)
+        sellpts = np.array(self.sellpts)
+        cross = (
+            ((value[:, None] - buypts) <= 0) & ((valueb[:, None] - buypts) > 0)
+        ).any(axis=1) | (
+            ((value[:, None] - sellpts) >= 0) & ((valueb[:, None] - sellpts) < 0)
+        ).any(
+            axis=1
+        )
+        cross[0] = False
+        # 只有跨过网格点位的开市日才可能改变仓位
+        for i in np.nonzero(is_open & prev & cross)[0]:
+            actions[i] = self._act(value[i], valueb[i])
+        return actions
+
 
 class indicator_cross(policy):
     """
@@ -271,7 +408,7 @@ class indicator_cross(policy):
         super().__init__(infoobj, start, end, totmoney)
 
     def status_gen(self, date):
-        if date.strftime("%Y-%m-%d") not in opendate:
+        if not opendate_cal.is_open(date):
             return 0
         rows = self.price[self.price["date"] <= date]
         if len(rows) == 1:
@@ -280,6 +417,9 @@ class indicator_cross(policy):
         valuelb = rows.iloc[-2].loc[self.col[0]]
         valuer = rows.iloc[-1].loc[self.col[1]]
         valuerb = rows.iloc[-2].loc[self.col[1]]
+        return self._act(valuel, valuelb, valuer, valuerb)
+
+    def _act(self, valuel, valuelb, valuer, valuerb):
         cond = (valuerb - valuelb) * (valuer - valuel)
 
         if cond > 0:
@@ -300,6 +440,16 @@ class indicator_cross(policy):
                 else:
                     return 0
 
+    def status_vec(self, frame):
+        actions = [0] * len(frame)
+        valuel, valuelb, prev = _with_previous(self.price, frame, self.col[0])
+        valuer, valuerb, _ = _with_previous(self.price, frame, self.col[1])
+        cond = (valuerb - valuelb) * (valuer - valuel)
+        cross = (cond < 0) | ((cond == 0) & (valuer - valuel != 0))
+        for i in np.nonzero(frame["is_open"].values & prev & cross)[0]:
+            actions[i] = self._act(valuel[i], valuelb[i], valuer[i], valuerb[i])
+        return actions
+
 
 class indicator_points(policy):
     """
@@ -351,13 +501,16 @@ class indicator_points(policy):
         super().__init__(infoobj, start, end, totmoney)
 
     def status_gen(self, date):
-        if date.strftime("%Y-%m-%d") not in opendate:
+        if not opendate_cal.is_open(date):
             return 0
         rows = self.price[self.price["date"] <= date]
         if len(rows) == 1:
             return 0
         value = rows.iloc[-1].loc[self.col]
         valueb = rows.iloc[-2].loc[self.col]
+        return self._act(value, valueb)
+
+    def _act(self, value, valueb):
         action = 0
         if self.buylow is True:
             judge = 1
@@ -386,3 +539,22 @@ class indicator_points(policy):
                     self.selllevel = i + 1
 
         return action
+
+    def status_vec(self, frame):
+        actions = [0] * len(frame)
+        value, valueb, prev = _with_previous(self.price, frame, self.col)
+        judge = 1 if self.buylow is True else -1
+        pts = np.array([term[0] for term in self.buy])
+        cross = (
+            (judge * (value[:, None] - pts) <= 0)
+            & (0 < judge * (valueb[:, None] - pts))
+        ).any(axis=1)
+        if self.sell is not None:
+            pts = np.array([term[0] for term in self.sell])
+            cross |= (
+                (judge * (value[:, None] - pts) >= 0)
+                & (0 > judge * (valueb[:, None] - pts))
+            ).any(axis=1)
+        for i in np.nonzero(frame["is_open"].values & prev & cross)[0]:
+            actions[i] = self._act(value[i], valueb[i])
+        return actions
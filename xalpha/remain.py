@@ -7,17 +7,211 @@ and it is also useful when converting the shares of funds.
 as the nested list structure is very fragile and tend to induce unpredicatble behaviors,
 we strongly recommended anytime when rem data serves as function paramters,
 only utilize functions from this module
+
+rem data can be either the nested list or :class:`LotBook`, the array backed version used by trade class,
+functions in this module return the same type as the input rem.
 """
 
-from xalpha.cons import convert_date, myround
+import numpy as np
+import pandas as pd
+
+from xalpha.cons import convert_date, myround, myround_array
 
 _errmsg = "One cannot move share before the lastest operation"
 
 
+class LotBook:
+    """
+    以 numpy 数组存储的持仓批次，dates 和 shares 按时间顺序一一对应，每次操作都返回新的对象而不修改原对象。
+    可以像 rem 嵌套列表一样只读使用：迭代和索引得到 [pd.Timestamp, share]，支持 len 和与嵌套列表比较。
+
+    :param dates: array like of dates
+    :param shares: array like of positive float
+    """
+
+    __slots__ = ("dates", "shares", "_cum")
+
+    def __init__(self, dates=(), shares=()):
+        self.dates = np.asarray(pd.DatetimeIndex(dates).values, dtype="datetime64[ns]")
+        self.shares = np.asarray(shares, dtype=float)
+        self._cum = None
+
+    @classmethod
+    def from_rem(cls, rem):
+        """
+        :param rem: nested list or LotBook
+        :return: LotBook
+        """
+        if isinstance(rem, LotBook):
+            return rem
+        return cls([convert_date(d) for d, _ in rem], [s for _, s in rem])
+
+    @classmethod
+    def _new(cls, dates, shares):
+        book = cls.__new__(cls)
+        book.dates = dates
+        book.shares = shares
+        book._cum = None
+        return book
+
+    @property
+    def cumshares(self):
+        """
+        各批次份额的累积和
+        """
+        if self._cum is None:
+            self._cum = np.cumsum(self.shares)
+        return self._cum
+
+    def total(self):
+        """
+        :return: float. 总份额
+        """
+        if len(self.shares) == 0:
+            return 0
+        return float(self.cumshares[-1])
+
+    def to_list(self):
+        """
+        :return: rem 嵌套列表
+        """
+        return [list(item) for item in self]
+
+    def __len__(self):
+        return len(self.shares)
+
+    def __iter__(self):
+        for d, s in zip(self.dates, self.shares):
+            yield [pd.Timestamp(d), float(s)]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return LotBook._new(self.dates[i], self.shares[i])
+        return [pd.Timestamp(self.dates[i]), float(self.shares[i])]
+
+    def __eq__(self, other):
+        if isinstance(other, (LotBook, list)):
+            return self.to_list() == [list(item) for item in other]
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "LotBook(%s)" % self.to_list()
+
+    def buy(self, share, date):
+        """
+        see :func:`buy`
+        """
+        share = myround(share)
+        date = convert_date(date)
+        if len(self) == 0:
+            return LotBook._new(
+                np.array([np.datetime64(date, "ns")]), np.array([share], dtype=float)
+            )
+        delta = (date - pd.Timestamp(self.dates[-1])).days
+        if delta > 0:
+            return LotBook._new(
+                np.append(self.dates, np.datetime64(date, "ns")),
+                np.append(self.shares, share),
+            )
+        elif delta == 0:
+            shares = self.shares.copy()
+            shares[-1] = shares[-1] + share
+            return LotBook._new(self.dates, shares)
+        else:
+            raise Exception(_errmsg)
+
+    def sell(self, share, date):
+        """
+        see :func:`sell`
+        """
+        share = myround(share)
+        date = convert_date(date)
+        totposition = self.total()
+        if totposition == 0:
+            return (LotBook(), LotBook())
+        if (date - pd.Timestamp(self.dates[-1])).days < 0:
+            raise Exception(_errmsg)
+        if share > totposition:
+            share = totposition  # not raise error when you sell more than you buy
+        k, mids, m = _fifo(self.shares, self.cumshares, share)
+        sold_idx, sold_shares, new_idx, new_shares = [], [], [], []
+        for i, sold, kept in mids:
+            if sold is not None:
+                sold_idx.append(i)
+                sold_shares.append(self.shares[i] if sold is True else sold)
+            if kept is not None:
+                new_idx.append(i)
+                new_shares.append(self.shares[i] if kept is True else kept)
+        soldbook = LotBook._new(
+            np.concatenate([self.dates[:k], self.dates[sold_idx]]),
+            np.concatenate([self.shares[:k], np.array(sold_shares, dtype=float)]),
+        )
+        newbook = LotBook._new(
+            np.concatenate([self.dates[new_idx], self.dates[m:]]),
+            np.concatenate([np.array(new_shares, dtype=float), self.shares[m:]]),
+        )
+        return (soldbook, newbook)
+
+    def trans(self, coef, date):
+        """
+        see :func:`trans`
+        """
+        date = convert_date(date)
+        if len(self) == 0:
+            return LotBook()
+        if (date - pd.Timestamp(self.dates[-1])).days <= 0:
+            raise Exception(_errmsg)
+        shares = myround_array(self.shares * coef)
+        return LotBook._new(self.dates, shares)
+
+
+def _fifo(shares, cum, share):
+    """
+    先进先出地从各批次中卖出 share 份。判定规则与逐批次比较累计份额完全一致，
+    但份额非负时累计份额单调，可以二分查找跳过整批卖出的部分，并在第一批整批保留处停止。
+
+    :param shares: np.array of float
+    :param cum: np.array, shares 的累积和
+    :param share: float, 卖出份额
+    :return: Tuple[int, list, int]. 前 k 批整批卖出，m 及之后的批次整批保留，
+        中间各批为 (序号, 卖出份额, 保留份额)，True 代表整批，None 代表无
+    """
+    n = len(shares)
+    monotone = bool(np.all(shares >= 0))
+    k = 0
+    if monotone:
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if share < myround(cum[mid]):
+                hi = mid
+            else:
+                lo = mid + 1
+        k = lo
+    mids = []
+    for i in range(k, n):
+        r = myround(cum[i])
+        prev = float(cum[i - 1]) if i > 0 else 0
+        if share > r or share == r:
+            mids.append((i, True, None))
+        elif share < r:
+            if share > prev:
+                mids.append((i, share - prev, float(cum[i]) - share))
+            elif monotone:
+                return k, mids, i
+            else:
+                mids.append((i, None, True))
+    return k, mids, n
+
+
 def copy(remc):
     """
     copy the rem form data so that the return is independent of the input
     """
+    if isinstance(remc, LotBook):
+        return remc  # LotBook 不可变，无需复制
     rem = [remcterm.copy() for remcterm in remc]
     return rem
 
@@ -31,6 +225,8 @@ def buy(remc, share, date):
     :param date: string in the date form or datetime object
     :returns: new rem after the buying
     """
+    if isinstance(remc, LotBook):
+        return remc.buy(share, date)
     rem = copy(remc)
     share = myround(share)
     date = convert_date(date)
@@ -51,6 +247,8 @@ def sell(remc, share, date):
     :returns: tuple, (sold rem, new rem)
         sold rem is the positions being sold while new rem is the positions being held
     """
+    if isinstance(remc, LotBook):
+        return remc.sell(share, date)
     rem = copy(remc)
     share = myround(share)
     date = convert_date(date)
@@ -61,21 +259,20 @@ def sell(remc, share, date):
         raise Exception(_errmsg)
     if share > totposition:
         share = totposition  # not raise error when you sell more than you buy
-    soldrem = []
+    shares = np.array([pos[1] for pos in rem], dtype=float)
+    k, mids, m = _fifo(shares, np.cumsum(shares), share)
+    soldrem = rem[:k]
     newrem = []
-    for i, pos in enumerate(rem):
-        if share > myround(sum([rem[j][1] for j in range(i + 1)])):
-            soldrem.append(rem[i])
-        elif share == myround(sum([rem[j][1] for j in range(i + 1)])):
+    for i, sold, kept in mids:
+        if sold is True:
             soldrem.append(rem[i])
-        elif share < myround(sum([rem[j][1] for j in range(i + 1)])):
-            if share > sum([rem[j][1] for j in range(i)]):
-                soldrem.append([rem[i][0], share - sum([rem[j][1] for j in range(i)])])
-                newrem.append(
-                    [rem[i][0], sum([rem[j][1] for j in range(i + 1)]) - share]
-                )
-            elif share <= sum([rem[j][1] for j in range(i)]):
-                newrem.append(rem[i])
+        elif sold is not None:
+            soldrem.append([rem[i][0], sold])
+        if kept is True:
+            newrem.append(rem[i])
+        elif kept is not None:
+            newrem.append([rem[i][0], kept])
+    newrem.extend(rem[m:])
     return (soldrem, newrem)
 
 
@@ -87,6 +284,8 @@ def trans(remc, coef, date):
     :param date: string in date form or datetime obj
     :returns: new rem after converting
     """
+    if isinstance(remc, LotBook):
+        return remc.trans(coef, date)
     rem = copy(remc)
     date = convert_date(date)
     if len(rem) == 0:
@@ -16,7 +16,7 @@ from bs4 import BeautifulSoup
 from scipy import stats
 
 from xalpha.cons import (
-    opendate,
+    opendate_cal,
     opendate_dt,
     pd_to_datetime,
     yesterday,
@@ -32,6 +32,7 @@ from xalpha.cons import (
 from xalpha.info import get_fund_holdings
 from xalpha.universal import (
     get_rt,
+    get_rt_batch,
     get_bar,
     ttjjcode,
     get_bond_rates,
@@ -535,6 +536,7 @@ class Compare:
         """
         totdf = pd.DataFrame()
         codelist = []
+        pairs = []
         for c in codes:
             if isinstance(c, tuple):
                 code = c[0]
@@ -542,12 +544,18 @@ class Compare:
             else:
                 code = c
                 currency = "CNY"  # 标的不做汇率调整
+            pairs.append((code, _get_currency_code(currency)))
+        dfs = xu.get_daily_many(
+            [code for code, _ in pairs] + [cc for _, cc in pairs if cc],
+            start=start,
+            end=end,
+        )
+        for code, currency_code in pairs:
             codelist.append(code)
-            df = xu.get_daily(code, start=start, end=end)
+            df = dfs[code]
             df = df[df.date.isin(opendate_dt)]
-            currency_code = _get_currency_code(currency)
             if currency_code:
-                cdf = xu.get_daily(currency_code, start=start, end=end)
+                cdf = dfs[currency_code]
                 cdf = cdf[cdf["date"].isin(opendate_dt)]
                 df = df.merge(right=cdf, on="date", suffixes=("_x", "_y"))
                 df[col] = df[col + "_x"] * df[col + "_y"]
@@ -1098,7 +1106,7 @@ def is_on(date, market="CN", no_trading_days=None):
         % (date_dash, market)
     )
     if market in ["CN", "CHN", "CNY", "RMB", "CHINA", "CM"]:  # 国内节假日不更新中间价
-        return date_dash in opendate
+        return opendate_cal.is_open(date_obj)
     elif market in ["JP", "JAPAN", "JPY", "100JPY"]:
         code = "indices/japan-ni225"
     elif market in ["US", "NY", "USD", "NASDAQ"]:
@@ -1259,6 +1267,13 @@ def evaluate_fluctuation(hdict, date, lastday=None, _check=None, warning_threhol
             pass
         else:
             warning_threhold = (warning_threhold, 1 / warning_threhold)  # 上界， 下界
+    codes = list(hdict.keys())
+    codes += [c for c in map(get_currency_code, codes) if c]
+    try:
+        # 并发预取日线进入缓存，抓取失败的标的留给 daily_increment 的备用逻辑处理
+        xu.get_daily_many(codes, end=date, prev=30)
+    except Exception as e:
+        logger.debug("prefetch daily data fails due to %s" % e)
     for fundid, percent in hdict.items():
         ratio = daily_increment(fundid, date, lastday, _check, warning_threhold)
         if warning_threhold:
@@ -1382,10 +1397,11 @@ class RTPredict:
         t = 0
         n = 0
         today_str = self.today.strftime("%Y%m%d")
+        rts = get_rt_batch(list(self.t0dict.keys()))
         for k, v in self.t0dict.items():
             w = v
             t += w
-            r = get_rt(k)
+            r = rts[k]
             # k should support get_rt, investing pid doesn't support this!
             if percent:
                 c = w / 100 * (1 + r["percent"] / 100)  # 直接取标的当日涨跌幅
@@ -1723,20 +1739,23 @@ class QDIIPredict:
         t = 0
         n = 0
         today_str = self.today.strftime("%Y%m%d")
+        holdings = []
         for k, v in self.t0dict.items():
             if not isinstance(v, dict):
                 v = {"weight": v}
             if len(k.split("~")) > 1 and k.split("~")[-1].isdigit():
                 # 为了持仓中可以同标的多次出现的 workaround
                 k = k.split("~")[0]
+            k = self.hot_replace(k)  # 原油切换
+            holdings.append((k, v))
+        # k should support get_rt, investing pid doesn't support this!
+        rts = get_rt_batch(list(dict.fromkeys(k for k, _ in holdings)))
+        for k, v in holdings:
             w = v["weight"]
             shift = v.get("time", None)
             base = v.get("base", None)
             t += w
-            k = self.hot_replace(k)  # 原油切换
-            r = get_rt(
-                k
-            )  # k should support get_rt, investing pid doesn't support this!
+            r = rts[k]
             if percent:
                 c = w / 100 * (1 + r["percent"] / 100)  # 直接取标的当日涨跌幅
             else:
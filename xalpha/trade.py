@@ -6,7 +6,9 @@ module for trade class
 import math
 import datetime as dt
 import logging
+from bisect import bisect_left, bisect_right, insort
 
+import numpy as np
 import pandas as pd
 from pyecharts.charts import Bar, Line
 from pyecharts import options as opts
@@ -16,7 +18,9 @@ from xalpha.cons import (
     convert_date,
     line_opts,
     myround,
+    myround_array,
     xirr,
+    xirr_batch,
     yesterdayobj,
     pd_get_week,
 )
@@ -46,7 +50,7 @@ def xirrcal(cftable, trades, date, startdate=None, guess=0.01):
     if len(partcftb) == 0:
         return 0
     if not startdate:
-        cashflow = [(row["date"], row["cash"]) for i, row in partcftb.iterrows()]
+        cashflow = list(zip(partcftb["date"], partcftb["cash"]))
     else:
         if not isinstance(startdate, dt.datetime):
             startdate = dt.datetime.strptime(
@@ -57,7 +61,7 @@ def xirrcal(cftable, trades, date, startdate=None, guess=0.01):
             start_cash += fund.briefdailyreport(startdate).get("currentvalue", 0)
         cashflow = [(startdate, -start_cash)]
         partcftb = partcftb[partcftb["date"] > startdate]
-        cashflow.extend([(row["date"], row["cash"]) for i, row in partcftb.iterrows()])
+        cashflow.extend(zip(partcftb["date"], partcftb["cash"]))
     rede = 0
     for fund in trades:
         if not isinstance(fund, itrade):
@@ -75,6 +79,44 @@ def xirrcal(cftable, trades, date, startdate=None, guess=0.01):
     return xirr(cashflow, guess)
 
 
+def xirrcal_batch(cftable, trades, dates, guess=0.01):
+    """
+    calculate the xirr rate for a series of virtually sell-all dates in one call,
+    each of which is the same as :func:`xirrcal` on that date
+
+    :param cftable: cftable (pd.Dateframe) with date and cash column
+    :param trades: list [trade1, ...], every item is an trade object,
+        whose shares would be sold out virtually
+    :param dates: sorted pd.DatetimeIndex, the virtually sell-all dates
+    :param guess: floating number, a guess at the xirr rate solution to be used
+        as a starting point for the numerical solution
+    :returns: np.array of xirr rates, 0 for dates before the first cashflow and nan where no root is found
+    """
+    dates = pd.DatetimeIndex(dates)
+    rede = np.zeros(len(dates))
+    for fund in trades:
+        positions = fund._positions(dates)
+        if not isinstance(fund, itrade):
+            remdates = list(fund.remtable["date"])
+            rems = list(fund.remtable["rem"])
+            for i, (date, share) in enumerate(zip(dates, positions["share"])):
+                k = bisect_right(remdates, date)
+                rem = rems[k - 1] if k else []
+                rede[i] += fund.aim.shuhui(share, date, rem)[1]
+        else:  # 场内交易
+            rede += positions["value"].to_numpy(dtype=float)
+    rates = np.zeros(len(dates))
+    if len(cftable) == 0:
+        return rates
+    started = dates >= cftable["date"].min()
+    rates[started] = xirr_batch(
+        list(zip(cftable["date"], cftable["cash"])),
+        list(zip(dates[started], rede[started])),
+        guess,
+    )
+    return rates
+
+
 def bottleneck(cftable):
     """
     find the max total input in the history given cftable with cash column
@@ -83,9 +125,8 @@ def bottleneck(cftable):
     """
     if len(cftable) == 0:
         return 0
-    # cftable = cftable.reset_index(drop=True) # unnecessary as iloc use natural rows instead of default index
-    inputl = [-sum(cftable.iloc[:i].cash) for i in range(1, len(cftable) + 1)]
-    return myround(max(inputl))
+    # 逐行累加与按顺序调用 sum 相同
+    return myround((-cftable["cash"].cumsum()).max())
 
 
 def turnoverrate(cftable, end=yesterdayobj()):
@@ -99,7 +140,7 @@ def turnoverrate(cftable, end=yesterdayobj()):
         return 0
     end = convert_date(end)
     start = cftable.iloc[0].date
-    tradeamount = sum(abs(cftable.loc[:, "cash"]))
+    tradeamount = abs(cftable["cash"]).cumsum().iloc[-1]
     turnover = tradeamount / bottleneck(cftable) / 2.0
     if (end - start).days <= 0:
         return 0
@@ -215,12 +256,16 @@ def vtradecost(
     funddata = []
     costdata = []
     end = convert_date(end)
-    pprice = self.price[self.price["date"] <= end]
+    # self 可以是 trade 或 mulfix，其 price 表均按日期排序
+    pdates = self.price["date"]
+    lo = 0
     pcftable = cftable
     if start is not None:
         start = convert_date(start)
-        pprice = pprice[pprice["date"] >= start]
+        lo = pdates.searchsorted(start)
         pcftable = pcftable[pcftable["date"] >= start]
+    hi = pdates.searchsorted(end, side="right")
+    pprice = self.price.iloc[lo:hi]
     for _, row in pprice.iterrows():
         date = row["date"]
         funddata.append(row["netvalue"])
@@ -234,9 +279,8 @@ def vtradecost(
     # pcftable = pcftable[abs(pcftable["cash"]) > threhold]
     for _, r in pcftable.iterrows():
         if r.cash != 0:
-            coords.append(
-                [r.date, pprice[pprice["date"] <= r.date].iloc[-1]["netvalue"]]
-            )
+            i = min(pdates.searchsorted(r.date, side="right"), hi)
+            coords.append([r.date, self.price.iloc[i - 1]["netvalue"]])
 
     upper = pcftable.cash.abs().max()
     lower = pcftable.cash.abs().min()
@@ -302,84 +346,131 @@ def vtradecost(
         return line
 
 
-class trade:
+class TradeLedger:
     """
-    Trade class with fundinfo obj as input and its main attrs are cftable and remtable:
-
-        1. cftable: pd.Dataframe, 现金流量表，每行为不同变更日期，三列分别为 date，cash， share，标记对于某个投资标的
-        现金的进出和份额的变化情况，所有的份额数据为交易当时的不复权数据。基金份额折算通过流量表中一次性的份额增减体现。
-
-        2. remtable：pd.Dataframe, 持仓情况表，每行为不同变更日期，两列分别为 date 和 rem， rem 数据结构是一个嵌套的列表，
-        包含了不同时间买入仓位的剩余情况，详情参见 remain 模块。这一表格如非必需，避免任何直接调用。
+    trade 引擎的运行状态：按日期顺序排列的现金流量表和持仓表各行，当前持仓以及最后处理的日期。
+    :class:`trade` 用它一次性生成 cftable 和 remtable，回测环境 :class:`xalpha.backtest.BTE` 则逐笔追加记录并推进到当日，
+    每次推进只处理新出现的记录日和特殊日。
 
     :param infoobj: info object as the trading aim
-    :param status: status table, obtained from record class
+    :param cftable: Optional[pd.DataFrame], 已有的现金流量表，从其最后一天之后继续计算
+    :param remtable: Optional[pd.DataFrame], 与 cftable 匹配的持仓表
     """
 
-    def __init__(self, infoobj, status, cftable=None, remtable=None):
+    def __init__(self, infoobj, cftable=None, remtable=None):
         self.aim = infoobj
-        code = self.aim.code
-        self.code = code
-        self.name = self.aim.name
-        self.price = self.aim.price
-        if (cftable is not None and remtable is None) or (
-            cftable is None and remtable is not None
-        ):
-            raise ValueError(
-                "You must provide both `cftable` and `remtable` for incremental trade engine"
-            )
-        # 请确保提供的 cftable 和 remtable 在日期，份额等数据上是匹配的
-        if cftable is None:
-            self.cftable = pd.DataFrame([], columns=["date", "cash", "share"])
-        else:
-            self.cftable = cftable
-        if remtable is None:
-            self.remtable = pd.DataFrame([], columns=["date", "rem"])
+        self.code = infoobj.code
+        self.specialdate = set(infoobj.specialdate)
+        self.fenhongdate = set(infoobj.fenhongdate)
+        self.zhesuandate = set(infoobj.zhesuandate)
+        self.values = {}  # 记录日: 记录值，同一日期以靠后的记录为准
+        self.first = None  # 第一条记录 (date, value)
+        self.recorddate_set = set()
+        self.events = sorted(self.specialdate)
+        self._eventset = set(self.events)
+        self.dates, self.cash, self.shares, self.cumshares, self.rems = (
+            [],
+            [],
+            [],
+            [],
+            [],
+        )
+        if cftable is not None:
+            for row in zip(cftable["date"], cftable["cash"], cftable["share"]):
+                self._append(*row, None)
+            self.rems = list(remtable["rem"])
+        self.start = len(self.dates)  # 初始化时已有的行数
+        self._restart()
+
+    def _append(self, rdate, cash, share, rem):
+        self.dates.append(rdate)
+        self.cash.append(cash)
+        self.shares.append(share)
+        # 与按顺序调用 sum 求和相同
+        self.cumshares.append((self.cumshares[-1] if self.cumshares else 0) + share)
+        self.rems.append(rem)
+
+    def _restart(self):
+        # 与用现有的行新建 trade 时一样，从最后一行继续
+        if self.dates:
+            self.lastdate = self.dates[-1]
+            self.rem = rm.LotBook.from_rem(self.rems[-1])
         else:
-            self.remtable = remtable
-        self.status = status
-        if status is not None:
-            self.status = status.loc[:, ["date", code]]
-            self.status = self.status[self.status[code] != 0]
-            self._arrange()
+            self.lastdate = None
+            self.rem = None
 
-    def _arrange(self):
-        self.recorddate_set = set(self.status.date)
-        while 1:
-            try:
-                self._addrow()
-            except Exception as e:
-                if e.args[0] == "no other info to be add into cashflow table":
-                    break
-                else:
-                    raise e
+    def _nearest_pricedate(self, date):
+        # 无净值日优先后移，无法后移则前移
+        return self.aim._trade_row(date)["date"]
 
-    def _addrow(self):
+    def _share_before(self, date=None):
+        # 不晚于 date 的各行份额之和，date 为 None 时为全部份额之和
+        k = len(self.dates) if date is None else bisect_right(self.dates, date)
+        return self.cumshares[k - 1] if k else 0
+
+    def record(self, date, value):
         """
-        Return cashflow table with one more line or raise an exception if there is no more line to add
-        The same logic also applies to rem table
-        关于对于一个基金多个操作存在于同一交易日的说明：无法处理历史买入第一笔同时是分红日的情形, 事实上也不存在这种情形。无法处理一日多笔买卖的情形。
-        同一日既有卖也有买不现实，多笔买入只能在 csv 上合并记录，由此可能引起份额计算 0.01 的误差。可以处理分红日买入卖出的情形。
-        分级份额折算日封闭无法买入，所以程序直接忽略当天的买卖。因此不会出现多个操作共存的情形。
+        添加一条交易记录，含义同 status 表中的数字
+
+        :param date: pd.Timestamp
+        :param value: float
         """
-        # the design on data remtable is disaster, it is very dangerous though works now
-        # possibly failing cases include:
-        # 买卖日记录是节假日，而顺延的日期恰好是折算日（理论上无法申赎）或分红日（可能由于 date 和 rdate 的错位而没有考虑到），
-        # 又比如周日申购记录，周一申购记录，那么周日记录会现金流记在周一，继续现金流标更新将从周二开始，周一数据被丢弃
-        code = self.aim.code
-        if len(self.cftable) == 0:
-            if len(self.status[self.status[code] != 0]) == 0:
-                raise Exception("no other info to be add into cashflow table")
-            i = 0
-            while self.status.iloc[i].loc[code] == 0:
-                i += 1
-            value = self.status.iloc[i].loc[code]
-            date = self.status.iloc[i].date
-            self.lastdate = date
-            if len(self.price[self.price["date"] >= date]) > 0:
-                date = self.price[self.price["date"] >= date].iloc[0]["date"]
-            else:
-                date = self.price[self.price["date"] <= date].iloc[-1]["date"]
+        if self.first is None:
+            self.first = (date, value)
+        self.values[date] = value
+        self.recorddate_set.add(date)
+        if date not in self._eventset:
+            self._eventset.add(date)
+            insort(self.events, date)
+
+    def checkpoint(self, date):
+        """
+        记录在 date 日添加交易记录并推进之前的状态，供 :meth:`rollback` 恢复
+
+        :param date: pd.Timestamp
+        :returns: tuple
+        """
+        return (
+            len(self.dates),
+            self.lastdate,
+            self.rem,
+            self.first,
+            date,
+            self.values.get(date),
+            date in self._eventset,
+        )
+
+    def rollback(self, checkpoint):
+        """
+        撤销 :meth:`checkpoint` 之后的 :meth:`record` 和 :meth:`advance`
+
+        :param checkpoint: tuple, :meth:`checkpoint` 的返回值
+        """
+        n, self.lastdate, self.rem, self.first, date, value, isevent = checkpoint
+        for col in [self.dates, self.cash, self.shares, self.cumshares, self.rems]:
+            del col[n:]
+        if value is None:
+            self.values.pop(date, None)
+            self.recorddate_set.discard(date)
+        else:
+            self.values[date] = value
+        if not isevent and date in self._eventset:
+            self._eventset.discard(date)
+            del self.events[bisect_left(self.events, date)]
+
+    def advance(self, end):
+        """
+        依次处理晚于 lastdate 且不晚于 end 的记录日和特殊日，生成新的行
+
+        :param end: datetime obj
+        :returns: bool, False 代表既无已有的行也无任何交易记录
+        """
+        if not self.dates:
+            if self.first is None:
+                return False
+            date, value = self.first
+            lastdate = date
+            date = self._nearest_pricedate(date)
 
             # 这里没有像下边部分一样仔细处理单独的 lastdate，hopefully 不会出现其他奇怪的问题，有 case 再说
             # https://github.com/refraction-ray/xalpha/issues/47
@@ -399,59 +490,46 @@ class trade:
                 value = int(value * 100 + 1e-6) / 100
                 assert feelabel is None or feelabel >= 0.0, "自定义申购费必须为正值"
                 rdate, cash, share = self.aim.shengou(value, date, fee=feelabel)
-                rem = rm.buy([], share, rdate)
+                rem = rm.buy(rm.LotBook(), share, rdate)
+                self._append(rdate, cash, share, rem)
             else:
                 raise TradeBehaviorError("You cannot sell first when you never buy")
-        elif len(self.cftable) > 0:
-            # recorddate = list(self.status.date)
-            if not getattr(self, "lastdate", None):
-                lastdate = self.cftable.iloc[-1].date + pd.Timedelta(1, unit="d")
-            else:
-                lastdate = self.lastdate + pd.Timedelta(1, unit="d")
-            while (lastdate not in self.aim.specialdate) and (
-                (lastdate not in self.recorddate_set)
-                or (
-                    (lastdate in self.recorddate_set)
-                    and (
-                        self.status[self.status["date"] == lastdate].loc[:, code].any()
-                        == 0
-                    )
-                )
-            ):
-                lastdate += pd.Timedelta(1, unit="d")
-                if (lastdate - yesterdayobj()).days >= 1:
-                    raise Exception("no other info to be add into cashflow table")
-            if (lastdate - yesterdayobj()).days >= 1:
-                raise Exception("no other info to be add into cashflow table")
-            date = lastdate
-            # 无净值日优先后移，无法后移则前移
+        else:
+            lastdate = self.lastdate
+            rem = self.rem
+        events = self.events
+        specialdate = self.specialdate
+        fenhongdate = self.fenhongdate
+        zhesuandate = self.zhesuandate
+
+        while True:
+            # 下一个记录日或特殊日
+            i = bisect_left(events, lastdate + pd.Timedelta(1, unit="d"))
+            if i == len(events) or (events[i] - end).days >= 1:
+                break
+            lastdate = events[i]
+            date = self._nearest_pricedate(lastdate)
             # 还是建议日期记录准确，不然可能有无法完美兼容的错误出现
-            if len(self.price[self.price["date"] >= date]) > 0:
-                date = self.price[self.price["date"] >= date].iloc[0]["date"]
-            else:
-                date = self.price[self.price["date"] <= date].iloc[-1]["date"]
-            if date != lastdate and date in list(self.status.date):
+            if date != lastdate and date in self.recorddate_set:
                 # 日期平移到了其他记录日，很可能出现问题!
                 logger.warning(
                     "账单日期 %s 非 %s 的净值记录日期，日期智能平移后 %s 与账单其他日期重合！交易处理极可能出现问题！！ "
                     "靠后日期的记录被覆盖" % (lastdate, self.code, date)
                 )
-            self.lastdate = lastdate
+            recorddate = lastdate
             if date > lastdate:
-                self.lastdate = date
+                lastdate = date
             # see https://github.com/refraction-ray/xalpha/issues/27, begin new date from last one in df is not reliable
             label = self.aim.dividend_label  # 现金分红 0, 红利再投 1
             cash = 0
             share = 0
-            rem = self.remtable.iloc[-1].rem
+            prevrem = rem
             rdate = date
-            if (lastdate in self.recorddate_set) and (date not in self.aim.zhesuandate):
+            if (recorddate in self.recorddate_set) and (date not in zhesuandate):
                 # deal with buy and sell and label the fenhongzaitouru,
                 # namely one label a 0.05 in the original table to label fenhongzaitouru
-                value = self.status[self.status["date"] <= lastdate].iloc[-1].loc[code]
-                if (
-                    date in self.aim.fenhongdate
-                ):  # 0.05 的分红行为标记，只有分红日才有效
+                value = self.values[recorddate]
+                if date in fenhongdate:  # 0.05 的分红行为标记，只有分红日才有效
                     fenhongmark = round(10 * value - int(10 * value), 1)
                     # TODO: any rounding issue here for th int
                     if fenhongmark == 0.5 and label == 0:
@@ -482,17 +560,15 @@ class trade:
                         feelabel = None
                     value = int(value * 100 - 1e-6) / 100
                     rdate, dcash, dshare = self.aim.shuhui(
-                        -value, date, self.remtable.iloc[-1].rem, fee=feelabel
+                        -value, date, prevrem, fee=feelabel
                     )
                     _, rem = rm.sell(rem, -dshare, rdate)
                 elif value >= -0.005 and value < 0:
                     # value now stands for the ratio to be sold in terms of remain positions, -0.005 stand for sell 100%
-                    remainshare = sum(
-                        self.cftable[self.cftable["date"] <= date].loc[:, "share"]
-                    )
+                    remainshare = self._share_before(date)
                     ratio = -value / 0.005
                     rdate, dcash, dshare = self.aim.shuhui(
-                        remainshare * ratio, date, self.remtable.iloc[-1].rem, 0
+                        remainshare * ratio, date, prevrem, 0
                     )
                     _, rem = rm.sell(rem, -dshare, rdate)
                 else:  # in case value=0, when specialday is in record day
@@ -500,8 +576,9 @@ class trade:
 
                 cash += dcash
                 share += dshare
-            if date in self.aim.specialdate:  # deal with fenhong and xiazhe
-                comment = self.price[self.price["date"] == date].iloc[0].loc["comment"]
+            if date in specialdate:  # deal with fenhong and xiazhe
+                row = self.aim.price.iloc[self.aim.price_pos(date)]
+                comment = row.loc["comment"]
                 if isinstance(comment, float):
                     if comment < 0:
                         dcash2, dshare2 = (
@@ -512,7 +589,7 @@ class trade:
                         # myround(sum(cftable.loc[:,'share'])*(-comment-1))
                     elif comment > 0 and label == 0:
                         dcash2, dshare2 = (
-                            myround(sum(self.cftable.loc[:, "share"]) * comment),
+                            myround(self._share_before() * comment),
                             0,
                         )
                         rem = rm.copy(rem)
@@ -520,15 +597,7 @@ class trade:
                     elif comment > 0 and label == 1:
                         dcash2, dshare2 = (
                             0,
-                            myround(
-                                sum(self.cftable.loc[:, "share"])
-                                * (
-                                    comment
-                                    / self.price[self.price["date"] == date]
-                                    .iloc[0]
-                                    .netvalue
-                                )
-                            ),
+                            myround(self._share_before() * (comment / row.netvalue)),
                         )
                         rem = rm.buy(rem, dshare2, date)
 
@@ -536,19 +605,139 @@ class trade:
                     share += dshare2
                 else:
                     raise ParserFailure("comments not recognized")
+            self._append(rdate, cash, share, rem)
+
+        self.lastdate = lastdate
+        self.rem = rem
+        return True
+
+    def truncate(self, date):
+        """
+        丢弃日期晚于 date 的行并从剩余的最后一行重新开始，与用截断后的 cftable 和 remtable 新建 trade 相同
+
+        :param date: datetime obj
+        """
+        k = bisect_right(self.dates, date)
+        for col in [self.dates, self.cash, self.shares, self.cumshares, self.rems]:
+            del col[k:]
+        self._restart()
 
-        self.cftable = pd.concat(
+    def share(self, date):
+        """
+        date 日的持有份额，与 :meth:`trade.briefdailyreport` 中的 currentshare 相同。
+        临时推进到 date 计算，不改变已有的状态。
+
+        :param date: datetime obj
+        :returns: float, None 代表 date 日尚无持仓记录
+        """
+        n, lastdate, rem = len(self.dates), self.lastdate, self.rem
+        try:
+            self.advance(date)
+            k = bisect_right(self.dates, date)
+            return myround(self.cumshares[k - 1]) if k else None
+        finally:
+            for col in [self.dates, self.cash, self.shares, self.cumshares, self.rems]:
+                del col[n:]
+            self.lastdate, self.rem = lastdate, rem
+
+    def cftable(self, start=0):
+        """
+        :param start: int, 从第几行开始
+        :returns: pd.DataFrame, 现金流量表
+        """
+        return pd.DataFrame(
             [
-                self.cftable,
-                pd.DataFrame([[rdate, cash, share]], columns=["date", "cash", "share"]),
+                [d, c, s]
+                for d, c, s in zip(
+                    self.dates[start:], self.cash[start:], self.shares[start:]
+                )
             ],
-            ignore_index=True,
+            columns=["date", "cash", "share"],
         )
-        self.remtable = pd.concat(
-            [self.remtable, pd.DataFrame([[rdate, rem]], columns=["date", "rem"])],
-            ignore_index=True,
+
+    def remtable(self, start=0):
+        """
+        :param start: int, 从第几行开始
+        :returns: pd.DataFrame, 持仓表
+        """
+        return pd.DataFrame(
+            [[d, r] for d, r in zip(self.dates[start:], self.rems[start:])],
+            columns=["date", "rem"],
         )
 
+
+class trade:
+    """
+    Trade class with fundinfo obj as input and its main attrs are cftable and remtable:
+
+        1. cftable: pd.Dataframe, 现金流量表，每行为不同变更日期，三列分别为 date，cash， share，标记对于某个投资标的
+        现金的进出和份额的变化情况，所有的份额数据为交易当时的不复权数据。基金份额折算通过流量表中一次性的份额增减体现。
+
+        2. remtable：pd.Dataframe, 持仓情况表，每行为不同变更日期，两列分别为 date 和 rem， rem 数据结构是 :class:`xalpha.remain.LotBook`，
+        可以当作嵌套的列表只读使用，包含了不同时间买入仓位的剩余情况，详情参见 remain 模块。这一表格如非必需，避免任何直接调用。
+
+    :param infoobj: info object as the trading aim
+    :param status: status table, obtained from record class
+    """
+
+    def __init__(self, infoobj, status, cftable=None, remtable=None):
+        self.aim = infoobj
+        code = self.aim.code
+        self.code = code
+        self.name = self.aim.name
+        if (cftable is not None and remtable is None) or (
+            cftable is None and remtable is not None
+        ):
+            raise ValueError(
+                "You must provide both `cftable` and `remtable` for incremental trade engine"
+            )
+        # 请确保提供的 cftable 和 remtable 在日期，份额等数据上是匹配的
+        if cftable is None:
+            self.cftable = pd.DataFrame([], columns=["date", "cash", "share"])
+        else:
+            self.cftable = cftable
+        if remtable is None:
+            self.remtable = pd.DataFrame([], columns=["date", "rem"])
+        else:
+            self.remtable = remtable
+        self.status = status
+        if status is not None:
+            self.status = status.loc[:, ["date", code]]
+            self.status = self.status[self.status[code] != 0]
+            self._arrange()
+
+    @property
+    def price(self):
+        """
+        标的的 price 表，每次都从 aim 读取。aim 的 price 表因写时复制或增量更新被替换后，trade 也读到新的表
+        """
+        return self.aim.price
+
+    def _arrange(self):
+        """
+        单次遍历记录日和特殊日（分红，折算日），具体由 :class:`TradeLedger` 完成，最后一次性生成 cftable 和 remtable。
+        若初始化时提供了 cftable 和 remtable，则从其最后一天之后继续计算。
+
+        关于对于一个基金多个操作存在于同一交易日的说明：无法处理历史买入第一笔同时是分红日的情形, 事实上也不存在这种情形。无法处理一日多笔买卖的情形。
+        同一日既有卖也有买不现实，多笔买入只能在 csv 上合并记录，由此可能引起份额计算 0.01 的误差。可以处理分红日买入卖出的情形。
+        分级份额折算日封闭无法买入，所以程序直接忽略当天的买卖。因此不会出现多个操作共存的情形。
+        """
+        code = self.aim.code
+        ledger = TradeLedger(self.aim, self.cftable, self.remtable)
+        for date, value in zip(self.status["date"], self.status[code]):
+            ledger.record(date, value)
+        self.recorddate_set = ledger.recorddate_set
+        if not ledger.advance(yesterdayobj()):
+            return
+        self.lastdate = ledger.lastdate
+        if len(ledger.dates) > ledger.start:
+            self.cftable = pd.concat(
+                [self.cftable, ledger.cftable(ledger.start)], ignore_index=True
+            )
+            self.remtable = pd.concat(
+                [self.remtable, ledger.remtable(ledger.start)], ignore_index=True
+            )
+
     def xirrrate(self, date=yesterdayobj(), startdate=None, guess=0.01):
         """
         give the xirr rate for all the trade of the aim before date (virtually sold out on date)
@@ -558,6 +747,18 @@ class trade:
         """
         return xirrcal(self.cftable, [self], date, startdate, guess)
 
+    def xirrrates(self, dates, guess=0.01):
+        """
+        一次计算多个日期的 xirr，每个日期的结果与 :meth:`xirrrate` 相同，可用于生成滚动的 xirr 序列
+
+        :param dates: sorted pd.DatetimeIndex, the virtually sell-all dates
+        :returns: pd.DataFrame with columns date and xirr
+        """
+        dates = pd.DatetimeIndex(dates)
+        return pd.DataFrame(
+            {"date": dates, "xirr": xirrcal_batch(self.cftable, [self], dates, guess)}
+        )
+
     def dailyreport(self, date=yesterdayobj()):
         date = convert_date(date)
         partcftb = self.cftable[self.cftable["date"] <= date]
@@ -577,15 +778,11 @@ class trade:
             }
             df = pd.DataFrame(reportdict, columns=reportdict.keys())
             return df
-        # totinput = myround(-sum(partcftb.loc[:,'cash']))
-        totinput = myround(
-            -sum([row["cash"] for _, row in partcftb.iterrows() if row["cash"] < 0])
-        )
-        totoutput = myround(
-            sum([row["cash"] for _, row in partcftb.iterrows() if row["cash"] > 0])
-        )
+        cash = partcftb["cash"]
+        totinput = myround(-cash.where(cash < 0, 0).cumsum().iloc[-1])
+        totoutput = myround(cash.where(cash > 0, 0).cumsum().iloc[-1])
 
-        currentshare = myround(sum(partcftb.loc[:, "share"]))
+        currentshare = myround(partcftb["share"].cumsum().iloc[-1])
         currentcash = myround(currentshare * value)
         btnk = bottleneck(partcftb)
         turnover = turnoverrate(partcftb, date)
@@ -617,11 +814,93 @@ class trade:
         df = pd.DataFrame(reportdict, columns=reportdict.keys())
         return df
 
+    def dailyreport_range(self, dates):
+        """
+        一次生成多个日期的 :meth:`dailyreport`，现金流量表的各项累计值只计算一次后按日期对齐
+
+        :param dates: sorted list-like of dates
+        :returns: pd.DataFrame, 每行与对应日期 dailyreport 的结果相同，并在最前增加日期列。
+            首笔交易前的日期只有 dailyreport 中对应的几列有值
+        """
+        dates = pd.DatetimeIndex(dates)
+        columns = [
+            "日期",
+            "基金名称",
+            "基金代码",
+            "当日净值",
+            "单位成本",
+            "持有份额",
+            "基金现值",
+            "基金总申购",
+            "历史最大占用",
+            "基金持有成本",
+            "基金分红与赎回",
+            "换手率",
+            "基金收益总额",
+            "投资收益率",
+        ]
+        if len(dates) == 0:
+            return pd.DataFrame([], columns=columns)
+        cash = self.cftable["cash"]
+        stats = pd.DataFrame(
+            {
+                "date": pd.to_datetime(self.cftable["date"]),
+                "totinput": myround_array(-cash.where(cash < 0, 0).cumsum()),
+                "totoutput": myround_array(cash.where(cash > 0, 0).cumsum()),
+                "share": myround_array(self.cftable["share"].cumsum()),
+                "btnk": myround_array((-cash.cumsum()).cummax()),
+                "volume": abs(cash).cumsum(),
+            }
+        )
+        df = pd.merge_asof(pd.DataFrame({"date": dates}), stats, on="date")
+        price = self._netvalue_table()
+        if price is not None and len(price) > 0:
+            df = pd.merge_asof(df, price, on="date")
+            df["netvalue"] = df["netvalue"].fillna(0)
+        else:
+            df["netvalue"] = 0
+        start = stats["date"].iloc[0] if len(stats) > 0 else None
+
+        rows = []
+        for r in df.itertuples(index=False):
+            if start is None or r.date < start:
+                rows.append(
+                    [r.date, self.name, self.code, r.netvalue]
+                    + [np.nan, 0, 0, 0, 0, np.nan, 0, np.nan, 0, np.nan]
+                )
+                continue
+            currentcash = myround(r.share * r.netvalue)
+            ereturn = myround(currentcash + r.totoutput - r.totinput)
+            days = (r.date - start).days
+            rows.append(
+                [
+                    r.date,
+                    self.name,
+                    self.code,
+                    r.netvalue,
+                    (
+                        round((r.totinput - r.totoutput) / r.share, 4)
+                        if r.share != 0
+                        else 0
+                    ),
+                    r.share,
+                    currentcash,
+                    r.totinput,
+                    r.btnk,
+                    r.totinput - r.totoutput,
+                    r.totoutput,
+                    r.volume / r.btnk / 2.0 * 365 / days if days > 0 else 0,
+                    ereturn,
+                    round((ereturn / r.btnk) * 100, 4) if r.btnk != 0 else 0,
+                ]
+            )
+        return pd.DataFrame(rows, columns=columns)
+
     def get_netvalue(self, date=yesterdayobj()):
-        df = self.price[self.price["date"] <= date]
-        if df is None or len(df) == 0:
+        row = self.aim.price_on_or_before(date)
+        if row is None:
             return 0
-        return df.iloc[-1].netvalue
+        return row.netvalue
 
     def briefdailyreport(self, date=yesterdayobj()):
         """
@@ -646,6 +925,66 @@ class trade:
             "currentvalue": currentvalue,
         }
 
+    def daily_positions(self, start=None, end=yesterdayobj()):
+        """
+        逐日的持仓情况，由现金流量表的一次累积求和与净值表按日期对齐生成，
+        每日的份额，净值和现值与逐日调用 :meth:`briefdailyreport` 的结果相同
+
+        :param start: string or object of datetime, default None 代表从第一笔交易开始
+        :param end: string or object of datetime
+        :returns: pd.DataFrame with columns: date, share, netvalue, value, cashin, cashout,
+            分别为日期，持有份额，单位净值，持仓现值，累计投入和累计分红与赎回。首笔交易前份额，现值和现金流均为 0
+        """
+        end = convert_date(end)
+        if start is None:
+            start = self.cftable.iloc[0].date
+        return self._positions(pd.date_range(convert_date(start), end))
+
+    def _positions(self, dates):
+        """
+        :param dates: sorted pd.DatetimeIndex, the date grid of the output
+        :returns: pd.DataFrame, the same as :meth:`daily_positions` on the given dates
+        """
+        df = pd.DataFrame({"date": dates})
+        if len(df) == 0:
+            return pd.DataFrame(
+                columns=["date", "share", "netvalue", "value", "cashin", "cashout"]
+            )
+        cftable = pd.DataFrame({"date": pd.to_datetime(self.cftable["date"])})
+        # 和 briefdailyreport 一样按顺序累加后再取整
+        cftable["share"] = myround_array(self.cftable["share"].cumsum())
+        cash = self.cftable["cash"]
+        cftable["cashin"] = myround_array(-cash.where(cash < 0, 0).cumsum())
+        cftable["cashout"] = myround_array(cash.where(cash > 0, 0).cumsum())
+        df = pd.merge_asof(df, cftable, on="date")
+        price = self._netvalue_table()
+        if price is not None and len(price) > 0:
+            df = pd.merge_asof(df, price, on="date")
+        else:
+            df["netvalue"] = 0.0
+        df[["share", "cashin", "cashout"]] = df[["share", "cashin", "cashout"]].fillna(
+            0
+        )
+        df["netvalue"] = df["netvalue"].fillna(0)
+        share = df["share"].to_numpy(dtype=float)
+        df["value"] = np.where(
+            share != 0,
+            myround_array(share * df["netvalue"].to_numpy(dtype=float)),
+            0,
+        )
+        return df[["date", "share", "netvalue", "value", "cashin", "cashout"]]
+
+    def _netvalue_table(self):
+        """
+        :returns: pd.DataFrame with columns date and netvalue, used by :meth:`daily_positions`
+        """
+        return pd.DataFrame(
+            {
+                "date": pd.to_datetime(self.price["date"]),
+                "netvalue": self.price["netvalue"],
+            }
+        )
+
     def unitcost(self, date=yesterdayobj()):
         """
         give the unitcost of fund positions
@@ -688,14 +1027,16 @@ class trade:
         """
         visualization on the total values daily change of the aim
         """
-        partp = self.price[self.price["date"] >= self.cftable.iloc[0].date]
-        # 多基金账单时起点可能非该基金持有起点
-        partp = partp[partp["date"] <= end]
+        # 多基金账单时起点可能非该基金持有起点，itrade 没有 aim，直接在有序的日期列上二分
+        pdates = self.price["date"]
+        lo = pdates.searchsorted(self.cftable.iloc[0].date)
+        partp = self.price.iloc[
+            lo : pdates.searchsorted(convert_date(end), side="right")
+        ]
 
         date = [d.date() for d in partp.date]
-        valuedata = [
-            self.briefdailyreport(d).get("currentvalue", 0) for d in partp.date
-        ]
+        positions = self.daily_positions(end=end)
+        valuedata = list(positions[positions["date"].isin(partp.date)]["value"])
 
         line = Line()
         if vopts is None:
@@ -728,6 +1069,8 @@ class itrade(trade):
     场内交易，只包含 cftable 现金流表
     """
 
+    price = None  # 场内标的的 price 表由 get_daily 获取，不跟随 aim
+
     def __init__(self, code, status, cftable=None, name=None):
         """
 
@@ -831,12 +1174,22 @@ class itrade(trade):
     def get_netvalue(self, date=yesterdayobj()):
         if self.price is None:
             return 0
-        df = self.price[self.price["date"] <= date]
-        if len(df) > 0:
-            return df.iloc[-1].close
+        i = self.price["date"].searchsorted(convert_date(date), side="right")
+        if i > 0:
+            return self.price.iloc[i - 1].close
         else:
             return 0
 
+    def _netvalue_table(self):
+        if self.price is None:
+            return None
+        return pd.DataFrame(
+            {
+                "date": pd.to_datetime(self.price["date"]),
+                "netvalue": self.price["close"],
+            }
+        )
+
 
 Trade = trade
 ITrade = itrade
@@ -10,7 +10,11 @@ import io
 import logging
 import os
 import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from functools import lru_cache, wraps
 from uuid import uuid4
 
@@ -18,7 +22,7 @@ import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import exc
+from sqlalchemy import exc, sql
 
 try:
     from jqdatasdk import (
@@ -52,6 +56,11 @@ from xalpha.cons import (
     today_obj,
     _float,
     last_onday,
+    file_lock,
+    atomic_write,
+    append_interrupted,
+    csv_append,
+    read_complete,
 )
 from xalpha.provider import data_source
 from xalpha.exceptions import DataPossiblyWrong, ParserFailure
@@ -169,17 +178,32 @@ def get_historical_fromxq(code, count, type_="before", full=False):
     :param full:
     :return:
     """
+    r = rget_json(
+        _xq_kline_url(code, count, type_=type_, full=full),
+        cookies=get_token(),
+        headers={"user-agent": "Mozilla/5.0"},
+    )
+    return _parse_xq_kline(code, r)
+
+
+def _xq_kline_url(code, count, type_="before", full=False):
     url = "https://stock.xueqiu.com/v5/stock/chart/kline.json?symbol={code}&begin={tomorrow}&period=day&type={type_}&count=-{count}"
     if full:
         url += "&indicator=kline,pe,pb,ps,pcf,market_capital,agt,ggt,balance"
     # pe 是 TTM 数据
-    r = rget_json(
-        url.format(
-            code=code, tomorrow=int(tomorrow_ts() * 1000), count=count, type_=type_
-        ),
-        cookies=get_token(),
-        headers={"user-agent": "Mozilla/5.0"},
+    return url.format(
+        code=code, tomorrow=int(tomorrow_ts() * 1000), count=count, type_=type_
     )
+
+
+def _parse_xq_kline(code, r):
+    """
+    解析雪球日线 API 返回的 json
+
+    :param code: str.
+    :param r: Dict.
+    :return: pd.DataFrame
+    """
     if not r.get("data") or r["data"].get("item") is None:
         raise DataPossiblyWrong(
             "Xueqiu API fails to return data for %s, check if the symbol is correct"
@@ -459,9 +483,9 @@ def get_fund(code):
         if code.startswith("F96"):
             return get_historical_from_ttjj_oversea(code)
         else:
-            df = fundinfo(code[1:], path="nobackend", priceonly=True).price
+            df = fundinfo(code[1:], path="nobackend").price
     elif code[0] == "T":
-        df = fundinfo(code[1:], path="nobackend", priceonly=True).price
+        df = fundinfo(code[1:], path="nobackend").price
         df["netvalue"] = df["totvalue"]
     elif code[0] == "M":
         df = mfundinfo(code[1:], path="nobackend").price
@@ -1009,6 +1033,57 @@ def set_handler(method="daily", f=None):
     setattr(thismodule, "get_" + method + "_handler", f)
 
 
+def _daily_route(code):
+    """
+    根据代码自动选择日线数据的数据源，英为代码的 id 转换和 ycharts 代码的解析留给调用方
+
+    :param code: str. 规则同 :func:`get_daily`
+    :return: Tuple[str, str]. 数据源和去掉数据源前缀的代码
+    """
+    if (code.startswith("SH") or code.startswith("SZ")) and code[2:8].isdigit():
+        _from = "xueqiu"
+    elif code.endswith("/CNY") or code.startswith("CNY/"):
+        _from = "zjj"
+    elif code.isdigit():
+        _from = "cninvesting"
+    elif code[0] in ["F", "M", "T"] and code[1:].isdigit():
+        _from = "ttjj"
+    elif code.startswith("HK") and code[2:7].isdigit():
+        _from = "xueqiu"
+        code = code[2:]
+    elif code.startswith("SP") and code[2:].split(".")[0].isdigit():
+        _from = "SP"
+    elif code.startswith("SPC") and code[3:].split(".")[0].isdigit():
+        _from = "SPC"
+    elif (
+        code.startswith("ZZ") and code[4:].isdigit()
+    ):  # 注意中证系列指数的代码里可能包含字母！
+        _from = "ZZ"
+    elif (
+        code.startswith("GZ") and code[-3:].isdigit()
+    ):  # 注意国证系列指数的代码里可能包含多个字母！
+        _from = "GZ"
+    elif code.startswith("HZ") and code[2:].isdigit():
+        _from = "HZ"
+    elif code.startswith("ESCI") and code[4:].isdigit():
+        _from = "ES"
+    elif (
+        code.startswith("yc-companies/")
+        or code.startswith("yc-indices/")
+        or code.startswith("yc-indicators/")
+    ):
+        _from = "ycharts"
+    elif len(code.split("-")) >= 2 and len(code.split("-")[0]) <= 3:
+        # peb-000807.XSHG
+        _from = code.split("-")[0]
+        code = "-".join(code.split("-")[1:])
+    elif len(code[1:].split("/")) == 2:
+        _from = "cninvesting"
+    else:
+        _from = "xueqiu"  # 美股代码
+    return _from, code
+
+
 def _get_daily(
     code, start=None, end=None, prev=365, _from=None, wrapper=True, handler=True, **kws
 ):
@@ -1111,39 +1186,10 @@ def _get_daily(
         start_obj = dstr2dobj(start)
 
     if not _from:
-        if (code.startswith("SH") or code.startswith("SZ")) and code[2:8].isdigit():
-            _from = "xueqiu"
-        elif code.endswith("/CNY") or code.startswith("CNY/"):
-            _from = "zjj"
-        elif code.isdigit():
-            _from = "cninvesting"
-        elif code[0] in ["F", "M", "T"] and code[1:].isdigit():
-            _from = "ttjj"
-        elif code.startswith("HK") and code[2:7].isdigit():
-            _from = "xueqiu"
-            code = code[2:]
-        elif code.startswith("SP") and code[2:].split(".")[0].isdigit():
-            _from = "SP"
-        elif code.startswith("SPC") and code[3:].split(".")[0].isdigit():
-            _from = "SPC"
-        elif (
-            code.startswith("ZZ") and code[4:].isdigit()
-        ):  # 注意中证系列指数的代码里可能包含字母！
-            _from = "ZZ"
-        elif (
-            code.startswith("GZ") and code[-3:].isdigit()
-        ):  # 注意国证系列指数的代码里可能包含多个字母！
-            _from = "GZ"
-        elif code.startswith("HZ") and code[2:].isdigit():
-            _from = "HZ"
-        elif code.startswith("ESCI") and code[4:].isdigit():
-            _from = "ES"
-        elif (
-            code.startswith("yc-companies/")
-            or code.startswith("yc-indices/")
-            or code.startswith("yc-indicators/")
-        ):
-            _from = "ycharts"
+        _from, code = _daily_route(code)
+        if _from == "cninvesting" and len(code[1:].split("/")) == 2:
+            code = get_investing_id(code)
+        elif _from == "ycharts":
             params = code.split("/")
             code = params[1]
             category = params[0].split("-")[1]
@@ -1156,15 +1202,6 @@ def _get_daily(
                     metric = "level"
                 elif category == "indicators":
                     metric = "1"  # seems not important
-        elif len(code.split("-")) >= 2 and len(code.split("-")[0]) <= 3:
-            # peb-000807.XSHG
-            _from = code.split("-")[0]
-            code = "-".join(code.split("-")[1:])
-        elif len(code[1:].split("/")) == 2:
-            _from = "cninvesting"
-            code = get_investing_id(code)
-        else:
-            _from = "xueqiu"  # 美股代码
 
     count = (today_obj() - start_obj).days + 1
     start_str = start_obj.strftime("%Y/%m/%d")
@@ -1299,42 +1336,57 @@ def _get_daily(
         return df
 
 
-def get_xueqiu_rt(code):
+def _xueqiu_symbol(code):
     if code.startswith("HK") and code[2:].isdigit():
         code = code[2:]
+    return code
+
+
+def get_xueqiu_rt(code):
+    code = _xueqiu_symbol(code)
     url = "https://stock.xueqiu.com/v5/stock/quote.json?symbol={code}&extend=detail"
     r = rget_json(
         url.format(code=code),
         cookies=get_token(),
         headers={"user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_4)"},
     )
-    n = r["data"]["quote"]["name"]
-    q = r["data"]["quote"]["current"]
+    return _parse_xueqiu_rt(r["data"])
+
+
+def _parse_xueqiu_rt(data):
+    """
+    解析雪球单个标的的实时行情
+
+    :param data: Dict. 包含 quote 和 market 两项，单标的和批量 API 的返回格式相同
+    :return: Dict[str, Any].
+    """
+    n = data["quote"]["name"]
+    q = data["quote"]["current"]
     try:
         q = _float(q)
     except TypeError:  # 针对雪球实时在9点后开盘前可能出现其他情形的fixup， 效果待 check
         # 现在的怀疑是在9am 到9:15 am, 雪球 API current 字段返回 Null
-        q = _float(r["data"]["quote"]["last_close"])
-    q_ext = r["data"]["quote"].get("current_ext", None)
-    percent = r["data"]["quote"]["percent"]
+        q = _float(data["quote"]["last_close"])
+    q_ext = data["quote"].get("current_ext", None)
+    percent = data["quote"]["percent"]
     try:
         percent = _float(percent)
     except Exception:
         pass
-    currency = r["data"]["quote"]["currency"]
-    market = r["data"]["market"]["region"]
-    timestr = dt.datetime.fromtimestamp(r["data"]["quote"]["time"] / 1000).strftime(
+    currency = data["quote"]["currency"]
+    market = data["market"]["region"]
+    timestr = dt.datetime.fromtimestamp(data["quote"]["time"] / 1000).strftime(
         "%Y-%m-%d %H:%M:%S"
     )
-    if r["data"]["quote"].get("timestamp_ext", None):
+    if data["quote"].get("timestamp_ext", None):
         time_ext = dt.datetime.fromtimestamp(
-            r["data"]["quote"]["timestamp_ext"] / 1000
+            data["quote"]["timestamp_ext"] / 1000
         ).strftime("%Y-%m-%d %H:%M:%S")
     else:
         time_ext = None
-    share = r["data"]["quote"]["total_shares"]
-    fshare = r["data"]["quote"]["float_shares"]
-    volume = r["data"]["quote"]["volume"]
+    share = data["quote"]["total_shares"]
+    fshare = data["quote"]["float_shares"]
+    volume = data["quote"]["volume"]
     return {
         "name": n,
         "current": q,
@@ -1438,7 +1490,11 @@ def get_cninvesting_rt(suburl, app=False):
     return d
 
 
-def get_rt_from_sina(code):
+def _sina_code(code):
+    """
+    :param code: str. 规则同 :func:`get_rt`
+    :return: Tuple[str, str]. 去掉前缀的代码和新浪 API 中的代码
+    """
     if code.startswith("sina-"):
         code = code[5:]
     if (
@@ -1454,12 +1510,28 @@ def get_rt_from_sina(code):
         if code.startswith("."):
             code = code[1:]
         tinycode += code.lower()
+    return code, tinycode
+
+
+def get_rt_from_sina(code):
+    code, tinycode = _sina_code(code)
     headers = {"Referer": "https://finance.sina.com.cn"}
     r = rget(
         "https://hq.sinajs.cn/list={tinycode}".format(tinycode=tinycode),
         headers=headers,
     )
-    l = r.text.split("=")[1].split(",")
+    return _parse_sina_rt(code, r.text)
+
+
+def _parse_sina_rt(code, text):
+    """
+    解析新浪单个标的的实时行情
+
+    :param code: str. 经 :func:`_sina_code` 处理后的代码
+    :param text: str. API 返回中该标的对应的 ``var hq_str_xxx="...";`` 一行
+    :return: Dict[str, Any].
+    """
+    l = text.split("=")[1].split(",")
     d = {}
     d["name"] = l[0].strip('"')
     if (
@@ -1779,13 +1851,41 @@ def get_fund_type(code):
         return "其他"
 
 
+_rt_alias = {"xq": "xueqiu", "snowball": "xueqiu", "sn": "sina", "xinlang": "sina"}
+
+
+def _rt_route(code, _from=None):
+    """
+    根据代码自动选择实时行情的数据源，数据源的别名统一为规范名称
+
+    :param code: str.
+    :param _from: Optional[str]. 若已指定数据源则不再自动选择
+    :return: Tuple[str, str]. 数据源和去掉数据源前缀的代码
+    """
+    if not _from:
+        # if code.startswith("HK") and code[2:].isdigit():
+        #     _from = "xueqiu"
+        if code.startswith("yc-"):
+            _from = "ycharts"
+        elif len(code.split("-")) >= 2 and len(code.split("-")[0]) <= 3:
+            _from = code.split("-")[0]
+            code = "-".join(code.split("-")[1:])
+        elif (code.startswith("F") or code.startswith("T")) and code[1:].isdigit():
+            _from = "ttjj"
+        elif len(code.split("/")) > 1:
+            _from = "investing"
+        else:  # 默认启用雪球实时，新浪纯指数行情不完整
+            _from = "xueqiu"
+    return _rt_alias.get(_from, _from), code
+
+
 def get_rt(
     code, _from=None, double_check=False, double_check_threhold=0.005, handler=True
 ):
     """
     universal fetcher for realtime price of literally everything.
 
-    :param code: str. 规则同 :func:`get_daily`. 需要注意场外基金和外汇中间价是不支持实时行情的，因为其每日只有一个报价。对于 investing 的数据源，只支持网址格式代码。
+    :param code: str. 规则同 :func:`get_daily`. 若为代码列表，则等价于 :func:`get_rt_batch`. 需要注意场外基金和外汇中间价是不支持实时行情的，因为其每日只有一个报价。对于 investing 的数据源，只支持网址格式代码。
     :param _from: Optional[str]. can be one of "xueqiu", "investing". Only used for debug to
         enfore data source. For common use, _from can be chosed automatically based on code in the run time.
     :param double_check: Optional[bool], default False. 如果设为 True，只适用于 A 股，美股，港股实时行情，会通过至少两个不同的数据源交叉验证，确保正确。
@@ -1798,6 +1898,16 @@ def get_rt(
     # 现在用的新浪实时数据源延迟严重， double check 并不靠谱，港股数据似乎有15分钟延迟（已解决）
     # 雪球实时和新浪实时在9：00之后一段时间可能都有问题
     # FT 数据源有10到20分钟的延迟
+    if not isinstance(code, str):
+        # 钩子总是以单个代码调用，由 get_rt_batch 逐个分发
+        return get_rt_batch(
+            code,
+            _from=_from,
+            double_check=double_check,
+            double_check_threhold=double_check_threhold,
+            handler=handler,
+        )
+
     if handler:
         if getattr(thismodule, "get_rt_handler", None):
             args = inspect.getargvalues(inspect.currentframe())
@@ -1806,20 +1916,7 @@ def get_rt(
             if fr:
                 return fr
 
-    if not _from:
-        # if code.startswith("HK") and code[2:].isdigit():
-        #     _from = "xueqiu"
-        if code.startswith("yc-"):
-            _from = "ycharts"
-        elif len(code.split("-")) >= 2 and len(code.split("-")[0]) <= 3:
-            _from = code.split("-")[0]
-            code = "-".join(code.split("-")[1:])
-        elif (code.startswith("F") or code.startswith("T")) and code[1:].isdigit():
-            _from = "ttjj"
-        elif len(code.split("/")) > 1:
-            _from = "investing"
-        else:  # 默认启用雪球实时，新浪纯指数行情不完整
-            _from = "xueqiu"
+    _from, code = _rt_route(code, _from)
     if _from in ["cninvesting", "investing"]:
         try:
             return get_cninvesting_rt(code)
@@ -1882,12 +1979,276 @@ def get_rt(
         raise ParserFailure("unrecoginzed _from for %s" % _from)
 
 
+def _get_xueqiu_rt_batch(pairs):
+    """
+    :param pairs: List[Tuple[str, str]]. 原始代码和去掉数据源前缀的代码
+    :return: Dict[str, Dict[str, Any]]. 解析失败的标的不在返回中
+    """
+    symbols = {}
+    for code, c in pairs:
+        symbols.setdefault(_xueqiu_symbol(c), []).append(code)
+    url = "https://stock.xueqiu.com/v5/stock/batch/quote.json?symbol={symbols}&extend=detail"
+    r = rget_json(
+        url.format(symbols=",".join(symbols.keys())),
+        cookies=get_token(),
+        headers={"user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_4)"},
+    )
+    result = {}
+    for item in r["data"]["items"]:
+        try:
+            symbol = item["quote"]["symbol"]
+            d = _parse_xueqiu_rt(item)
+        except (IndexError, ValueError, AttributeError, TypeError, KeyError) as e:
+            logger.warning("Fails in parsing xueqiu batch quote due to %s" % e)
+            continue
+        for code in symbols.get(symbol, []):
+            result[code] = d
+    return result
+
+
+def _get_sina_rt_batch(pairs):
+    """
+    :param pairs: List[Tuple[str, str]]. 原始代码和去掉数据源前缀的代码
+    :return: Dict[str, Dict[str, Any]]. 解析失败的标的不在返回中
+    """
+    tinycodes = {}
+    for code, c in pairs:
+        c, tinycode = _sina_code(c)
+        tinycodes.setdefault(tinycode, []).append((code, c))
+    headers = {"Referer": "https://finance.sina.com.cn"}
+    r = rget(
+        "https://hq.sinajs.cn/list={tinycodes}".format(
+            tinycodes=",".join(tinycodes.keys())
+        ),
+        headers=headers,
+    )
+    result = {}
+    for line in r.text.split("\n"):
+        if not line.startswith("var hq_str_"):
+            continue
+        tinycode = line.split("=")[0][len("var hq_str_") :]
+        for code, c in tinycodes.get(tinycode, []):
+            try:
+                result[code] = _parse_sina_rt(c, line)
+            except (IndexError, ValueError, AttributeError, TypeError) as e:
+                logger.warning("Fails in parsing sina batch quote due to %s" % e)
+    return result
+
+
+def get_rt_batch(
+    codes,
+    _from=None,
+    chunk=50,
+    double_check=False,
+    double_check_threhold=0.005,
+    handler=True,
+):
+    """
+    批量获取实时行情。雪球和新浪数据源的标的按数据源分组，每组每 chunk 个标的只发送一次请求，
+    其他数据源的标的以及批量结果中解析失败的标的，则逐个调用 :func:`get_rt`。
+
+    :param codes: List[str]. 代码规则同 :func:`get_rt`
+    :param _from: Optional[str]. 指定所有标的使用的数据源，默认根据代码自动选择
+    :param chunk: int. 单次请求包含的最多标的数
+    :param double_check: Optional[bool], default False. 同 :func:`get_rt`，雪球和新浪数据源的标的从两个数据源分别批量获取并交叉验证
+    :param double_check_threhold: float. 交叉验证允许的相对误差
+    :param handler: bool. Default True. 若设定了 get_rt 的钩子，则逐个调用 :func:`get_rt` 以保证钩子生效。
+    :return: Dict[str, Dict[str, Any]]. 以 codes 中的代码为键，值与 :func:`get_rt` 的返回相同
+    """
+    kws = {
+        "_from": _from,
+        "double_check": double_check,
+        "double_check_threhold": double_check_threhold,
+    }
+    if handler and getattr(thismodule, "get_rt_handler", None):
+        return {code: get_rt(code, **kws) for code in codes}
+    groups = {"xueqiu": [], "sina": []}
+    checked = set()  # 需要交叉验证的标的
+    for code in codes:
+        source, c = _rt_route(code, _from)
+        if double_check and source in ["xueqiu", "sina"]:
+            groups["xueqiu"].append((code, c))
+            groups["sina"].append((code, c))
+            checked.add(code)
+        elif source in groups:
+            groups[source].append((code, c))
+    fetched = {"xueqiu": {}, "sina": {}}
+    for source, f in [("xueqiu", _get_xueqiu_rt_batch), ("sina", _get_sina_rt_batch)]:
+        pairs = list(dict.fromkeys(groups[source]))
+        for i in range(0, len(pairs), chunk):
+            try:
+                fetched[source].update(f(pairs[i : i + chunk]))
+            except (IndexError, ValueError, AttributeError, TypeError, KeyError) as e:
+                logger.warning(
+                    "Fails in batch quote from %s due to %s, fetch one by one"
+                    % (source, e)
+                )
+    result = {}
+    for code in codes:
+        if code in checked:
+            r1 = fetched["xueqiu"].get(code)
+            r2 = fetched["sina"].get(code)
+            if r1 is None or r2 is None:
+                continue
+            if abs(r1["current"] / r2["current"] - 1) > double_check_threhold:
+                raise DataPossiblyWrong("realtime data unmatch for %s" % code)
+            result[code] = r2
+        elif code in fetched["xueqiu"]:
+            result[code] = fetched["xueqiu"][code]
+        elif code in fetched["sina"]:
+            result[code] = fetched["sina"][code]
+    for code in codes:
+        if code not in result:
+            result[code] = get_rt(code, handler=False, **kws)
+    return {code: result[code] for code in codes}
+
+
 get_realtime = get_rt
 get_now = get_rt
 
 _cached_data = {}
 
 
+class MemoryCache:
+    """
+    :func:`cachedio` 的内存层缓存，按 LRU 规则淘汰，可设置条目数上限，总字节数上限以及过期时间。
+    默认三者均不限制，行为与普通字典相同。字节数由 ``pd.DataFrame.memory_usage(deep=True)`` 估算。
+    读写均加锁，可在多线程中共享。
+
+    :param maxsize: Optional[int]. 最多缓存的条目数
+    :param maxbytes: Optional[int]. 缓存数据的总字节数上限
+    :param ttl: Optional[float]. 默认的过期时间，单位为秒，可在 :meth:`set` 中对单个 key 单独指定
+    """
+
+    def __init__(self, maxsize=None, maxbytes=None, ttl=None):
+        self._data = OrderedDict()  # key: (value, nbytes, expire_ts)
+        self._lock = threading.RLock()
+        self.nbytes = 0
+        self.configure(maxsize=maxsize, maxbytes=maxbytes, ttl=ttl)
+
+    def configure(self, maxsize=None, maxbytes=None, ttl=None):
+        """
+        重新设定缓存上限，超出的部分立即按 LRU 淘汰
+
+        :param maxsize: Optional[int].
+        :param maxbytes: Optional[int].
+        :param ttl: Optional[float].
+        :return: None.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self.maxbytes = maxbytes
+            self.ttl = ttl
+            self._evict()
+
+    @staticmethod
+    def _sizeof(value):
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return int(np.sum(value.memory_usage(index=True, deep=True)))
+        return sys.getsizeof(value)
+
+    def set(self, key, value, ttl=None):
+        """
+        写入缓存
+
+        :param key: str.
+        :param value: usually pd.DataFrame.
+        :param ttl: Optional[float]. 该 key 的过期时间（秒），默认使用全局设定
+        :return: None.
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expire = time.time() + ttl if ttl is not None else None
+        nbytes = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, nbytes, expire)
+            self.nbytes += nbytes
+            self._evict()
+
+    def _remove(self, key):
+        _, nbytes, _ = self._data.pop(key)
+        self.nbytes -= nbytes
+
+    def _expired(self, key):
+        expire = self._data[key][2]
+        return expire is not None and time.time() > expire
+
+    def _evict(self):
+        while len(self._data) > 1 and (
+            (self.maxsize is not None and len(self._data) > self.maxsize)
+            or (self.maxbytes is not None and self.nbytes > self.maxbytes)
+        ):
+            key = next(iter(self._data))
+            logger.debug("evict %s from memory cache" % key)
+            self._remove(key)
+        if self.maxsize == 0 and self._data:
+            self.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self._data:
+                return False
+            if self._expired(key):
+                self._remove(key)
+                return False
+            return True
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key not in self:
+                raise KeyError(key)
+            self._data.move_to_end(key)
+            return self._data[key][0]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            self._remove(key)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(list(self._data.keys()))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def clear(self):
+        with self._lock:
+            self._data = OrderedDict()
+            self.nbytes = 0
+
+
+_cache_limits = {"maxsize": None, "maxbytes": None, "ttl": None}
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+def _key_lock(key):
+    """
+    每个缓存 key 对应一把锁，保证多线程下同一 key 不会被重复抓取和写入
+
+    :param key: str.
+    :return: threading.RLock
+    """
+    with _key_locks_guard:
+        return _key_locks.setdefault(key, threading.RLock())
+
+
 def reset_cache():
     """
     clear all cache of daily data in memory.
@@ -1896,7 +2257,7 @@ def reset_cache():
     """
     global _cached_data
     _cached_data = {}
-    setattr(thismodule, "cached_dict", {})
+    setattr(thismodule, "cached_dict", MemoryCache(**_cache_limits))
 
 
 def cached(s):
@@ -1961,14 +2322,214 @@ def cached(s):
     return cached_start
 
 
+_file_backends = ["csv", "parquet", "feather"]
+
+
+def _backend_key(key, backend):
+    """
+    文件类后端的 key 需要加上对应的后缀名
+
+    :param key: str.
+    :param backend: str. csv, parquet, feather or sql
+    :return: str.
+    """
+    if backend in _file_backends:
+        key = key + "." + backend
+    return key
+
+
+def _backend_lock(key, backend, path):
+    """
+    文件类后端按 key 加跨进程的文件锁，不同 key 之间互不阻塞；sql 的并发由数据库自身处理
+
+    :param key: str. 已经包含后缀的 key
+    :param backend: str.
+    :param path: str of folder or sqlalchemy engine
+    :return: context manager
+    """
+    if backend in _file_backends:
+        return file_lock(os.path.join(path, key))
+    return nullcontext()
+
+
+def _read_backend(key, backend, path):
+    """
+    从硬盘级别的后端读取完整的表，parquet 和 feather 以列存储，日期列直接保存为 datetime 类型，读取时无需再解析
+
+    :param key: str. 已经包含后缀的 key
+    :param backend: str. csv, sql, parquet or feather
+    :param path: str of folder or sqlalchemy engine
+    :return: pd.DataFrame
+    """
+    if backend == "csv":
+        # 追加写入中途崩溃留下的残行不能被当作数据读入，只在内存中略去，不修改文件
+        return pd.read_csv(io.BytesIO(read_complete(os.path.join(path, key))))
+    elif backend == "sql":
+        return pd.read_sql(key, path)
+    elif backend == "parquet":
+        return pd.read_parquet(os.path.join(path, key))
+    elif backend == "feather":
+        return pd.read_feather(os.path.join(path, key))
+    raise ValueError("no %s option for backend" % backend)
+
+
+def _backend_lastdate(key, backend, path, date="date"):
+    """
+    只读取硬盘级别后端中表的最后日期，用于校验内存层是否已落后于其他进程写入的内容。
+    csv 仅读取文件首行和末尾的一行，sql 直接查询最大日期
+
+    :param key: str. 已经包含后缀的 key
+    :param backend: str. csv, sql, parquet or feather
+    :param path: str of folder or sqlalchemy engine
+    :param date: str. 日期列名
+    :return: pd.Timestamp or None, 表不存在或为空时返回 None
+    """
+    try:
+        if backend == "csv":
+            # 上次追加中途崩溃时略去末尾的残行，不修改文件
+            torn = append_interrupted(os.path.join(path, key))
+            with open(os.path.join(path, key), "rb") as f:
+                header = f.readline()
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                block = min(size, 4096)
+                while True:
+                    f.seek(size - block)
+                    chunk = f.read(block)
+                    lines = [l for l in chunk.splitlines() if l.strip()]
+                    if torn and not chunk.endswith(b"\n"):
+                        lines = lines[:-1]
+                    # 非整个文件时，首行可能不完整，需至少两行才能确定最后一行完整
+                    if len(lines) >= 2 or block == size:
+                        break
+                    block = min(size, 2 * block)
+            if block == size and len(lines) <= 1:
+                return None
+            last = pd.read_csv(io.BytesIO(header + lines[-1]))
+            lastdate = last[date].iloc[0]
+        elif backend == "sql":
+            query = sql.func.max(sql.column(date)).select().select_from(sql.table(key))
+            lastdate = pd.read_sql(query, path)
+            lastdate = lastdate.iloc[0, 0]
+        elif backend == "parquet":
+            lastdate = pd.read_parquet(os.path.join(path, key), columns=[date])[date]
+            lastdate = lastdate.iloc[-1] if len(lastdate) > 0 else None
+        elif backend == "feather":
+            lastdate = pd.read_feather(os.path.join(path, key), columns=[date])[date]
+            lastdate = lastdate.iloc[-1] if len(lastdate) > 0 else None
+        else:
+            raise ValueError("no %s option for backend" % backend)
+    except (FileNotFoundError, exc.SQLAlchemyError):
+        return None
+    if lastdate is None or pd.isna(lastdate):
+        return None
+    return pd.Timestamp(lastdate)
+
+
+def _merge_backend(df, key, backend, path, date="date"):
+    """
+    将硬盘级别后端中日期早于或晚于 df 范围的行并入 df，用于其他进程已经更新了同一张表的情形
+
+    :param df: pd.DataFrame, 日期列为 datetime 类型
+    :param key: str. 已经包含后缀的 key
+    :param backend: str.
+    :param path: str of folder or sqlalchemy engine
+    :param date: str. 日期列名
+    :return: pd.DataFrame
+    """
+    try:
+        disk = _read_backend(key, backend, path)
+    except (FileNotFoundError, exc.SQLAlchemyError, KeyError):
+        return df
+    if len(disk) == 0:
+        return df
+    if not pd.api.types.is_datetime64_any_dtype(disk[date]):
+        disk[date] = pd_to_datetime(disk[date])
+    head = disk[disk[date] < df.iloc[0][date]]
+    tail = disk[disk[date] > df.iloc[-1][date]]
+    return pd.concat([head, df, tail], ignore_index=True, sort=False)
+
+
+def _write_backend(key, df, backend, path):
+    """
+    将完整的表写入硬盘级别的后端，覆盖原有内容，文件类后端先写临时文件再原子替换
+
+    :param key: str. 已经包含后缀的 key
+    :param df: pd.DataFrame
+    :param backend: str. csv, sql, parquet or feather
+    :param path: str of folder or sqlalchemy engine
+    :return: None.
+    """
+    if backend == "csv":
+        atomic_write(os.path.join(path, key), lambda f: df.to_csv(f, index=False))
+    elif backend == "sql":
+        df.to_sql(key, con=path, if_exists="replace", index=False)
+    elif backend == "parquet":
+        atomic_write(os.path.join(path, key), lambda f: df.to_parquet(f, index=False))
+    elif backend == "feather":
+        # feather 仅支持默认的 RangeIndex
+        atomic_write(
+            os.path.join(path, key),
+            lambda f: df.reset_index(drop=True).to_feather(f),
+        )
+    else:
+        raise ValueError("no %s option for backend" % backend)
+
+
+def _append_backend(key, df, backend, path):
+    """
+    将增量部分追加写入硬盘级别的后端，只支持 csv 和 sql。csv 原地追加，调用方需持有该 key 的文件锁。
+    追加经由 :func:`xalpha.cons.csv_append`，上次追加中途崩溃留下的残行在追加前截去，使新的行总是从完整的行之后开始
+
+    :param key: str. 已经包含后缀的 key
+    :param df: pd.DataFrame, 列的顺序需与已有表一致
+    :param backend: str. csv or sql
+    :param path: str of folder or sqlalchemy engine
+    :return: None.
+    """
+    if backend == "csv":
+        with csv_append(os.path.join(path, key)):
+            df.to_csv(os.path.join(path, key), index=False, header=False, mode="a")
+    elif backend == "sql":
+        df.to_sql(key, con=path, if_exists="append", index=False)
+    else:
+        raise ValueError("no append support for %s backend" % backend)
+
+
+def _append_delta(lastrow, df2, columns):
+    """
+    判断向后延拓的新数据能否以追加的方式写入缓存。
+
+    :param lastrow: pd.DataFrame of one row or None, 被新数据替换掉的原有最后一行
+    :param df2: pd.DataFrame, 新获取的数据
+    :param columns: 原有表的列
+    :return: pd.DataFrame 需要追加的行，按原有表的列排序；若原有数据被改变或列不一致则返回 None，需整表重写
+    """
+    if set(df2.columns) != set(columns):
+        return None
+    df2 = df2[list(columns)]
+    if lastrow is None:
+        return df2
+    old = lastrow.iloc[0]
+    new = df2.iloc[0]
+    if old["date"] != new["date"]:
+        return None
+    for col in columns:
+        if not (old[col] == new[col] or (pd.isna(old[col]) and pd.isna(new[col]))):
+            return None
+    return df2.iloc[1:]
+
+
 def cachedio(**ioconf):
     """
     用法类似:func:`cached`，通用透明缓存器，用来作为 (code, start, end ...) -> pd.DataFrame 形式函数的缓存层，
     避免重复爬取已有数据。
 
-    :param **ioconf: 可选关键字参数 backend: csv or sql or memory,
-        path: csv 文件夹或 sql engine， refresh True 会刷新结果，重新爬取, default False，
-        prefix 是 key 前统一部分, 缓存 hash 标志
+    :param **ioconf: 可选关键字参数 backend: csv or sql or parquet or feather or memory,
+        path: csv, parquet, feather 文件夹或 sql engine， refresh True 会刷新结果，重新爬取, default False，
+        prefix 是 key 前统一部分, 缓存 hash 标志。parquet 和 feather 需要额外安装 pyarrow，
+        其日期列以原生时间类型存储，冷启动读取时无需重新解析日期。
+        ttl 为内存层缓存的过期时间（秒），也可在调用时单独指定。
     :return:
     """
 
@@ -2043,103 +2604,129 @@ def cachedio(**ioconf):
                 df = df[df["date"] >= kws["start"]]
                 return df
             else:
-                if backend == "csv":
-                    key = key + ".csv"
-                if not getattr(thismodule, "cached_dict", None):
-                    setattr(thismodule, "cached_dict", {})
-                if refresh:
-                    is_changed = True
-                    df0 = f(*args, **kws)
-
-                else:  # non refresh
-                    try:
-                        if backend == "csv":
-                            if key in getattr(thismodule, "cached_dict"):
-                                # 即使硬盘级别的缓存，也有内存层，加快读写速度
-                                df0 = getattr(thismodule, "cached_dict")[key]
-                            else:
-                                df0 = pd.read_csv(os.path.join(path, key))
-                        elif backend == "sql":
-                            if key in getattr(thismodule, "cached_dict"):
+                key = _backend_key(key, backend)
+                with _key_locks_guard:
+                    if getattr(thismodule, "cached_dict", None) is None:
+                        setattr(thismodule, "cached_dict", MemoryCache(**_cache_limits))
+                # 线程锁只针对当前 key；文件锁只在读写硬盘时持有，内存层命中时不产生任何 IO
+                with _key_lock(key):
+                    delta = None  # 仅向后延拓且旧数据未被改变时，只需追加写入的增量部分
+                    basis = None  # 读入时表的最后日期，写回前据此判断硬盘上的表是否已被其他进程更新
+                    if refresh:
+                        is_changed = True
+                        df0 = f(*args, **kws)
+
+                    else:  # non refresh
+                        try:
+                            if backend == "memory":
                                 df0 = getattr(thismodule, "cached_dict")[key]
                             else:
-                                df0 = pd.read_sql(key, path)
-                        elif backend == "memory":
-                            df0 = getattr(thismodule, "cached_dict")[key]
-                        else:
-                            raise ValueError("no %s option for backend" % backend)
-                        df0[date] = pd_to_datetime(df0[date])
-                        # 向前延拓
-                        is_changed = False
-                        if df0.iloc[0][date] > start_obj and not fetchonly:
-                            kws["start"] = start_str
-                            kws["end"] = (
-                                df0.iloc[0][date] - pd.Timedelta(days=1)
-                            ).strftime("%Y%m%d")
-                            if has_weekday(kws["start"], kws["end"]):
-                                # 考虑到海外市场的不同情况，不用 opendate 判断，采取保守型判别
-                                df1 = f(*args, **kws)
-                                if df1 is not None and len(df1) > 0:
-                                    df1 = df1[df1["date"] <= kws["end"]]
-                                if df1 is not None and len(df1) > 0:
-                                    is_changed = True
-                                    df0 = pd.concat(
-                                        [df1, df0], ignore_index=True, sort=False
-                                    )
-                        # 向后延拓
-                        if df0.iloc[-1][date] < end_obj and not fetchonly:
-                            nextday_str = (
-                                df0.iloc[-1][date] + dt.timedelta(days=1)
-                            ).strftime("%Y%m%d")
-                            if len(df0[df0["date"] == df0.iloc[-1]["date"]]) == 1:
-                                kws["start"] = (df0.iloc[-1][date]).strftime("%Y%m%d")
-                            else:  # 单日多行的表默认最后一日是准确的，不再刷新了
-                                kws["start"] = nextday_str
-                            kws["end"] = end_str
-                            if has_weekday(
-                                nextday_str, kws["end"]
-                            ):  # 新更新的日期里有工作日
-                                df2 = f(*args, **kws)
-                                if df2 is not None and len(df2) > 0:
-                                    df2 = df2[df2["date"] >= kws["start"]]
-                                if df2 is not None and len(df2) > 0:
-                                    is_changed = True
-                                    if (
-                                        len(df0[df0["date"] == df0.iloc[-1]["date"]])
-                                        == 1
-                                    ):
-                                        df0 = df0.iloc[:-1]
-                                    df0 = pd.concat(
-                                        [df0, df2], ignore_index=True, sort=False
-                                    )
-                            # 注意这里抹去更新了原有最后一天的缓存，这是因为日线最新一天可能有实时数据污染
-
-                    except (FileNotFoundError, exc.ProgrammingError, KeyError) as e:
-                        if fetchonly:
-                            logger.error(
-                                "no cache in backend for %s but you insist `fetchonly`"
-                                % code
-                            )
-                            raise e
-                        if precached:
-                            if start_obj > precached_obj:
-                                kws["start"] = precached
-                            if end_obj < today_obj():
+                                # 即使硬盘级别的缓存，也有内存层，加快读写速度
+                                df0 = getattr(thismodule, "cached_dict").get(key)
+                                if df0 is None:
+                                    with _backend_lock(key, backend, path):
+                                        df0 = _read_backend(key, backend, path)
+                            if not pd.api.types.is_datetime64_any_dtype(df0[date]):
+                                df0[date] = pd_to_datetime(df0[date])
+                            basis = pd.Timestamp(df0.iloc[-1][date])
+                            # 向前延拓
+                            is_changed = False
+                            if df0.iloc[0][date] > start_obj and not fetchonly:
+                                kws["start"] = start_str
                                 kws["end"] = (
-                                    today_obj() - dt.timedelta(days=1)
+                                    df0.iloc[0][date] - pd.Timedelta(days=1)
                                 ).strftime("%Y%m%d")
-                        is_changed = True
-                        df0 = f(*args, **kws)
-
-                if df0 is not None and len(df0) > 0 and is_changed:
-                    if backend == "csv":
-                        df0.to_csv(os.path.join(path, key), index=False)
-                    elif backend == "sql":
-                        df0.to_sql(key, con=path, if_exists="replace", index=False)
-                    # elif backend == "memory":
-                    # 总是刷新内存层，即使是硬盘缓存
-                    d = getattr(thismodule, "cached_dict")
-                    d[key] = df0
+                                if has_weekday(kws["start"], kws["end"]):
+                                    # 考虑到海外市场的不同情况，不用 opendate 判断，采取保守型判别
+                                    df1 = f(*args, **kws)
+                                    if df1 is not None and len(df1) > 0:
+                                        df1 = df1[df1["date"] <= kws["end"]]
+                                    if df1 is not None and len(df1) > 0:
+                                        is_changed = True
+                                        df0 = pd.concat(
+                                            [df1, df0], ignore_index=True, sort=False
+                                        )
+                            # 向后延拓
+                            if df0.iloc[-1][date] < end_obj and not fetchonly:
+                                nextday_str = (
+                                    df0.iloc[-1][date] + dt.timedelta(days=1)
+                                ).strftime("%Y%m%d")
+                                if len(df0[df0["date"] == df0.iloc[-1]["date"]]) == 1:
+                                    kws["start"] = (df0.iloc[-1][date]).strftime(
+                                        "%Y%m%d"
+                                    )
+                                else:  # 单日多行的表默认最后一日是准确的，不再刷新了
+                                    kws["start"] = nextday_str
+                                kws["end"] = end_str
+                                if has_weekday(
+                                    nextday_str, kws["end"]
+                                ):  # 新更新的日期里有工作日
+                                    df2 = f(*args, **kws)
+                                    if df2 is not None and len(df2) > 0:
+                                        df2 = df2[df2["date"] >= kws["start"]]
+                                    if df2 is not None and len(df2) > 0:
+                                        if (
+                                            len(
+                                                df0[df0["date"] == df0.iloc[-1]["date"]]
+                                            )
+                                            == 1
+                                        ):
+                                            lastrow = df0.iloc[-1:]
+                                            df0 = df0.iloc[:-1]
+                                        else:
+                                            lastrow = None
+                                        if not is_changed:
+                                            delta = _append_delta(
+                                                lastrow, df2, df0.columns
+                                            )
+                                            if delta is None:
+                                                is_changed = True
+                                        df0 = pd.concat(
+                                            [df0, df2], ignore_index=True, sort=False
+                                        )
+                                # 注意这里抹去更新了原有最后一天的缓存，这是因为日线最新一天可能有实时数据污染
+                                # 若最后一天数据确实发生了变化，则退回到整表重写
+
+                        except (FileNotFoundError, exc.ProgrammingError, KeyError) as e:
+                            if fetchonly:
+                                logger.error(
+                                    "no cache in backend for %s but you insist `fetchonly`"
+                                    % code
+                                )
+                                raise e
+                            if precached:
+                                if start_obj > precached_obj:
+                                    kws["start"] = precached
+                                if end_obj < today_obj():
+                                    kws["end"] = (
+                                        today_obj() - dt.timedelta(days=1)
+                                    ).strftime("%Y%m%d")
+                            is_changed = True
+                            df0 = f(*args, **kws)
+
+                    if (
+                        df0 is not None
+                        and len(df0) > 0
+                        and (is_changed or delta is not None)
+                    ):
+                        if backend != "memory":
+                            with _backend_lock(key, backend, path):
+                                if not refresh and (
+                                    _backend_lastdate(key, backend, path, date) != basis
+                                ):
+                                    # 其他进程已更新了硬盘上的表，补入其超出本表日期范围的部分后整表重写，
+                                    # 避免重复追加或以旧表覆盖新数据
+                                    df0 = _merge_backend(df0, key, backend, path, date)
+                                    is_changed = True
+                                if is_changed or backend not in ["csv", "sql"]:
+                                    # 列存储格式无法原地追加，整体写回
+                                    _write_backend(key, df0, backend, path)
+                                elif len(delta) > 0:
+                                    _append_backend(key, delta, backend, path)
+                        # elif backend == "memory":
+                        # 总是刷新内存层，即使是硬盘缓存
+                        d = getattr(thismodule, "cached_dict")
+                        d.set(key, df0, ttl=kws.get("ttl", ioconf.get("ttl")))
 
             if df0 is not None and len(df0) > 0:
                 df0 = df0[df0["date"] <= end_str]
@@ -2157,18 +2744,11 @@ def fetch_backend(key):
     key = prefix + key
     backend = ioconf.get("backend")
     path = ioconf.get("path")
-    if backend == "csv":
-        key = key + ".csv"
+    key = _backend_key(key, backend)
 
     try:
-        if backend == "csv":
-            df0 = pd.read_csv(os.path.join(path, key))
-        elif backend == "sql":
-            df0 = pd.read_sql(key, path)
-        else:
-            raise ValueError("no %s option for backend" % backend)
-
-        return df0
+        with _backend_lock(key, backend, path):
+            return _read_backend(key, backend, path)
 
     except (FileNotFoundError, exc.ProgrammingError, KeyError):
         return None
@@ -2179,20 +2759,33 @@ def save_backend(key, df, mode="a", header=False):
     key = prefix + key
     backend = ioconf.get("backend")
     path = ioconf.get("path")
-    if backend == "csv":
-        key = key + ".csv"
+    key = _backend_key(key, backend)
 
     if backend == "csv":
-        if mode == "a":
-            df.to_csv(os.path.join(path, key), index=False, header=header, mode=mode)
-        else:
-            df.to_csv(os.path.join(path, key), index=False, mode=mode)
+        with _backend_lock(key, backend, path):
+            if mode == "a":
+                with csv_append(os.path.join(path, key)):
+                    df.to_csv(
+                        os.path.join(path, key), index=False, header=header, mode=mode
+                    )
+            else:
+                _write_backend(key, df, backend, path)
     elif backend == "sql":
         if mode == "a":
             mode = "append"
         else:
             mode = "replace"
         df.to_sql(key, con=path, if_exists=mode, index=False)
+    elif backend in ["parquet", "feather"]:
+        # 列存储文件无法原地追加，读出后合并再整体写回
+        with _backend_lock(key, backend, path):
+            if mode == "a" and os.path.exists(os.path.join(path, key)):
+                df = pd.concat(
+                    [_read_backend(key, backend, path), df],
+                    ignore_index=True,
+                    sort=False,
+                )
+            _write_backend(key, df, backend, path)
     else:
         raise ValueError("no %s option for backend" % backend)
 
@@ -2419,7 +3012,10 @@ def get_fund_peb_range(code, start, end):
 
 def set_backend(**ioconf):
     """
-    设定 xalpha get_daily 函数的缓存后端，默认为内存。 ioconf 参数设置可参考 :func:`cachedio`
+    设定 xalpha get_daily 函数的缓存后端，默认为内存。 ioconf 参数设置可参考 :func:`cachedio`，
+    backend 可选 memory, csv, sql, parquet 和 feather。
+    此外可通过 maxsize, maxbytes 和 ttl 限制内存层缓存的条目数，总字节数和过期时间（秒），
+    超出上限时按 LRU 淘汰，详见 :class:`MemoryCache`。
 
     :param ioconf:
     :return: None.
@@ -2427,6 +3023,10 @@ def set_backend(**ioconf):
 
     if not ioconf:
         ioconf = {"backend": "memory"}
+    for k in _cache_limits:
+        _cache_limits[k] = ioconf.get(k, None)
+    if getattr(thismodule, "cached_dict", None) is not None:
+        getattr(thismodule, "cached_dict").configure(**_cache_limits)
     get_daily = cachedio(**ioconf)(_get_daily)
     prefix = ioconf.get("prefix", "")
     ioconf["prefix"] = "iw-" + prefix
@@ -2444,6 +3044,47 @@ def set_backend(**ioconf):
 set_backend()
 
 
+def get_daily_many(
+    codes, start=None, end=None, prev=365, max_workers=8, form="dict", **kws
+):
+    """
+    并发获取多个标的的日线数据。抓取通过线程池进行，仍然经过 :func:`set_backend` 设定的缓存层，
+    同一 key 在缓存层加锁，不会被多个线程重复抓取。
+
+    :param codes: List[str]. 代码规则同 :func:`get_daily`，重复的代码只抓取一次
+    :param start: Optional[str]. %Y%m%d
+    :param end: Optional[str]. %Y%m%d
+    :param prev: int. Default 365. 未指定 start 时向前的天数
+    :param max_workers: int. Default 8. 线程池的最大线程数
+    :param form: str. Default "dict". "dict" 返回以代码为键的字典，"long" 返回增加 code 列的长表 DataFrame
+    :param kws: 其他传给 :func:`get_daily` 的关键字参数
+    :return: Union[Dict[str, pd.DataFrame], pd.DataFrame]
+    """
+    codes = list(dict.fromkeys(codes))
+    fetcher = getattr(thismodule, "get_daily")
+
+    def _fetch(code):
+        return fetcher(code, start=start, end=end, prev=prev, **kws)
+
+    if max_workers is None or max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            dfs = list(executor.map(_fetch, codes))
+    else:
+        dfs = [_fetch(code) for code in codes]
+    if form == "dict":
+        return dict(zip(codes, dfs))
+    elif form == "long":
+        ldfs = []
+        for code, df in zip(codes, dfs):
+            df = df.copy()
+            df["code"] = code
+            ldfs.append(df)
+        if not ldfs:
+            return pd.DataFrame()
+        return pd.concat(ldfs, ignore_index=True, sort=False)
+    raise ValueError("no %s option for form" % form)
+
+
 @data_source("jq")
 def get_peb(index, date=None, table=False):
     """
@@ -2561,6 +3202,36 @@ def _inverse_convert_code(code):
         return code[2:] + ".XSHE"
 
 
+def _bar_route(code, start=None, end=None):
+    """
+    根据代码自动选择分时数据的数据源，英为代码的 id 转换留给调用方
+
+    :param code: str.
+    :return: Tuple[str, str]. 数据源和去掉数据源前缀的代码
+    """
+    if (
+        (start is not None)
+        and (end is not None)
+        and (code.startswith("SH") or code.startswith("SZ"))
+    ):
+        _from = "jq"
+    elif code.startswith("SH") or code.startswith("SZ"):
+        _from = "xueqiu"
+    elif code.isdigit():
+        _from = "cninvesting"
+    elif code.startswith("HK") and code[2:7].isdigit():
+        _from = "xueqiu"
+        code = code[2:]
+    elif len(code.split("-")) >= 2 and len(code.split("-")[0]) <= 3:
+        _from = code.split("-")[0]
+        code = "-".join(code.split("-")[1:])
+    elif len(code.split("/")) > 1:
+        _from = "cninvesting"
+    else:
+        _from = "xueqiu"  # 美股
+    return _from, code
+
+
 @lru_cache_time(ttl=60, maxsize=512)
 def get_bar(
     code, prev=24, interval=3600, _from=None, handler=True, start=None, end=None
@@ -2583,27 +3254,9 @@ def get_bar(
                 return fr
 
     if not _from:
-        if (
-            (start is not None)
-            and (end is not None)
-            and (code.startswith("SH") or code.startswith("SZ"))
-        ):
-            _from = "jq"
-        elif code.startswith("SH") or code.startswith("SZ"):
-            _from = "xueqiu"
-        elif code.isdigit():
-            _from = "cninvesting"
-        elif code.startswith("HK") and code[2:7].isdigit():
-            _from = "xueqiu"
-            code = code[2:]
-        elif len(code.split("-")) >= 2 and len(code.split("-")[0]) <= 3:
-            _from = code.split("-")[0]
-            code = "-".join(code.split("-")[1:])
-        elif len(code.split("/")) > 1:
-            _from = "cninvesting"
+        _from, code = _bar_route(code, start=start, end=end)
+        if _from == "cninvesting" and len(code.split("/")) > 1:
             code = get_investing_id(code)
-        else:
-            _from = "xueqiu"  # 美股
     if _from in ["xq", "xueqiu", "XQ"]:
         return get_bar_fromxq(code, prev, interval)
     elif _from in ["IN", "cninvesting", "investing"]:
@@ -2695,14 +3348,7 @@ def get_bar_frominvesting(code, prev=120, interval=3600):
     return df
 
 
-def get_bar_fromxq(code, prev, interval=3600):
-    """
-
-    :param code:
-    :param prev:
-    :param interval: 1m, 5m, 15m, 30m, 60m, 120m, month, quarter, year, week, day
-    :return:
-    """
+def _xq_bar_url(code, prev, interval=3600):
     # max interval is also around 500
     trans = {
         "60": "1m",
@@ -2725,26 +3371,47 @@ def get_bar_fromxq(code, prev, interval=3600):
         interval=interval,
         type_=type_,
     )
+    return url
+
+
+def get_bar_fromxq(code, prev, interval=3600):
+    """
+
+    :param code:
+    :param prev:
+    :param interval: 1m, 5m, 15m, 30m, 60m, 120m, month, quarter, year, week, day
+    :return:
+    """
+    url = _xq_bar_url(code, prev, interval)
     r = rget(url, headers={"user-agent": "Mozilla/5.0"}, cookies=get_token())
     if not r.text:
         return  # None
-    else:
-        df = pd.DataFrame(r.json()["data"]["item"], columns=r.json()["data"]["column"])
-        df["date"] = df["timestamp"].apply(
-            lambda t: dt.datetime.fromtimestamp(t / 1000, tz=tz_bj).replace(tzinfo=None)
-        )
-        df = df[
-            [
-                "date",
-                "open",
-                "high",
-                "low",
-                "close",
-                "volume",
-                "turnoverrate",
-                "percent",
-            ]
+    return _parse_xq_bar(r.json())
+
+
+def _parse_xq_bar(r):
+    """
+    解析雪球分时 API 返回的 json
+
+    :param r: Dict.
+    :return: pd.DataFrame
+    """
+    df = pd.DataFrame(r["data"]["item"], columns=r["data"]["column"])
+    df["date"] = df["timestamp"].apply(
+        lambda t: dt.datetime.fromtimestamp(t / 1000, tz=tz_bj).replace(tzinfo=None)
+    )
+    df = df[
+        [
+            "date",
+            "open",
+            "high",
+            "low",
+            "close",
+            "volume",
+            "turnoverrate",
+            "percent",
         ]
+    ]
     return df
 
 